@@ -3,15 +3,21 @@ import os
 from pathlib import Path
 from flask import Flask
 from .extensions import db, migrate, csrf, login_manager
+from .database import init_database
+from .instrumentation import init_instrumentation
+from .metrics import init_metrics
 from .blueprints.main import bp as main_bp
 from .blueprints.assets import bp as assets_bp
 from .blueprints.tasks import bp as tasks_bp
 from .blueprints.files import bp as files_bp
+from .blueprints.api import bp as api_bp
 from .errors import bp as errors_bp
 from .logging_utils import setup_logging
 from .cli import register_cli
 from .filters import register_filters
-from .scheduler import start_scheduler
+from .identity import init_identity, load_identity
+from .caching import init_fragment_cache
+from .utils.storage import init_storage
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -31,6 +37,20 @@ def _resolve_sqlite_uri(uri: str, instance_path: str) -> str:
         abs_path = (BASE_DIR / rel_path)
     return f"{prefix}{abs_path.resolve()}"
 
+def _env_number(name: str, default, cast=int):
+    """Read a numeric env var, falling back to ``default`` when unset or invalid."""
+    raw = os.getenv(name)
+    try:
+        return cast(raw) if raw else default
+    except (TypeError, ValueError):
+        return default
+
+def _env_flag(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None or raw == "":
+        return default
+    return raw.strip().lower() in {"1", "true", "yes", "on"}
+
 def create_app():
     app = Flask(__name__, instance_relative_config=True, template_folder="templates", static_folder="static")
     setup_logging(app)
@@ -42,12 +62,60 @@ def create_app():
     configured_uri = os.getenv("SQLALCHEMY_DATABASE_URI", default_db_uri)
     app.config["SQLALCHEMY_DATABASE_URI"] = _resolve_sqlite_uri(configured_uri, app.instance_path)
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["DB_POOL_SIZE"] = _env_number("DB_POOL_SIZE", 5)
+    app.config["DB_MAX_OVERFLOW"] = _env_number("DB_MAX_OVERFLOW", 5)
+    app.config["DB_POOL_TIMEOUT"] = _env_number("DB_POOL_TIMEOUT", 30, float)
+    app.config["DB_POOL_RECYCLE"] = _env_number("DB_POOL_RECYCLE", 1800)
+    app.config["SQLITE_JOURNAL_MODE"] = os.getenv("SQLITE_JOURNAL_MODE", "WAL").strip().upper()
+    app.config["SQLITE_SYNCHRONOUS"] = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").strip().upper()
+    app.config["SQLITE_BUSY_TIMEOUT_MS"] = _env_number("SQLITE_BUSY_TIMEOUT_MS", 5000)
+    app.config["SQLITE_MMAP_SIZE"] = _env_number("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+    app.config["SQLITE_CACHE_SIZE_KB"] = _env_number("SQLITE_CACHE_SIZE_KB", 64 * 1024)
+    app.config["SQLITE_TEMP_STORE"] = os.getenv("SQLITE_TEMP_STORE", "MEMORY").strip().upper()
     app.config["UPLOAD_FOLDER"] = os.getenv("UPLOAD_FOLDER", str(Path(app.instance_path) / "uploads"))
-    max_content = os.getenv("MAX_CONTENT_LENGTH")
-    try:
-        app.config["MAX_CONTENT_LENGTH"] = int(max_content) if max_content else 16 * 1024 * 1024
-    except (TypeError, ValueError):
-        app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024
+    app.config["STORAGE_BACKEND"] = os.getenv("STORAGE_BACKEND", "local").strip().lower()
+    app.config["S3_BUCKET"] = os.getenv("S3_BUCKET") or None
+    app.config["S3_PREFIX"] = os.getenv("S3_PREFIX", "")
+    app.config["S3_ENDPOINT_URL"] = os.getenv("S3_ENDPOINT_URL") or None
+    app.config["S3_REGION"] = os.getenv("S3_REGION") or None
+    app.config["S3_ACCESS_KEY_ID"] = os.getenv("S3_ACCESS_KEY_ID") or None
+    app.config["S3_SECRET_ACCESS_KEY"] = os.getenv("S3_SECRET_ACCESS_KEY") or None
+    app.config["S3_MAX_POOL_CONNECTIONS"] = _env_number("S3_MAX_POOL_CONNECTIONS", 16)
+    app.config["S3_MULTIPART_THRESHOLD"] = _env_number("S3_MULTIPART_THRESHOLD", 8 * 1024 * 1024)
+    app.config["BLOB_MAX_AGE"] = _env_number("BLOB_MAX_AGE", 365 * 24 * 60 * 60)
+    app.config["BLOB_SWEEP_GRACE_SECONDS"] = _env_number("BLOB_SWEEP_GRACE_SECONDS", 60 * 60, float)
+    app.config["SENDFILE_MODE"] = os.getenv("SENDFILE_MODE", "").strip().lower()
+    app.config["SENDFILE_ACCEL_PREFIX"] = os.getenv("SENDFILE_ACCEL_PREFIX", "/protected-uploads/")
+    app.config["SLOW_QUERY_MS"] = _env_number("SLOW_QUERY_MS", 200, float)
+    app.config["SERVER_TIMING"] = _env_flag("SERVER_TIMING", False)
+    app.config["METRICS_ENABLED"] = _env_flag("METRICS_ENABLED", True)
+    app.config["METRICS_DIR"] = os.getenv("METRICS_DIR", str(Path(app.instance_path) / "metrics"))
+    app.config["METRICS_FLUSH_SECONDS"] = _env_number("METRICS_FLUSH_SECONDS", 1, float)
+    app.config["METRICS_TOKEN"] = os.getenv("METRICS_TOKEN") or None
+    app.config["MAX_CONTENT_LENGTH"] = _env_number("MAX_CONTENT_LENGTH", 16 * 1024 * 1024)
+    app.config["IDENTITY_CACHE_TTL"] = _env_number("IDENTITY_CACHE_TTL", 0, float)
+    app.config["FRAGMENT_CACHE_ENABLED"] = _env_flag("FRAGMENT_CACHE_ENABLED", True)
+    app.config["FRAGMENT_CACHE_MAX_BYTES"] = _env_number("FRAGMENT_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+    app.config["FRAGMENT_CACHE_TTL"] = _env_number("FRAGMENT_CACHE_TTL", 300)
+    app.config["THUMBNAIL_WORKERS"] = _env_number("THUMBNAIL_WORKERS", min(2, os.cpu_count() or 1))
+    app.config["THUMBNAIL_WAIT_SECONDS"] = _env_number("THUMBNAIL_WAIT_SECONDS", 5, float)
+    app.config["SCHEDULER_POLL_SECONDS"] = _env_number("SCHEDULER_POLL_SECONDS", 30, float)
+    app.config["SCHEDULER_LEASE_SECONDS"] = _env_number("SCHEDULER_LEASE_SECONDS", 120)
+    app.config["REMINDER_DAYS_AHEAD"] = _env_number("REMINDER_DAYS_AHEAD", 1)
+    app.config["REMINDER_INCLUDE_OVERDUE"] = _env_flag("REMINDER_INCLUDE_OVERDUE", False)
+    app.config["SMTP_HOST"] = os.getenv("SMTP_HOST") or None
+    app.config["SMTP_PORT"] = _env_number("SMTP_PORT", 25)
+    app.config["SMTP_USERNAME"] = os.getenv("SMTP_USERNAME") or None
+    app.config["SMTP_PASSWORD"] = os.getenv("SMTP_PASSWORD") or None
+    app.config["SMTP_STARTTLS"] = _env_flag("SMTP_STARTTLS", False)
+    app.config["SMTP_TIMEOUT"] = _env_number("SMTP_TIMEOUT", 30, float)
+    app.config["MAIL_FROM"] = os.getenv("MAIL_FROM", "reminders@localhost")
+    app.config["MAIL_WORKERS"] = _env_number("MAIL_WORKERS", 4)
+    app.config["MAIL_MAX_ATTEMPTS"] = _env_number("MAIL_MAX_ATTEMPTS", 6)
+    app.config["MAIL_CLAIM_TIMEOUT_SECONDS"] = _env_number("MAIL_CLAIM_TIMEOUT_SECONDS", 30 * 60)
+
+    if app.config["SENDFILE_MODE"] not in {"", "x-accel-redirect", "x-sendfile"}:
+        raise RuntimeError("SENDFILE_MODE must be empty, 'x-accel-redirect' or 'x-sendfile'.")
 
     # Ensure instance folder exists
     try:
@@ -62,21 +130,24 @@ def create_app():
     app.config.setdefault("SESSION_COOKIE_SECURE", not is_dev)
     app.config.setdefault("REMEMBER_COOKIE_HTTPONLY", True)
 
-    db.init_app(app)
+    init_database(app)
+    init_instrumentation(app)
+    init_metrics(app)
     migrate.init_app(app, db)
     csrf.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
     login_manager.login_message_category = "error"
-
-    from .models import User  # noqa: WPS433
+    init_identity(app)
+    init_fragment_cache(app)
+    init_storage(app)
 
     @login_manager.user_loader
     def load_user(user_id: str):
         if not user_id:
             return None
         try:
-            return User.query.get(int(user_id))
+            return load_identity(int(user_id))
         except (ValueError, TypeError):
             return None
 
@@ -87,7 +158,7 @@ def create_app():
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(errors_bp)
     app.register_blueprint(files_bp)
-    start_scheduler(app)
+    app.register_blueprint(api_bp, url_prefix="/api/v1")
 
     @app.after_request
     def secure_headers(response):
@@ -0,0 +1,42 @@
+"""Bearer tokens for the JSON API (``flask api-token create``).
+
+A token is a random secret shown once when it is issued.  Only its SHA-256 is
+stored, so a leaked database does not leak working tokens, and a request is
+authenticated with one indexed lookup.  That lookup also returns the owner's
+``data_version``, which the API uses for ETags without a second query.
+"""
+from __future__ import annotations
+
+import hashlib
+import secrets
+
+from sqlalchemy import select
+
+from .extensions import db
+from .models import ApiToken, UserStats
+
+TOKEN_PREFIX = "hmt_"
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def issue_token(user_id: int, name: str) -> tuple[ApiToken, str]:
+    """Add a token for ``user_id`` to the session; returns the row and the secret."""
+    token = TOKEN_PREFIX + secrets.token_urlsafe(32)
+    row = ApiToken(user_id=user_id, name=name, token_hash=hash_token(token))
+    db.session.add(row)
+    return row, token
+
+
+def token_identity(token: str) -> tuple[int, int] | None:
+    """``(user_id, data_version)`` for a valid token, else None."""
+    row = db.session.execute(
+        select(ApiToken.user_id, UserStats.data_version)
+        .outerjoin(UserStats, UserStats.user_id == ApiToken.user_id)
+        .where(ApiToken.token_hash == hash_token(token))
+    ).first()
+    if row is None:
+        return None
+    return row.user_id, row.data_version or 0
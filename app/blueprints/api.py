@@ -0,0 +1,313 @@
+"""Versioned JSON API for integrations, mounted at ``/api/v1``.
+
+Requests authenticate with ``Authorization: Bearer <token>`` (see
+app/api_tokens.py); there is no session or CSRF involved.  Rows are selected
+as plain column tuples and serialized directly, without ORM objects or
+templates.
+
+Every collection accepts:
+
+- ``fields=id,title,due_date``: sparse fieldsets (``id`` is always included);
+- ``sort``/``dir``/``limit``/``cursor``: keyset pagination; the response has
+  ``next_cursor`` and a ``Link: rel="next"`` header while more rows remain;
+- ``ids=3,5,8``: batch read of up to API_BATCH_MAX rows in the given order,
+  with ids that do not exist (or belong to someone else) under ``missing``.
+
+Responses carry a weak ETag keyed on the owner's data version (as in
+app/caching.py), so a matching ``If-None-Match`` gets a 304 after the token
+lookup alone.
+"""
+from __future__ import annotations
+
+import hashlib
+from datetime import date, datetime
+from decimal import Decimal
+from functools import wraps
+from typing import NamedTuple
+
+from flask import Blueprint, current_app, g, jsonify, request, url_for
+from sqlalchemy import select
+from werkzeug.exceptions import BadRequest, HTTPException, NotFound, Unauthorized
+
+from ..api_tokens import token_identity
+from ..extensions import db
+from ..models import Asset, Attachment, Task
+from ..utils.pagination import decode_cursor, encode_cursor, keyset_after, keyset_order
+from ..utils.storage import send_blob
+from .tasks import apply_task_filters
+
+bp = Blueprint("api", __name__)
+
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 500
+API_BATCH_MAX = 100
+TASK_STATUSES = ("all", "open", "overdue", "done")
+
+
+class Resource(NamedTuple):
+    model: type
+    fields: dict
+    sorts: dict
+    default_sort: str
+
+
+def _columns(model, *names: str) -> dict:
+    return {name: getattr(model, name) for name in names}
+
+
+ASSETS = Resource(
+    Asset,
+    _columns(
+        Asset, "id", "name", "type", "make", "model", "serial", "purchase_date", "warranty_expiration", "notes",
+        "created_at", "updated_at",
+    ),
+    {"name": Asset.name, "created": Asset.created_at},
+    "name",
+)
+TASKS = Resource(
+    Task,
+    _columns(
+        Task, "id", "asset_id", "title", "description", "due_date", "status", "recurrence_rule", "series_id",
+        "priority", "estimated_minutes", "cost", "vendor", "created_at", "updated_at",
+    ),
+    {"due": Task.due_date, "title": Task.title, "created": Task.created_at},
+    "due",
+)
+ATTACHMENTS = Resource(
+    Attachment,
+    # The storage key is the content's SHA-256 (see Attachment.key).
+    {**_columns(Attachment, "id", "asset_id", "task_id", "original_name", "mime", "size", "created_at"),
+     "sha256": Attachment.key},
+    {"created": Attachment.created_at},
+    "created",
+)
+
+
+# 404 and 500 are listed by code so they win over the HTML handlers in app/errors.py.
+@bp.errorhandler(HTTPException)
+@bp.errorhandler(404)
+@bp.errorhandler(500)
+def api_error(error):
+    response = jsonify({"error": {"status": error.code, "message": error.description}})
+    response.status_code = error.code
+    if error.code == 401:
+        response.headers["WWW-Authenticate"] = 'Bearer realm="api"'
+    return response
+
+
+@bp.before_request
+def authenticate():
+    auth = request.authorization
+    identity = token_identity(auth.token) if auth and auth.type == "bearer" and auth.token else None
+    if identity is None:
+        raise Unauthorized("Send a valid API token as 'Authorization: Bearer <token>'.")
+    g.api_user_id, g.api_data_version = identity
+
+
+def conditional(view):
+    """Weak ETag on the user's data version; answer 304 before the view runs."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        parts = (
+            request.endpoint,
+            sorted(kwargs.items()),
+            g.api_user_id,
+            g.api_data_version,
+            sorted(request.args.items(multi=True)),
+            # "overdue" depends on the date, not only on the data.
+            date.today().isoformat(),
+        )
+        etag = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = view(*args, **kwargs)
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.vary.add("Authorization")
+        return response
+
+    return wrapper
+
+
+def _jsonable(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _choice(name: str, default: str, choices) -> str:
+    value = request.args.get(name, default)
+    if value not in choices:
+        raise BadRequest(f"'{name}' must be one of: {', '.join(choices)}.")
+    return value
+
+
+def _fields(resource: Resource) -> list[str]:
+    raw = request.args.get("fields")
+    if not raw:
+        return list(resource.fields)
+    names = [name.strip() for name in raw.split(",") if name.strip()]
+    unknown = [name for name in names if name not in resource.fields]
+    if unknown:
+        raise BadRequest(f"Unknown field(s) {', '.join(unknown)}; choose from {', '.join(resource.fields)}.")
+    return list(dict.fromkeys(["id", *names]))
+
+
+def _limit() -> int:
+    raw = request.args.get("limit")
+    if raw is None:
+        return API_PAGE_SIZE
+    if not raw.isdigit() or not 1 <= int(raw) <= API_MAX_PAGE_SIZE:
+        raise BadRequest(f"'limit' must be between 1 and {API_MAX_PAGE_SIZE}.")
+    return int(raw)
+
+
+def _ids() -> list[int] | None:
+    raw = request.args.get("ids")
+    if raw is None:
+        return None
+    try:
+        ids = list(dict.fromkeys(int(part) for part in raw.split(",") if part.strip()))
+    except ValueError:
+        raise BadRequest("'ids' must be a comma-separated list of integers.") from None
+    if not 1 <= len(ids) <= API_BATCH_MAX:
+        raise BadRequest(f"'ids' takes between 1 and {API_BATCH_MAX} ids.")
+    return ids
+
+
+def _rows(columns: list, names: list[str], stmt) -> list[dict]:
+    return [
+        {name: _jsonable(value) for name, value in zip(names, row)}
+        for row in db.session.execute(stmt.with_only_columns(*columns, maintain_column_froms=True))
+    ]
+
+
+def _collection(resource: Resource, stmt):
+    """Page, or batch when ``ids`` is given, of the user's rows selected by ``stmt``."""
+    names = _fields(resource)
+    columns = [resource.fields[name] for name in names]
+    owned = stmt.where(resource.model.user_id == g.api_user_id)
+
+    ids = _ids()
+    if ids is not None:
+        found = {row["id"]: row for row in _rows(columns, names, owned.where(resource.model.id.in_(ids)))}
+        return jsonify({"data": [found[i] for i in ids if i in found], "missing": [i for i in ids if i not in found]})
+
+    sort = _choice("sort", resource.default_sort, tuple(resource.sorts))
+    descending = _choice("dir", "asc", ("asc", "desc")) == "desc"
+    limit = _limit()
+    sort_column = resource.sorts[sort]
+    dialect = db.session.get_bind().dialect.name
+    stmt = owned.order_by(*keyset_order(sort_column, resource.model.id, descending, dialect))
+    raw_cursor = request.args.get("cursor")
+    if raw_cursor:
+        cursor = decode_cursor(raw_cursor)
+        if cursor is None:
+            raise BadRequest("Invalid 'cursor'.")
+        stmt = stmt.where(keyset_after(sort_column, resource.model.id, cursor, descending, dialect))
+
+    # The sort value rides along as a trailing column so the cursor can be
+    # built even when the client did not ask for that field.
+    rows = db.session.execute(
+        stmt.with_only_columns(*columns, sort_column, maintain_column_froms=True).limit(limit + 1)
+    ).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-1], rows[-1][0])
+    response = jsonify({
+        "data": [{name: _jsonable(value) for name, value in zip(names, row)} for row in rows],
+        "next_cursor": next_cursor,
+    })
+    if next_cursor:
+        args = request.args.to_dict()
+        args["cursor"] = next_cursor
+        response.headers["Link"] = f'<{url_for(request.endpoint, **args)}>; rel="next"'
+    return response
+
+
+def _item(resource: Resource, item_id: int):
+    names = _fields(resource)
+    stmt = select(resource.model.id).where(resource.model.id == item_id, resource.model.user_id == g.api_user_id)
+    rows = _rows([resource.fields[name] for name in names], names, stmt)
+    if not rows:
+        raise NotFound(f"No {resource.model.__tablename__} {item_id}.")
+    return jsonify({"data": rows[0]})
+
+
+def _optional_int(name: str) -> int | None:
+    raw = request.args.get(name)
+    if raw is None:
+        return None
+    if not raw.isdigit():
+        raise BadRequest(f"'{name}' must be an integer.")
+    return int(raw)
+
+
+@bp.get("/assets")
+@conditional
+def list_assets():
+    criteria = []
+    if asset_type := request.args.get("type"):
+        criteria.append(Asset.type == asset_type)
+    return _collection(ASSETS, select(Asset.id).where(*criteria))
+
+
+@bp.get("/assets/<int:asset_id>")
+@conditional
+def get_asset(asset_id):
+    return _item(ASSETS, asset_id)
+
+
+@bp.get("/tasks")
+@conditional
+def list_tasks():
+    """Tasks filtered like the task list: ``status``, ``window``, ``q``, plus ``asset_id``."""
+    status = _choice("status", "all", TASK_STATUSES)
+    window = _choice("window", "", ("", "7d", "30d")) or None
+    criteria = []
+    if (asset_id := _optional_int("asset_id")) is not None:
+        criteria.append(Task.asset_id == asset_id)
+    stmt = apply_task_filters(
+        select(Task.id).where(*criteria), status, window, (request.args.get("q") or "").strip(), date.today()
+    )
+    return _collection(TASKS, stmt)
+
+
+@bp.get("/tasks/<int:task_id>")
+@conditional
+def get_task(task_id):
+    return _item(TASKS, task_id)
+
+
+@bp.get("/attachments")
+@conditional
+def list_attachments():
+    criteria = []
+    for name, column in (("task_id", Attachment.task_id), ("asset_id", Attachment.asset_id)):
+        if (value := _optional_int(name)) is not None:
+            criteria.append(column == value)
+    return _collection(ATTACHMENTS, select(Attachment.id).where(*criteria))
+
+
+@bp.get("/attachments/<int:attachment_id>")
+@conditional
+def get_attachment(attachment_id):
+    return _item(ATTACHMENTS, attachment_id)
+
+
+@bp.get("/attachments/<int:attachment_id>/content")
+def get_attachment_content(attachment_id):
+    row = db.session.execute(
+        select(Attachment.key, Attachment.mime, Attachment.original_name).where(
+            Attachment.id == attachment_id, Attachment.user_id == g.api_user_id
+        )
+    ).first()
+    response = send_blob(row.key, row.mime or "application/octet-stream", row.original_name) if row else None
+    if response is None:
+        raise NotFound(f"No attachment {attachment_id}.")
+    return response
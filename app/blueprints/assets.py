@@ -1,21 +1,28 @@
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
+from sqlalchemy import or_, select
 from ..extensions import db
-from ..models import Asset
+from ..models import Asset, Attachment, Task
+from ..caching import cached_view
+from ..search import search_assets
+from ..stats import bump_data_version, record_tasks_removed
 from ..utils.dates import parse_iso_date
+from ..utils.storage import release_files
 
 bp = Blueprint("assets", __name__)
 
 @bp.get("/")
 @login_required
+@cached_view
 def list_assets():
     q = request.args.get("q", "").strip()
     query = Asset.query.filter_by(user_id=current_user.id)
     if q:
-        like = f"%{q}%"
-        query = query.filter(Asset.name.ilike(like))
-    assets = query.order_by(Asset.created_at.desc()).all()
+        query = search_assets(query, q)
+    else:
+        query = query.order_by(Asset.created_at.desc())
+    assets = query.all()
     template = "assets/_table.html" if request.headers.get("HX-Request") else "assets/list.html"
     return render_template(template, assets=assets, q=q)
 
@@ -39,6 +46,7 @@ def create_asset():
             notes=request.form.get("notes") or None,
         )
         db.session.add(asset)
+        bump_data_version(current_user.id)
         db.session.commit()
         flash("Asset created", "success")
         return redirect(url_for("assets.list_assets"))
@@ -57,6 +65,7 @@ def edit_asset(asset_id):
         asset.purchase_date = parse_iso_date(request.form.get("purchase_date"))
         asset.warranty_expiration = parse_iso_date(request.form.get("warranty_expiration"))
         asset.notes = request.form.get("notes") or None
+        bump_data_version(current_user.id)
         db.session.commit()
         flash("Asset updated", "success")
         return redirect(url_for("assets.list_assets"))
@@ -66,7 +75,18 @@ def edit_asset(asset_id):
 @login_required
 def delete_asset(asset_id):
     asset = Asset.query.filter_by(id=asset_id, user_id=current_user.id).first_or_404()
+    record_tasks_removed(
+        current_user.id,
+        db.session.execute(select(Task.status, Task.updated_at, Task.cost).where(Task.asset_id == asset.id)),
+    )
+    keys = db.session.execute(
+        select(Attachment.key).where(
+            or_(Attachment.asset_id == asset.id, Attachment.task_id.in_(select(Task.id).where(Task.asset_id == asset.id)))
+        )
+    ).scalars().all()
     db.session.delete(asset)
+    release_files(keys)
+    bump_data_version(current_user.id)
     db.session.commit()
     flash("Asset deleted", "success")
     return redirect(url_for("assets.list_assets"))
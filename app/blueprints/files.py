@@ -1,8 +1,10 @@
-from pathlib import Path
-from flask import Blueprint, current_app, send_from_directory, abort
+from concurrent.futures import TimeoutError as FutureTimeout
+from flask import Blueprint, current_app, abort
 from flask_login import login_required, current_user
 
 from ..models import Attachment
+from ..thumbnails import IMAGE_MIMES, SIZES, request_thumbnail, thumbnail_key
+from ..utils.storage import get_storage, send_blob
 
 bp = Blueprint("files", __name__)
 
@@ -11,15 +13,43 @@ bp = Blueprint("files", __name__)
 @login_required
 def get_attachment(attachment_id):
     attachment = Attachment.query.filter_by(id=attachment_id, user_id=current_user.id).first_or_404()
-    directory = Path(current_app.config["UPLOAD_FOLDER"])
-    file_path = directory / attachment.key
-    if not file_path.exists():
-        abort(404)
-    return send_from_directory(
-        directory,
+    response = send_blob(
         attachment.key,
         mimetype=attachment.mime or "application/octet-stream",
-        as_attachment=False,
         download_name=attachment.original_name or attachment.key,
-        max_age=300,
     )
+    if response is None:
+        abort(404)
+    return response
+
+
+@bp.get("/files/<int:attachment_id>/thumb/<size>")
+@login_required
+def get_thumbnail(attachment_id, size):
+    """WebP rendition of an image attachment, rendered on first request.
+
+    Waits up to THUMBNAIL_WAIT_SECONDS for the render; if it is still running,
+    answers 202 with Retry-After so the client can ask again.
+    """
+    if size not in SIZES:
+        abort(404)
+    attachment = Attachment.query.filter_by(id=attachment_id, user_id=current_user.id).first_or_404()
+    if attachment.mime not in IMAGE_MIMES:
+        abort(404)
+    key = thumbnail_key(attachment.key, size)
+    response = send_blob(key, mimetype="image/webp")
+    if response is not None:
+        return response
+    if not get_storage().exists(attachment.key):
+        abort(404)
+    try:
+        request_thumbnail(attachment.key, size).result(timeout=current_app.config["THUMBNAIL_WAIT_SECONDS"])
+    except FutureTimeout:
+        return "", 202, {"Retry-After": "1"}
+    except Exception:
+        current_app.logger.exception("Thumbnail failed for attachment %s", attachment.id)
+        abort(404)
+    response = send_blob(key, mimetype="image/webp")
+    if response is None:
+        abort(404)
+    return response
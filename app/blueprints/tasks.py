@@ -2,52 +2,84 @@
 import csv
 import io
 from datetime import date, timedelta
-from pathlib import Path
-from flask import Blueprint, render_template, request, redirect, url_for, flash, Response, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, Response, stream_with_context
 from flask_login import login_required, current_user
-from sqlalchemy import asc, desc, or_
-from sqlalchemy.orm import joinedload
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, joinedload
 from ..extensions import db
 from ..models import Task, Asset, Attachment
 from ..utils.dates import parse_iso_date
-from ..utils.storage import save_upload
+from ..utils.pagination import decode_cursor, encode_cursor, keyset_after, keyset_order
+from ..bulk import apply_bulk_action
+from ..caching import cached_view
+from ..importer import format_for, import_rows, open_text, read_rows
+from ..recurrence import compile_rule, ensure_series, spawn_next
+from ..search import filter_tasks
+from ..stats import bump_data_version, record_task_change, task_facts
+from ..utils.storage import release_files, save_upload
 
 bp = Blueprint("tasks", __name__)
 
-@bp.get("/")
-@login_required
-def list_tasks():
-    status = request.args.get("status", "all")
-    window = request.args.get("window")
-    search = (request.args.get("q") or "").strip()
-    sort = request.args.get("sort", "due")
-    direction = request.args.get("dir", "asc")
+PAGE_SIZE = 50
+EXPORT_BATCH_SIZE = 500
+BULK_VERBS = {
+    "complete": "Completed",
+    "skip": "Skipped",
+    "reschedule": "Rescheduled",
+    "reassign": "Moved",
+    "delete": "Deleted",
+}
 
-    query = (
-        Task.query.options(joinedload(Task.asset))
-        .filter(Task.user_id == current_user.id)
-    )
 
-    today = date.today()
+def apply_task_filters(query, status, window, search, today):
+    """Apply the task-list status/window/search filters to a Task query or select."""
     if status == "open":
-        query = query.filter(Task.status == "pending")
+        query = query.where(Task.status == "pending")
     elif status == "overdue":
-        query = query.filter(Task.status == "pending", Task.due_date != None, Task.due_date < today)  # noqa: E711
+        query = query.where(Task.status == "pending", Task.due_date != None, Task.due_date < today)  # noqa: E711
     elif status == "done":
-        query = query.filter(Task.status == "done")
+        query = query.where(Task.status == "done")
 
     if window == "7d":
-        query = query.filter(Task.due_date != None, Task.due_date <= today + timedelta(days=7))  # noqa: E711
+        query = query.where(Task.due_date != None, Task.due_date <= today + timedelta(days=7))  # noqa: E711
     elif window == "30d":
-        query = query.filter(Task.due_date != None, Task.due_date <= today + timedelta(days=30))  # noqa: E711
+        query = query.where(Task.due_date != None, Task.due_date <= today + timedelta(days=30))  # noqa: E711
 
     if search:
-        query = query.join(Asset, isouter=True).filter(
-            or_(
-                Task.title.ilike(f"%{search}%"),
-                Asset.name.ilike(f"%{search}%"),
-            )
-        )
+        query = filter_tasks(query, search)
+    return query
+
+
+def _rule_error(rule):
+    """Validation message for a submitted recurrence rule, or None if it is usable."""
+    if not rule:
+        return None
+    try:
+        compile_rule(rule)
+    except ValueError as exc:
+        return f"Recurrence rule not supported: {exc}"
+    return None
+
+
+def _task_page(args, cursor=None) -> dict:
+    """Template context for one page of the task list filtered by ``args``.
+
+    ``args`` is the query string, or the form of a bulk action, which carries
+    the list's current filters so the refreshed table keeps them.
+    """
+    status = args.get("status") or "all"
+    window = args.get("window") or None
+    search = (args.get("q") or "").strip()
+    sort = args.get("sort") or "due"
+    direction = args.get("dir") or "asc"
+
+    today = date.today()
+    query = (
+        Task.query.options(joinedload(Task.asset))
+        .filter(Task.user_id == current_user.id)
+    )
+    query = apply_task_filters(query, status, window, search, today)
 
     sort_map = {
         "title": Task.title,
@@ -55,14 +87,21 @@ def list_tasks():
         "due": Task.due_date,
     }
     sort_col = sort_map.get(sort, Task.due_date)
-    order_func = asc if direction == "asc" else desc
-    query = query.order_by(order_func(sort_col).nullslast())
+    descending = direction != "asc"
+    dialect = db.session.get_bind().dialect.name
+    query = query.order_by(*keyset_order(sort_col, Task.id, descending, dialect))
+    if cursor:
+        query = query.filter(keyset_after(sort_col, Task.id, cursor, descending, dialect))
+
+    tasks = query.limit(PAGE_SIZE + 1).all()
+    next_cursor = None
+    if len(tasks) > PAGE_SIZE:
+        tasks = tasks[:PAGE_SIZE]
+        next_cursor = encode_cursor(getattr(tasks[-1], sort_col.key), tasks[-1].id)
 
-    tasks = query.limit(250).all()
-    template = "tasks/_table.html" if request.headers.get("HX-Request") else "tasks/list.html"
-    return render_template(
-        template,
+    return dict(
         tasks=tasks,
+        next_cursor=next_cursor,
         status=status,
         window=window,
         sort=sort,
@@ -71,6 +110,55 @@ def list_tasks():
         today=today,
     )
 
+
+@bp.get("/")
+@login_required
+@cached_view
+def list_tasks():
+    cursor = decode_cursor(request.args.get("cursor"))
+    context = _task_page(request.args, cursor)
+    if request.headers.get("HX-Request"):
+        return render_template("tasks/_rows.html" if cursor else "tasks/_table.html", **context)
+    # Choices for the bulk "move to asset" action.
+    assets = db.session.execute(
+        select(Asset.id, Asset.name).where(Asset.user_id == current_user.id).order_by(Asset.name)
+    ).all()
+    return render_template("tasks/list.html", assets=assets, **context)
+
+
+@bp.post("/bulk")
+@login_required
+def bulk_tasks():
+    """Apply one action to the checked tasks and return the refreshed table."""
+    action = request.form.get("action", "")
+    try:
+        result = apply_bulk_action(
+            current_user.id,
+            request.form.getlist("ids", type=int),
+            action,
+            date.today(),
+            days=request.form.get("days", type=int),
+            asset_id=request.form.get("asset_id", type=int),
+        )
+    except ValueError as exc:
+        db.session.rollback()
+        notice = (str(exc), "error")
+    else:
+        if result.changed:
+            bump_data_version(current_user.id)
+        db.session.commit()
+        message = f"{BULK_VERBS[action]} {result.changed} task(s)."
+        if result.spawned:
+            message += f" Created {result.spawned} next occurrence(s)."
+        notice = (message, "success")
+
+    if not request.headers.get("HX-Request"):
+        flash(*notice)
+        state = {name: request.form.get(name) or None for name in ("status", "window", "sort", "dir", "q")}
+        return redirect(url_for("tasks.list_tasks", **state))
+    return render_template("tasks/_table.html", notice=notice, **_task_page(request.form))
+
+
 @bp.route("/create", methods=["GET","POST"])
 @login_required
 def create_task():
@@ -84,6 +172,10 @@ def create_task():
         if not title or not asset_id:
             flash("Asset and title are required.", "error")
             return redirect(request.url)
+        rule_error = _rule_error(request.form.get("recurrence_rule"))
+        if rule_error:
+            flash(rule_error, "error")
+            return redirect(request.url)
         Asset.query.filter_by(id=asset_id, user_id=current_user.id).first_or_404()
         task = Task(
             user_id=current_user.id,
@@ -98,6 +190,10 @@ def create_task():
             vendor=request.form.get("vendor") or None,
         )
         db.session.add(task)
+        db.session.flush()
+        ensure_series(task)
+        record_task_change(current_user.id, None, task_facts(task))
+        bump_data_version(current_user.id)
         db.session.commit()
         flash("Task created", "success")
         return redirect(url_for("tasks.list_tasks"))
@@ -109,6 +205,11 @@ def edit_task(task_id):
     task = Task.query.filter_by(id=task_id, user_id=current_user.id).first_or_404()
     assets = Asset.query.filter_by(user_id=current_user.id).order_by(Asset.name.asc()).all()
     if request.method == "POST":
+        rule_error = _rule_error(request.form.get("recurrence_rule"))
+        if rule_error:
+            flash(rule_error, "error")
+            return redirect(request.url)
+        before = task_facts(task)
         task.asset_id = request.form.get("asset_id", type=int) or task.asset_id
         Asset.query.filter_by(id=task.asset_id, user_id=current_user.id).first_or_404()
         task.title = request.form.get("title","").strip() or task.title
@@ -119,6 +220,15 @@ def edit_task(task_id):
         task.estimated_minutes = request.form.get("estimated_minutes", type=int, default=0)
         task.cost = request.form.get("cost") or None
         task.vendor = request.form.get("vendor") or None
+        ensure_series(task)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            flash("Another occurrence of this recurring task is already due on that date.", "error")
+            return redirect(request.url)
+        record_task_change(current_user.id, before, task_facts(task))
+        bump_data_version(current_user.id)
         db.session.commit()
         flash("Task updated", "success")
         return redirect(url_for("tasks.list_tasks"))
@@ -128,16 +238,30 @@ def edit_task(task_id):
 @login_required
 def complete_task(task_id):
     task = Task.query.filter_by(id=task_id, user_id=current_user.id).first_or_404()
+    before = task_facts(task)
     task.status = "done"
+    db.session.flush()
+    record_task_change(current_user.id, before, task_facts(task))
+    spawned = spawn_next(task, date.today())
+    if spawned is not None:
+        record_task_change(current_user.id, None, task_facts(spawned))
+    bump_data_version(current_user.id)
     db.session.commit()
-    flash("Task completed", "success")
+    if spawned is not None:
+        flash(f"Task completed. Next occurrence due {spawned.due_date.isoformat()}.", "success")
+    else:
+        flash("Task completed", "success")
     return redirect(url_for("tasks.list_tasks"))
 
 @bp.post("/<int:task_id>/delete")
 @login_required
 def delete_task(task_id):
     task = Task.query.filter_by(id=task_id, user_id=current_user.id).first_or_404()
+    keys = db.session.execute(select(Attachment.key).where(Attachment.task_id == task.id)).scalars().all()
+    record_task_change(current_user.id, task_facts(task), None)
     db.session.delete(task)
+    release_files(keys)
+    bump_data_version(current_user.id)
     db.session.commit()
     flash("Task deleted", "success")
     return redirect(url_for("tasks.list_tasks"))
@@ -146,25 +270,75 @@ def delete_task(task_id):
 @bp.get("/export.csv")
 @login_required
 def export_tasks():
-    query = Task.query.filter_by(user_id=current_user.id).options(joinedload(Task.asset))
-    si = io.StringIO()
-    writer = csv.writer(si)
-    writer.writerow(["Title", "Asset", "Due", "Status", "Completed"])
-    for task in query.order_by(Task.due_date.asc().nullslast()):
-        writer.writerow([
-            task.title,
-            task.asset.name if task.asset else "",
-            task.due_date.isoformat() if task.due_date else "",
-            task.status,
-            task.updated_at.isoformat() if task.status == "done" and task.updated_at else "",
-        ])
+    """Stream the user's tasks as CSV, honouring the list's status/window/q filters.
+
+    Rows are read as column tuples in batches of EXPORT_BATCH_SIZE and flushed
+    as each batch is written, so memory stays flat however many tasks exist.
+    """
+    asset = aliased(Asset)
+    stmt = (
+        select(Task.title, asset.name, Task.due_date, Task.status, Task.updated_at)
+        .outerjoin(asset, asset.id == Task.asset_id)
+        .where(Task.user_id == current_user.id)
+    )
+    stmt = apply_task_filters(
+        stmt,
+        request.args.get("status", "all"),
+        request.args.get("window"),
+        (request.args.get("q") or "").strip(),
+        date.today(),
+    )
+    stmt = stmt.order_by(Task.due_date.asc().nullslast()).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["Title", "Asset", "Due", "Status", "Completed"])
+        for batch in db.session.execute(stmt).partitions():
+            for title, asset_name, due_date, status, updated_at in batch:
+                writer.writerow([
+                    title,
+                    asset_name or "",
+                    due_date.isoformat() if due_date else "",
+                    status,
+                    updated_at.isoformat() if status == "done" and updated_at else "",
+                ])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
     return Response(
-        si.getvalue(),
+        stream_with_context(generate()),
         mimetype="text/csv",
         headers={"Content-Disposition": "attachment; filename=tasks.csv"},
     )
 
 
+@bp.post("/import")
+@login_required
+def import_tasks():
+    file = request.files.get("file")
+    if not file or not file.filename:
+        flash("Select a CSV or JSON file to import.", "error")
+        return redirect(url_for("tasks.list_tasks"))
+    try:
+        report = import_rows(current_user.id, read_rows(open_text(file.stream), format_for(file.filename)))
+    except (UnicodeDecodeError, ValueError, csv.Error) as exc:
+        db.session.rollback()
+        flash(f"Could not read import file: {exc}", "error")
+        return redirect(url_for("tasks.list_tasks"))
+    flash(
+        f"Imported {report.tasks_created} task(s) and {report.assets_created} asset(s) from {report.rows} row(s).",
+        "success",
+    )
+    if report.error_count:
+        details = "; ".join(f"row {number}: {message}" for number, message in report.errors[:5])
+        flash(f"{report.error_count} row(s) skipped — {details}", "error")
+    return redirect(url_for("tasks.list_tasks"))
+
+
 @bp.post("/<int:task_id>/attachments")
 @login_required
 def upload_attachment(task_id):
@@ -184,6 +358,7 @@ def upload_attachment(task_id):
         size=saved["size"],
     )
     db.session.add(attachment)
+    bump_data_version(current_user.id)
     db.session.commit()
     flash("Attachment uploaded.", "success")
     return redirect(url_for("tasks.edit_task", task_id=task.id))
@@ -194,16 +369,11 @@ def upload_attachment(task_id):
 def delete_attachment(attachment_id):
     attachment = Attachment.query.filter_by(id=attachment_id, user_id=current_user.id).first_or_404()
     task_id = attachment.task_id
-    _delete_file(attachment.key)
+    key = attachment.key
     db.session.delete(attachment)
+    release_files([key])
+    bump_data_version(current_user.id)
     db.session.commit()
     flash("Attachment removed.", "success")
     return redirect(url_for("tasks.edit_task", task_id=task_id))
 
-
-def _delete_file(key):
-    filepath = Path(current_app.config["UPLOAD_FOLDER"]) / key
-    try:
-        filepath.unlink(missing_ok=True)  # type: ignore[arg-type]
-    except OSError:
-        current_app.logger.warning("Could not delete file %s", filepath)
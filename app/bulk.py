@@ -0,0 +1,151 @@
+"""Bulk task actions from the task list, run as set-based statements.
+
+Each action changes every selected task with one ``UPDATE … WHERE user_id = …
+AND id IN (…)`` (or ``DELETE``), instead of loading, committing and
+redirecting once per task.  The summary tables are kept exact: the affected
+rows' stats facts are read once before the write and come back from its
+``RETURNING`` clause afterwards.  Only recurring tasks that were completed or
+skipped are loaded as objects, to create their next occurrence.
+
+Blobs of deleted attachments are marked for the storage sweep in the same
+transaction (see :func:`app.utils.storage.release_files`).  The caller bumps
+the data version and commits.
+"""
+from __future__ import annotations
+
+from datetime import date
+from typing import NamedTuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .models import Asset, Attachment, Task
+from .recurrence import spawn_next
+from .stats import StatsDelta, TaskFacts, record_task_change, record_tasks_removed, task_facts
+from .utils.storage import release_files
+
+BULK_ACTIONS = ("complete", "skip", "reschedule", "reassign", "delete")
+BULK_MAX_TASKS = 500
+BULK_MAX_DAYS = 3650
+
+
+class BulkResult(NamedTuple):
+    changed: int
+    spawned: int
+
+
+def _shift_days(column, days: int, dialect: str):
+    if dialect == "sqlite":
+        # SQLite keeps dates as ISO text; date() does the arithmetic.
+        return func.date(column, f"{days:+d} days")
+    return column + days
+
+
+def _update(user_id: int, task_ids: list[int], values: dict, *criteria) -> list:
+    """Apply ``values`` to the selected tasks matching ``criteria``; returns the changed rows."""
+    where = (Task.user_id == user_id, Task.id.in_(task_ids), *criteria)
+    before = db.session.execute(select(Task.status, Task.updated_at, Task.cost).where(*where)).all()
+    if not before:
+        return []
+    stmt = (
+        update(Task)
+        .where(*where)
+        .values(**values)
+        .returning(Task.id, Task.status, Task.updated_at, Task.cost, Task.recurrence_rule)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        with db.session.begin_nested():
+            after = db.session.execute(stmt).all()
+    except IntegrityError:
+        raise ValueError("Another occurrence of a selected recurring task is already due on that date.") from None
+    delta = StatsDelta()
+    for row in before:
+        delta.remove(TaskFacts(*row))
+    for row in after:
+        delta.add(TaskFacts(row.status, row.updated_at, row.cost))
+    delta.apply(user_id)
+    return after
+
+
+def _spawn_next_occurrences(user_id: int, rows, today: date) -> int:
+    recurring = [row.id for row in rows if row.recurrence_rule]
+    if not recurring:
+        return 0
+    spawned = 0
+    tasks = db.session.execute(select(Task).where(Task.id.in_(recurring)).order_by(Task.due_date)).scalars().all()
+    for task in tasks:
+        new_task = spawn_next(task, today)
+        if new_task is not None:
+            record_task_change(user_id, None, task_facts(new_task))
+            spawned += 1
+    return spawned
+
+
+def _delete(user_id: int, task_ids: list[int]) -> int:
+    selected = select(Task.id).where(Task.user_id == user_id, Task.id.in_(task_ids))
+    keys = db.session.execute(
+        delete(Attachment)
+        .where(Attachment.task_id.in_(selected))
+        .returning(Attachment.key)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    removed = db.session.execute(
+        delete(Task)
+        .where(Task.user_id == user_id, Task.id.in_(task_ids))
+        .returning(Task.status, Task.updated_at, Task.cost)
+        .execution_options(synchronize_session=False)
+    ).all()
+    record_tasks_removed(user_id, removed)
+    release_files(keys)
+    return len(removed)
+
+
+def apply_bulk_action(
+    user_id: int,
+    task_ids: list[int],
+    action: str,
+    today: date,
+    days: int | None = None,
+    asset_id: int | None = None,
+) -> BulkResult:
+    """Run ``action`` on the user's tasks among ``task_ids``; raises ValueError on bad input.
+
+    ``complete`` and ``skip`` create the next occurrence of recurring tasks,
+    ``reschedule`` moves pending tasks by ``days`` (undated ones become due
+    ``days`` from today) and ``reassign`` moves tasks to ``asset_id``.
+    """
+    task_ids = list(dict.fromkeys(task_ids))
+    if action not in BULK_ACTIONS:
+        raise ValueError("Choose a bulk action.")
+    if not task_ids:
+        raise ValueError("Select at least one task.")
+    if len(task_ids) > BULK_MAX_TASKS:
+        raise ValueError(f"Select at most {BULK_MAX_TASKS} tasks at a time.")
+
+    if action == "delete":
+        return BulkResult(_delete(user_id, task_ids), 0)
+
+    if action in ("complete", "skip"):
+        status = "done" if action == "complete" else "skipped"
+        # Skipping only makes sense for work still to do; completing also
+        # covers tasks skipped earlier.  Deleted tasks are never touched.
+        criterion = Task.status.in_(("pending", "skipped")) if action == "complete" else Task.status == "pending"
+        rows = _update(user_id, task_ids, {"status": status}, criterion)
+        return BulkResult(len(rows), _spawn_next_occurrences(user_id, rows, today))
+
+    if action == "reschedule":
+        if not days or abs(days) > BULK_MAX_DAYS:
+            raise ValueError(f"Reschedule by a number of days between -{BULK_MAX_DAYS} and {BULK_MAX_DAYS}, other than 0.")
+        dialect = db.session.get_bind().dialect.name
+        due = _shift_days(func.coalesce(Task.due_date, today), days, dialect)
+        rows = _update(user_id, task_ids, {"due_date": due}, Task.status == "pending")
+        return BulkResult(len(rows), 0)
+
+    if asset_id is None or db.session.execute(
+        select(Asset.id).where(Asset.id == asset_id, Asset.user_id == user_id)
+    ).first() is None:
+        raise ValueError("Choose one of your assets to move the tasks to.")
+    rows = _update(user_id, task_ids, {"asset_id": asset_id}, Task.asset_id != asset_id)
+    return BulkResult(len(rows), 0)
@@ -0,0 +1,122 @@
+"""Server-side cache of rendered views keyed on the user's data version.
+
+Every write to a user's tasks, assets or attachments bumps
+``user_stats.data_version`` (see :func:`app.stats.bump_data_version`).  Views
+wrapped with :func:`cached_view` are keyed on (endpoint, user, version, query
+args, HTMX flag, date, CSRF session), so a repeat view of unchanged data is
+served from a bounded in-process LRU.  Responses carry a weak ETag derived from
+the same key; a matching ``If-None-Match`` gets a 304 after a single
+primary-key lookup, before the view runs.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from flask import current_app, request, session
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+
+from .stats import data_version
+
+
+class FragmentCache:
+    """Thread-safe LRU of response bodies bounded by total size in bytes."""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[bytes, str]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> tuple[bytes, str] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, body: bytes, content_type: str) -> None:
+        cost = len(body) + len(key)
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[0]) + len(key)
+            self._entries[key] = (body, content_type)
+            self._size += cost
+            while self._size > self.max_bytes:
+                old_key, (old_body, _) = self._entries.popitem(last=False)
+                self._size -= len(old_body) + len(old_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+fragment_cache = FragmentCache()
+
+
+def init_fragment_cache(app):
+    fragment_cache.max_bytes = app.config.get("FRAGMENT_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+    fragment_cache.clear()
+
+
+def _cache_key(version: int) -> str:
+    ttl = max(int(current_app.config.get("FRAGMENT_CACHE_TTL", 300)), 1)
+    parts = (
+        request.endpoint,
+        current_user.id,
+        version,
+        tuple(sorted(request.args.items(multi=True))),
+        bool(request.headers.get("HX-Request")),
+        date.today().isoformat(),
+        # Rendered forms embed a CSRF token tied to this session's secret and
+        # only valid for a limited time, so both are part of the key.
+        session.get("csrf_token"),
+        int(time.time() // ttl),
+    )
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def cached_view(view):
+    """Serve ``view`` from the fragment cache / 304 while the user's data is unchanged.
+
+    Place below ``login_required``.  Requests with pending flash messages
+    bypass the cache because the page would need to render them.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_app.config.get("FRAGMENT_CACHE_ENABLED") or session.get("_flashes"):
+            return view(*args, **kwargs)
+
+        generate_csrf()
+        key = _cache_key(data_version(current_user.id))
+        if request.if_none_match.contains_weak(key):
+            response = current_app.response_class(status=304)
+        else:
+            entry = fragment_cache.get(key)
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                fragment_cache.set(key, response.get_data(), response.content_type)
+            else:
+                body, content_type = entry
+                response = current_app.response_class(body, content_type=content_type)
+        response.set_etag(key, weak=True)
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.vary.update(("Cookie", "HX-Request"))
+        return response
+
+    return wrapper
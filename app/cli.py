@@ -1,59 +1,452 @@
-import random
-from datetime import date, datetime, timedelta
-from decimal import Decimal
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, timedelta
 
 import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from flask_migrate.cli import db as db_cli
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
 
+from .database import COPY_BATCH_SIZE, copy_database, effective_settings, probe
+from .explain import capture, explain_all, hot_paths
 from .extensions import db
-from .models import Asset, Task, User
+from .instrumentation import check_query_budgets
+from .api_tokens import issue_token
+from .models import ApiToken, Attachment, SchedulerLease, Task, User
+from .importer import format_for, import_rows, read_rows
+from .recurrence import EXPAND_CHUNK_SIZE, expand_recurrences
+from .mailer import deliver_outbox
+from .reminders import queue_digests
+from .scheduler import JOBS, job_states, run_scheduler
+from .seeding import SEED_CHUNK_SIZE, SEED_PASSWORD, seed_households
+from .thumbnails import IMAGE_MIMES, SIZES, build_thumbnail, thumbnail_key
+from .utils.storage import build_storage, get_storage, hash_stream, sweep_released_blobs
+from .stats import rebuild_stats
 
-ASSET_TYPES = ["HVAC", "Plumbing", "Fridge", "Washer", "Roof", "Vehicle"]
+
+def _parse_horizon(ctx, param, value):
+    """Accept ``365d``, ``52w`` or a bare number of days."""
+    text = str(value).strip().lower()
+    days_per = {"d": 1, "w": 7}.get(text[-1:], None)
+    number = text[:-1] if days_per else text
+    if not number.isdigit():
+        raise click.BadParameter("use a number of days, e.g. 365d or 52w")
+    return timedelta(days=int(number) * (days_per or 1))
+
+
+scheduler_cli = AppGroup("scheduler", help="Run or inspect the background job scheduler.")
+
+
+@scheduler_cli.command("run")
+@click.option("--once", is_flag=True, help="Run due jobs once and exit instead of looping.")
+def scheduler_run(once):
+    """Run scheduled jobs; only one process (the lease holder) does work."""
+    run_scheduler(current_app._get_current_object(), once=once)
+
+
+@scheduler_cli.command("status")
+def scheduler_status():
+    """Show each job's schedule, last run and next run, and the lease holder."""
+    states = job_states()
+    for job in JOBS.values():
+        state = states.get(job.name)
+        if state is None:
+            click.echo(f"{job.name:<20} {job.schedule:<14} never seen")
+            continue
+        click.echo(
+            f"{job.name:<20} {job.schedule:<14} last {state.last_run_at:%Y-%m-%d %H:%M} "
+            f"({state.last_status or 'registered'}"
+            f"{f', {state.last_duration_ms} ms' if state.last_duration_ms is not None else ''}) "
+            f"next {job.cron.next_after(state.last_run_at):%Y-%m-%d %H:%M}"
+        )
+        if state.last_error:
+            click.echo(f"{'':<20} error: {state.last_error}")
+    lease = db.session.get(SchedulerLease, "scheduler")
+    if lease is None:
+        click.echo("Lease: free")
+    else:
+        click.echo(f"Lease: {lease.owner} until {lease.expires_at:%Y-%m-%d %H:%M:%S} UTC")
+
+
+reminders_cli = AppGroup("reminders", help="Queue and deliver reminder digests.")
+
+
+@reminders_cli.command("queue")
+@click.option("--date", "day", type=click.DateTime(["%Y-%m-%d"]), help="Digest date (defaults to today).")
+@click.option("--days-ahead", type=int, help="Override REMINDER_DAYS_AHEAD.")
+@click.option("--include-overdue/--no-include-overdue", default=None, help="Override REMINDER_INCLUDE_OVERDUE.")
+def reminders_queue(day, days_ahead, include_overdue):
+    """Write one digest per user to the outbox (safe to rerun the same day)."""
+    queued = queue_digests(day.date() if day else date.today(), days_ahead, include_overdue)
+    db.session.commit()
+    click.echo(f"Queued {queued} digest(s).")
+
+
+@reminders_cli.command("deliver")
+def reminders_deliver():
+    """Send due outbox messages now."""
+    report = deliver_outbox()
+    click.echo(f"Sent {report.sent}, retrying {report.retrying}, failed {report.failed}.")
+    if report.held:
+        click.echo(f"{report.held} message(s) held: set SMTP_HOST to send them.")
+
+
+thumbnails_cli = AppGroup("thumbnails", help="Manage image attachment thumbnails.")
+
+
+@thumbnails_cli.command("backfill")
+@click.option("--workers", type=int, default=os.cpu_count(), show_default=True, help="Render processes.")
+@click.option("--force", is_flag=True, help="Re-render thumbnails that already exist.")
+def thumbnails_backfill(workers, force):
+    """Render missing thumbnails for every image attachment, in parallel."""
+    storage = get_storage()
+    stored = set(storage.keys())
+    keys = db.session.execute(select(Attachment.key).where(Attachment.mime.in_(IMAGE_MIMES)).distinct()).scalars()
+    jobs = [
+        (key, size)
+        for key in keys
+        if key in stored
+        for size in SIZES
+        if force or thumbnail_key(key, size) not in stored
+    ]
+    done = failed = 0
+    workers = max(1, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool, ThreadPoolExecutor(max_workers=workers * 2) as io_pool:
+        futures = [io_pool.submit(build_thumbnail, storage, key, size, pool) for key, size in jobs]
+        for (key, size), future in zip(jobs, futures):
+            try:
+                future.result()
+                done += 1
+            except Exception as exc:  # noqa: BLE001 - one bad image must not stop the run
+                failed += 1
+                click.echo(f"  {key} ({size}): {exc}", err=True)
+    click.echo(f"Rendered {done} thumbnail(s); {failed} failed.")
+
+
+api_token_cli = AppGroup("api-token", help="Issue and revoke tokens for the /api/v1 JSON API.")
+
+
+@api_token_cli.command("create")
+@click.option("--email", required=True, help="Owner of the token.")
+@click.option("--name", default="default", show_default=True, help="Label, e.g. the integration using it.")
+def api_token_create(email, name):
+    """Issue a token; it is printed once and cannot be shown again."""
+    user = User.query.filter_by(email=email.strip().lower()).first()
+    if user is None:
+        raise click.ClickException(f"No user {email}.")
+    row, token = issue_token(user.id, name)
+    db.session.commit()
+    click.echo(f"Token {row.id} ({name}) for {user.email}:")
+    click.echo(token)
+
+
+@api_token_cli.command("list")
+@click.option("--email", help="Only this user's tokens.")
+def api_token_list(email):
+    """List tokens (without their secrets)."""
+    stmt = select(ApiToken.id, ApiToken.name, User.email, ApiToken.created_at).join(User, User.id == ApiToken.user_id)
+    if email:
+        stmt = stmt.where(User.email == email.strip().lower())
+    for token_id, name, owner, created_at in db.session.execute(stmt.order_by(ApiToken.id)):
+        click.echo(f"{token_id:>5}  {owner:<32} {name:<24} {created_at:%Y-%m-%d %H:%M}")
+
+
+@api_token_cli.command("revoke")
+@click.argument("token_id", type=int)
+def api_token_revoke(token_id):
+    """Delete a token; requests using it fail from then on."""
+    row = db.session.get(ApiToken, token_id)
+    if row is None:
+        raise click.ClickException(f"No token {token_id}.")
+    db.session.delete(row)
+    db.session.commit()
+    click.echo(f"Revoked token {token_id}.")
+
+
+storage_cli = AppGroup("storage", help="Manage the attachment storage backend.")
+
+
+def _copy_blob(source, target, key: str) -> None:
+    local = source.local_path(key)
+    if local is not None:
+        # An upload for S3; for local -> local, a rename into the sharded layout.
+        target.put_file(key, local)
+        return
+    with source.open(key) as stream:
+        target.put(key, stream)
+
+
+@storage_cli.command("migrate")
+@click.option("--from", "source_name", type=click.Choice(["local", "s3"]), required=True, help="Backend to copy from.")
+@click.option("--to", "target_name", type=click.Choice(["local", "s3"]), required=True, help="Backend to copy to.")
+@click.option("--workers", type=int, default=8, show_default=True, help="Concurrent copies.")
+def storage_migrate(source_name, target_name, workers):
+    """Copy every blob missing from the target backend, in parallel.
+
+    Safe to rerun: blobs already in the target are skipped.  Switch
+    STORAGE_BACKEND once it reports nothing left to copy.  Copying local to
+    local rewrites legacy flat files into the sharded layout.
+    """
+    if source_name == target_name and source_name != "local":
+        raise click.UsageError("--from and --to must differ.")
+    config = current_app.config
+    source = build_storage(config, source_name)
+    target = build_storage(config, target_name)
+    if source_name == target_name:
+        # local -> local: only legacy flat files need moving into shards.
+        pending = list(source.legacy_keys())
+    else:
+        existing = set(target.keys())
+        pending = [key for key in source.keys() if key not in existing]
+    click.echo(f"Copying {len(pending)} blob(s) from {source_name} to {target_name}...")
+    copied = failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="storage-migrate") as executor:
+        futures = {executor.submit(_copy_blob, source, target, key): key for key in pending}
+        for future, key in futures.items():
+            try:
+                future.result()
+                copied += 1
+            except Exception as exc:  # noqa: BLE001 - report and carry on; a rerun retries it
+                failed += 1
+                click.echo(f"  {key}: {exc}", err=True)
+    click.echo(f"Copied {copied} blob(s); {failed} failed.")
+
+
+@storage_cli.command("sweep")
+@click.option("--grace", type=float, help="Seconds a blob must stay unreferenced.  [default: BLOB_SWEEP_GRACE_SECONDS]")
+def storage_sweep(grace):
+    """Delete blobs whose attachments were all deleted (the sweep-blobs job)."""
+    grace = current_app.config["BLOB_SWEEP_GRACE_SECONDS"] if grace is None else max(0.0, grace)
+    deleted = kept = 0
+    while True:
+        batch = sweep_released_blobs(grace)
+        deleted, kept = deleted + batch[0], kept + batch[1]
+        if not any(batch):
+            break
+    click.echo(f"Deleted {deleted} blob(s); {kept} were referenced again.")
+
+
+@storage_cli.command("prune-legacy")
+@click.option("--dry-run", is_flag=True, help="Only list the files that would be removed.")
+def storage_prune_legacy(dry_run):
+    """Remove upload files superseded by the content-addressed migration.
+
+    Run once `flask db upgrade` has succeeded.  A flat file in UPLOAD_FOLDER
+    is removed only if no attachment uses its name and its content is stored
+    under its SHA-256, which an attachment does use.
+    """
+    storage = get_storage()
+    if storage.name != "local":
+        raise click.ClickException("prune-legacy only applies to STORAGE_BACKEND=local.")
+    used = set(db.session.execute(select(Attachment.key).distinct()).scalars())
+    removed = kept = 0
+    for key in list(storage.legacy_keys()):
+        if key in used:
+            continue
+        path = storage.root / key
+        with open(path, "rb") as handle:
+            digest, _ = hash_stream(handle)
+        if digest == key or digest not in used or not storage.exists(digest):
+            kept += 1
+            continue
+        click.echo(f"  {key} -> {digest}")
+        if not dry_run:
+            path.unlink(missing_ok=True)
+        removed += 1
+    verb = "Would remove" if dry_run else "Removed"
+    click.echo(f"{verb} {removed} superseded file(s); kept {kept} unreferenced file(s) with no stored copy.")
+
+
+@db_cli.command("doctor")
+@click.option("--rows", type=int, default=500, show_default=True, help="Size of the throughput probe.")
+@click.option("--no-probe", is_flag=True, help="Only report settings.")
+@with_appcontext
+def db_doctor(rows, no_probe):
+    """Show effective engine/pragma settings and run a short throughput probe."""
+    mismatches = 0
+    for name, actual, wanted in effective_settings(db.engine, current_app.config):
+        note = ""
+        if wanted is not None and actual.lower() != wanted.lower():
+            note = f"  (configured {wanted})"
+            mismatches += 1
+        click.echo(f"{name:>16}: {actual}{note}")
+    if not no_probe:
+        click.echo("Probe:")
+        for name, rate in probe(db.engine, max(1, rows)).items():
+            click.echo(f"{name:>20}: {rate:,.0f}")
+    if mismatches:
+        raise SystemExit(f"{mismatches} setting(s) differ from the configuration.")
+
+
+@db_cli.command("copy")
+@click.option("--from", "source_url", help="Source database URL.  [default: SQLALCHEMY_DATABASE_URI]")
+@click.option("--to", "target_url", required=True, help="Target database URL, already migrated.")
+@click.option("--batch-size", type=int, default=COPY_BATCH_SIZE, show_default=True, help="Rows fetched per round trip.")
+@click.confirmation_option(prompt="This replaces every row in the target database. Continue?")
+@with_appcontext
+def db_copy(source_url, target_url, batch_size):
+    """Copy all rows into another database, e.g. SQLite to Postgres.
+
+    Run `flask db upgrade` against the target first; its rows are replaced.
+    Postgres targets are loaded with COPY and get their id sequences advanced.
+    """
+    source_url = source_url or current_app.config["SQLALCHEMY_DATABASE_URI"]
+    started = time.perf_counter()
+    try:
+        counts = copy_database(
+            source_url,
+            target_url,
+            batch_size=max(1, batch_size),
+            progress=lambda table, rows: click.echo(f"{table:>16}: {rows} row(s)"),
+        )
+    except SQLAlchemyError as exc:
+        raise click.ClickException(f"Copy failed, target unchanged: {exc}") from None
+    click.echo(f"Copied {sum(counts.values())} row(s) in {time.perf_counter() - started:.1f}s.")
+
+
+def _busiest_user() -> int:
+    user_id = db.session.execute(
+        select(Task.user_id).group_by(Task.user_id).order_by(func.count().desc()).limit(1)
+    ).scalar()
+    if user_id is None:
+        raise click.ClickException("No tasks found; seed the database first (flask seed-data).")
+    return user_id
+
+
+@db_cli.command("explain")
+@click.option("--user-id", type=int, help="User to request the pages as.  [default: the user with most tasks]")
+@click.option("--path", "only", multiple=True, help="Only paths whose label contains this text (repeatable).")
+@click.option("--search", default="filter", show_default=True, help="Search text for the search paths.")
+@click.option("--verbose", is_flag=True, help="Print full SQL and plans for clean statements too.")
+@click.option("--strict", is_flag=True, help="Exit non-zero if anything is flagged.")
+@with_appcontext
+def db_explain(user_id, only, search, verbose, strict):
+    """Explain the SQL behind the hot pages and flag scans and temp sorts."""
+    if user_id is None:
+        user_id = _busiest_user()
+    paths = [(label, url) for label, url in hot_paths(search) if not only or any(text in label for text in only)]
+    results = explain_all(capture(current_app._get_current_object(), user_id, paths))
+    flagged = 0
+    for number, result in enumerate(results, 1):
+        if not result.findings and not verbose:
+            continue
+        flagged += bool(result.findings)
+        shown = ", ".join(result.paths[:3]) + (f" (+{len(result.paths) - 3} more)" if len(result.paths) > 3 else "")
+        click.echo(f"[{number}] {shown}")
+        sql = " ".join(result.statement.split())
+        click.echo(f"    {sql if verbose else sql[:200] + ('...' if len(sql) > 200 else '')}")
+        for line in result.plan:
+            click.echo(f"      {line}")
+        for finding in result.findings:
+            click.secho(f"    ! {finding.kind}: {finding.detail}", fg="yellow")
+        for suggestion in result.suggestions:
+            click.secho(f"    + {suggestion}", fg="green")
+        click.echo()
+    click.echo(f"{len(results)} distinct statement(s) from {len(paths)} path(s); {flagged} flagged.")
+    if strict and flagged:
+        raise SystemExit(1)
+
+
+@db_cli.command("query-budget")
+@click.option("--user-id", type=int, help="User to request the pages as.  [default: the user with most tasks]")
+@with_appcontext
+def db_query_budget(user_id):
+    """Count the statements each hot page issues; exit non-zero if any exceeds its budget."""
+    if user_id is None:
+        user_id = _busiest_user()
+    over = 0
+    for url, queries, budget in check_query_budgets(current_app._get_current_object(), user_id):
+        status = "ok" if queries <= budget else "OVER"
+        over += queries > budget
+        click.echo(f"{status:>4}  {queries:>3}/{budget:<3} {url}")
+    if over:
+        raise SystemExit(f"{over} page(s) over their query budget.")
 
 
 def register_cli(app):
+    app.cli.add_command(scheduler_cli)
+    app.cli.add_command(reminders_cli)
+    app.cli.add_command(thumbnails_cli)
+    app.cli.add_command(storage_cli)
+    app.cli.add_command(api_token_cli)
+
     @app.cli.command("seed-data")
-    def seed_data():
-        """Seed demo data for the first user (for local/testing use only)."""
-        user = User.query.first()
-        if not user:
-            raise SystemExit("No users found. Register via the UI before seeding.")
-
-        if Asset.query.filter_by(user_id=user.id).count():
-            raise SystemExit("User already has assets; aborting to avoid duplicates.")
-
-        today = date.today()
-        cost_options = [Decimal("0"), Decimal("25"), Decimal("49.99"), Decimal("120")]
-
-        for idx in range(5):
-            asset = Asset(
-                user_id=user.id,
-                name=f"{ASSET_TYPES[idx % len(ASSET_TYPES)]} #{idx + 1}",
-                type=ASSET_TYPES[idx % len(ASSET_TYPES)],
-                make=random.choice(["Acme", "HomePro", "FixIt", "DailyCo"]),
-                model=f"{random.randint(100, 999)}-X",
-                purchase_date=today - timedelta(days=random.randint(200, 1500)),
-                warranty_expiration=today + timedelta(days=random.randint(100, 600)),
-                notes="Seeded sample asset.",
+    @click.option("--users", type=int, help="Create this many new households.  [default: seed the first user]")
+    @click.option("--assets-per-user", type=float, default=5, show_default=True, help="Mean assets per household (skewed).")
+    @click.option("--tasks-per-asset", type=float, default=4, show_default=True, help="Mean tasks per asset (skewed).")
+    @click.option("--years", type=float, default=1, show_default=True, help="Years of task history.")
+    @click.option("--attachments", is_flag=True, help="Attach shared receipt images to some assets and completed tasks.")
+    @click.option("--seed", type=int, default=0, show_default=True, help="Random seed; same seed, same data.")
+    @click.option("--today", type=click.DateTime(["%Y-%m-%d"]), help="Anchor date for the history (defaults to today).")
+    @click.option("--chunk-size", type=int, default=SEED_CHUNK_SIZE, show_default=True, help="Rows per insert transaction.")
+    def seed_data(users, assets_per_user, tasks_per_asset, years, attachments, seed, today, chunk_size):
+        """Generate demo or benchmark data (for local/testing use only).
+
+        Without --users, the first registered user gets a small demo set.
+        """
+        try:
+            report = seed_households(
+                users=users,
+                assets_per_user=assets_per_user,
+                tasks_per_asset=tasks_per_asset,
+                years=years,
+                attachments=attachments,
+                seed=seed,
+                today=today.date() if today else None,
+                chunk_size=max(1, chunk_size),
+                progress=lambda report: click.echo(f"  {report.tasks:,} task(s)...", err=True),
             )
-            db.session.add(asset)
-            db.session.flush()
-
-            for _ in range(4):
-                due = today + timedelta(days=random.randint(-30, 60))
-                status = random.choice(["pending", "pending", "pending", "done"])
-                task = Task(
-                    user_id=user.id,
-                    asset_id=asset.id,
-                    title=f"Service {asset.name}",
-                    description="Auto-generated sample task.",
-                    due_date=due,
-                    status=status,
-                    cost=random.choice(cost_options),
-                )
-                if status == "done":
-                    completed_at = datetime.utcnow() - timedelta(days=random.randint(1, 90))
-                    task.updated_at = completed_at
-                db.session.add(task)
+        except ValueError as exc:
+            raise SystemExit(str(exc)) from None
+        click.echo(
+            f"Seeded {report.users:,} user(s), {report.assets:,} asset(s), {report.tasks:,} task(s) "
+            f"and {report.attachments:,} attachment(s) in {report.seconds:.1f}s."
+        )
+        if report.users:
+            click.echo(f"Seed users sign in with password '{SEED_PASSWORD}'.")
 
+    @app.cli.command("rebuild-stats")
+    @click.option("--email", help="Only rebuild this user's summary rows.")
+    def rebuild_stats_command(email):
+        """Recompute the dashboard summary tables from the task history."""
+        user_id = None
+        if email:
+            user = User.query.filter_by(email=email.strip().lower()).first()
+            if not user:
+                raise SystemExit(f"No user with email {email}.")
+            user_id = user.id
+        count = rebuild_stats(user_id)
         db.session.commit()
-        click.echo("Seeded demo assets and tasks.")
+        click.echo(f"Rebuilt dashboard stats for {count} user(s).")
+
+    @app.cli.command("import-data")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--email", required=True, help="Owner of the imported assets and tasks.")
+    @click.option("--format", "fmt", type=click.Choice(["csv", "json"]), help="Defaults to the file extension.")
+    @click.option("--chunk-size", default=1000, show_default=True, help="Rows per insert transaction.")
+    def import_data(path, email, fmt, chunk_size):
+        """Bulk import assets and tasks from a CSV or JSON file."""
+        user = User.query.filter_by(email=email.strip().lower()).first()
+        if not user:
+            raise SystemExit(f"No user with email {email}.")
+        with open(path, encoding="utf-8-sig", newline="") as handle:
+            report = import_rows(user.id, read_rows(handle, fmt or format_for(path)), chunk_size=chunk_size)
+        click.echo(
+            f"Imported {report.tasks_created} task(s) and {report.assets_created} asset(s) "
+            f"from {report.rows} row(s); {report.error_count} error(s)."
+        )
+        for number, message in report.errors:
+            click.echo(f"  row {number}: {message}", err=True)
+
+    @app.cli.command("expand-recurrences")
+    @click.option("--horizon", default="365d", show_default=True, callback=_parse_horizon,
+                  help="How far ahead to create occurrences (days or weeks, e.g. 90d, 52w).")
+    @click.option("--chunk-size", default=EXPAND_CHUNK_SIZE, show_default=True, help="Rows per insert transaction.")
+    def expand_recurrences_command(horizon, chunk_size):
+        """Create pending occurrences of every recurring task up to the horizon."""
+        until = date.today() + horizon
+        created = expand_recurrences(until, chunk_size=chunk_size)
+        click.echo(f"Created {created} occurrence(s) due on or before {until.isoformat()}.")
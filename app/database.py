@@ -0,0 +1,236 @@
+"""Engine configuration: connection pool sizing and per-connection SQLite pragmas.
+
+:func:`init_database` replaces a bare ``db.init_app``.  It derives
+``SQLALCHEMY_ENGINE_OPTIONS`` from ``DB_POOL_*`` settings and, on SQLite, runs
+the ``SQLITE_*`` pragmas on every new DBAPI connection through an engine
+``connect`` event.  WAL lets readers proceed while a write is in progress, and
+``busy_timeout`` makes a writer wait for the lock instead of failing at once
+with "database is locked".
+
+Pools are per process.  A sync Gunicorn worker serves one request at a time,
+so the default of 5 (+5 overflow) leaves room for the odd background thread.
+On a server database, budget ``workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW)``
+against its connection limit.
+
+``flask db doctor`` (see :mod:`app.cli`) reports the effective settings via
+:func:`effective_settings` and measures throughput with :func:`probe`.
+``flask db copy`` moves every row to another database, e.g. SQLite to
+Postgres, with :func:`copy_database`.
+"""
+from __future__ import annotations
+
+import time
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, event, func, insert, select, text
+from sqlalchemy.engine import make_url
+
+from .extensions import db
+
+# Applied in this order; busy_timeout first so the others wait for locks too.
+SQLITE_PRAGMAS = ("busy_timeout", "journal_mode", "synchronous", "mmap_size", "cache_size", "temp_store")
+_SYNCHRONOUS = {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"}
+_TEMP_STORE = {0: "DEFAULT", 1: "FILE", 2: "MEMORY"}
+
+COPY_BATCH_SIZE = 5000
+
+_probe_table = Table(
+    "_db_doctor_probe",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("payload", String(64), nullable=False),
+)
+
+
+def _is_memory_sqlite(url) -> bool:
+    database = url.database or ""
+    return database in ("", ":memory:") or "mode=memory" in database
+
+
+def engine_options(config) -> dict:
+    """Pool and driver options for ``SQLALCHEMY_DATABASE_URI``."""
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    options: dict = {}
+    if url.get_backend_name() == "sqlite":
+        if _is_memory_sqlite(url):
+            return options  # single shared connection; pool settings do not apply
+        options["connect_args"] = {"timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000}
+    else:
+        options["pool_pre_ping"] = True
+        options["pool_recycle"] = config["DB_POOL_RECYCLE"]
+    options["pool_size"] = config["DB_POOL_SIZE"]
+    options["max_overflow"] = config["DB_MAX_OVERFLOW"]
+    options["pool_timeout"] = config["DB_POOL_TIMEOUT"]
+    return options
+
+
+def sqlite_pragmas(config) -> dict:
+    """Pragma values to set on each SQLite connection, in application order."""
+    return {
+        "busy_timeout": config["SQLITE_BUSY_TIMEOUT_MS"],
+        "journal_mode": config["SQLITE_JOURNAL_MODE"],
+        "synchronous": config["SQLITE_SYNCHRONOUS"],
+        "mmap_size": config["SQLITE_MMAP_SIZE"],
+        # Negative cache_size is in KiB rather than pages.
+        "cache_size": -abs(config["SQLITE_CACHE_SIZE_KB"]),
+        "temp_store": config["SQLITE_TEMP_STORE"],
+    }
+
+
+def _pragma_listener(pragmas: dict):
+    statements = [f"PRAGMA {name}={value}" for name, value in pragmas.items()]
+
+    def set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    return set_pragmas
+
+
+def init_database(app) -> None:
+    """Initialise Flask-SQLAlchemy with tuned engine options and SQLite pragmas.
+
+    Explicit ``SQLALCHEMY_ENGINE_OPTIONS`` entries win over the derived ones.
+    """
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        **engine_options(app.config),
+        **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+    }
+    db.init_app(app)
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", _pragma_listener(sqlite_pragmas(app.config)))
+
+
+def effective_settings(engine, config) -> list[tuple[str, str, str | None]]:
+    """``(setting, actual, wanted)`` rows describing ``engine``; ``wanted`` is None if not configured."""
+    pool = engine.pool
+    rows: list[tuple[str, str, str | None]] = [
+        ("url", engine.url.render_as_string(hide_password=True), None),
+        ("dialect", f"{engine.dialect.name}+{engine.dialect.driver}", None),
+        ("pool", type(pool).__name__, None),
+    ]
+    if hasattr(pool, "size") and hasattr(pool, "_max_overflow"):
+        rows.append(("pool_size", str(pool.size()), str(config["DB_POOL_SIZE"])))
+        rows.append(("max_overflow", str(pool._max_overflow), str(config["DB_MAX_OVERFLOW"])))
+        rows.append(("pool_timeout", str(pool._timeout), str(config["DB_POOL_TIMEOUT"])))
+    with engine.connect() as conn:
+        if engine.dialect.name != "sqlite":
+            version = conn.execute(select(func.version())).scalar()
+            rows.append(("server_version", str(version), None))
+            return rows
+        rows.append(("sqlite_version", conn.exec_driver_sql("select sqlite_version()").scalar(), None))
+        wanted = sqlite_pragmas(config)
+        for name in SQLITE_PRAGMAS:
+            actual = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+            if name == "synchronous":
+                actual = _SYNCHRONOUS.get(actual, actual)
+            elif name == "temp_store":
+                actual = _TEMP_STORE.get(actual, actual)
+            rows.append((name, str(actual), str(wanted[name])))
+        rows.append(("page_size", str(conn.exec_driver_sql("PRAGMA page_size").scalar()), None))
+    return rows
+
+
+def probe(engine, rows: int = 500) -> dict[str, float]:
+    """Time ``rows`` single-row commits, one batched insert and ``rows`` point reads.
+
+    Uses a scratch table that is dropped afterwards.  Returns operations per second.
+    """
+    results: dict[str, float] = {}
+    _probe_table.drop(engine, checkfirst=True)
+    _probe_table.create(engine)
+    try:
+        started = time.perf_counter()
+        for n in range(rows):
+            with engine.begin() as conn:
+                conn.execute(insert(_probe_table).values(payload=f"commit-{n}"))
+        results["commits/s"] = rows / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(insert(_probe_table), [{"payload": f"batch-{n}"} for n in range(rows * 10)])
+        results["batched inserts/s"] = rows * 10 / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with engine.connect() as conn:
+            for n in range(rows):
+                conn.execute(select(_probe_table.c.payload).where(_probe_table.c.id == n + 1)).scalar()
+        results["point reads/s"] = rows / (time.perf_counter() - started)
+    finally:
+        _probe_table.drop(engine, checkfirst=True)
+    return results
+
+
+def copy_rows_postgres(conn, table, columns: list[str], batches) -> int:
+    """Stream rows into ``table`` with COPY FROM STDIN; returns the row count."""
+    copied = 0
+    preparer = conn.dialect.identifier_preparer
+    statement = f"COPY {preparer.format_table(table)} ({', '.join(preparer.quote(name) for name in columns)}) FROM STDIN"
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        with cursor.copy(statement) as copy:
+            for batch in batches:
+                for row in batch:
+                    copy.write_row(tuple(row))
+                copied += len(batch)
+    finally:
+        cursor.close()
+    return copied
+
+
+def reset_sequence(conn, table) -> None:
+    """Move ``table``'s serial sequence past the highest copied id."""
+    column = table.autoincrement_column
+    if column is None:
+        return
+    preparer = conn.dialect.identifier_preparer
+    name, quoted_table = preparer.quote(column.name), preparer.format_table(table)
+    conn.execute(
+        text(f"SELECT setval(pg_get_serial_sequence(:table, :column), coalesce(max({name}), 0) + 1, false) FROM {quoted_table}"),
+        {"table": quoted_table, "column": column.name},
+    )
+
+
+def copy_database(source_url: str, target_url: str, batch_size: int = COPY_BATCH_SIZE, progress=None) -> dict[str, int]:
+    """Replace the rows of every model table in the migrated ``target_url`` with those of ``source_url``.
+
+    The target is emptied and refilled in foreign-key order inside one
+    transaction, so a failed copy leaves it untouched.  Rows are streamed from the source in
+    batches.  A Postgres target receives them through COPY and has its serial
+    sequences moved past the copied ids; other targets get batched INSERTs.
+    Returns rows copied per table.
+    """
+    source = create_engine(source_url)
+    target = create_engine(target_url)
+    tables = db.metadata.sorted_tables
+    counts: dict[str, int] = {}
+    try:
+        with source.connect() as src, target.begin() as dst:
+            # A freshly migrated database already has the default household user.
+            for table in reversed(tables):
+                dst.execute(table.delete())
+            for table in tables:
+                columns = [column.name for column in table.columns]
+                result = src.execution_options(yield_per=batch_size).execute(
+                    select(*table.columns).order_by(*table.primary_key.columns)
+                )
+                batches = result.partitions()
+                if dst.dialect.name == "postgresql":
+                    counts[table.name] = copy_rows_postgres(dst, table, columns, batches)
+                    reset_sequence(dst, table)
+                else:
+                    counts[table.name] = 0
+                    for batch in batches:
+                        dst.execute(insert(table), [dict(zip(columns, row)) for row in batch])
+                        counts[table.name] += len(batch)
+                if progress is not None:
+                    progress(table.name, counts[table.name])
+    finally:
+        source.dispose()
+        target.dispose()
+    return counts
@@ -0,0 +1,246 @@
+"""Query-plan advisor for the hot request paths (``flask db explain``).
+
+Each path in :func:`hot_paths` is requested through the test client as a real
+user, with the fragment cache off, while an engine event records every SELECT
+the app sends.  Each distinct statement is then explained with its recorded
+parameters: ``EXPLAIN QUERY PLAN`` on SQLite, and ``EXPLAIN (ANALYZE, BUFFERS,
+FORMAT JSON)`` on Postgres, inside a rolled-back transaction.  Full table scans
+and sorts that cannot use an index are flagged.  :func:`suggest_index` proposes
+an index for them: equality columns first, then the sort or range column, then
+the selected columns so the query can be answered from the index alone.
+
+SQLite plans do not depend on table size (without ``ANALYZE`` statistics).
+Postgres plans do, so run it against a realistically seeded database there.
+"""
+from __future__ import annotations
+
+import re
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from sqlalchemy import event, inspect
+
+from .extensions import db
+
+TASK_STATUSES = ("all", "open", "overdue", "done")
+TASK_SORTS = ("due", "title", "created")
+# Past this many extra columns a covering index costs more than the lookups it saves.
+COVERING_MAX_COLUMNS = 4
+_CATALOG_PREFIXES = ("sqlite_", "pg_")
+_ALIAS = re.compile(r'(?:FROM|JOIN)\s+"?(\w+)"?(?:\s+AS\s+"?(\w+)"?)?', re.IGNORECASE)
+_CLAUSE_END = r"(?=\sGROUP BY\s|\sORDER BY\s|\sLIMIT\s|\sOFFSET\s|$)"
+
+
+class Finding(NamedTuple):
+    kind: str   # full-scan | temp-sort | like-scan
+    table: str | None
+    detail: str
+
+
+class Explained(NamedTuple):
+    statement: str
+    paths: list[str]
+    plan: list[str]
+    findings: list[Finding]
+    suggestions: list[str]
+
+
+def hot_paths(search: str = "filter") -> list[tuple[str, str]]:
+    """``(label, url)`` for every hot read path, including each task-list sort/filter combination."""
+    paths = [
+        ("dashboard", "/"),
+        ("asset list", "/assets/"),
+        ("asset search", f"/assets/?q={search}"),
+    ]
+    for status in TASK_STATUSES:
+        for sort in TASK_SORTS:
+            for direction in ("asc", "desc"):
+                paths.append((f"tasks {status} by {sort} {direction}", f"/tasks/?status={status}&sort={sort}&dir={direction}"))
+    for window in ("7d", "30d"):
+        paths.append((f"tasks open within {window}", f"/tasks/?status=open&window={window}"))
+    paths.append(("task search", f"/tasks/?q={search}"))
+    for status in TASK_STATUSES:
+        paths.append((f"export {status}", f"/tasks/export.csv?status={status}"))
+    return paths
+
+
+@contextmanager
+def record_statements(engine):
+    """Collect ``(statement, parameters)`` for every SELECT run on ``engine`` inside the block."""
+    statements: list[tuple[str, object]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def capture(app, user_id: int, paths: list[tuple[str, str]]) -> dict[str, tuple[object, list[str]]]:
+    """Request ``paths`` as ``user_id``; map each distinct statement to its parameters and paths."""
+    captured: dict[str, tuple[object, list[str]]] = {}
+    cache_setting = app.config.get("FRAGMENT_CACHE_ENABLED")
+    app.config["FRAGMENT_CACHE_ENABLED"] = False
+    try:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+        for label, url in paths:
+            with record_statements(db.engine) as statements:
+                response = client.get(url)
+                response.get_data()   # drain streamed responses (CSV export)
+                response.close()
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} answered {response.status_code}")
+            for statement, parameters in statements:
+                if re.search(rf"\sFROM\s+({'|'.join(_CATALOG_PREFIXES)})", statement):
+                    continue   # catalog lookups (e.g. the FTS availability check)
+                captured.setdefault(statement, (parameters, []))[1].append(label)
+    finally:
+        app.config["FRAGMENT_CACHE_ENABLED"] = cache_setting
+    return captured
+
+
+def _aliases(statement: str) -> dict[str, str]:
+    found = {}
+    for table, alias in _ALIAS.findall(statement):
+        found[alias or table] = table
+    return found
+
+
+def _columns(clause: str, alias: str) -> list[str]:
+    seen: list[str] = []
+    for column in re.findall(rf'(?<![\w.]){re.escape(alias)}"?\.\"?(\w+)', clause):
+        if column not in seen:
+            seen.append(column)
+    return seen
+
+
+def _clause(statement: str, keyword: str) -> str:
+    match = re.search(rf"\s{keyword}\s(.*?){_CLAUSE_END}", statement, re.IGNORECASE | re.DOTALL)
+    return match.group(1) if match else ""
+
+
+def suggest_index(statement: str, table: str, dialect: str, existing: list[list[str]]) -> str | None:
+    """``CREATE INDEX`` that would let ``statement`` seek (and cover) ``table``, or None.
+
+    Heuristic, from the SQL text: equality columns, then ORDER BY columns (or
+    else range columns), then the remaining selected columns if there are only
+    a few.  Returns None if an existing index already starts with the proposed key.
+    """
+    aliases = [alias for alias, name in _aliases(statement).items() if name == table]
+    if not aliases:
+        return None
+    select_list = re.split(r"\sFROM\s", statement, maxsplit=1)[0]
+    where, order = _clause(statement, "WHERE"), _clause(statement, "ORDER BY")
+    equality, ranges, ordered, selected = [], [], [], []
+    for alias in aliases:
+        pattern = rf'(?<![\w.]){re.escape(alias)}"?\.\"?(\w+)"?\s*(=|IN\b|<=|>=|<|>|IS NOT NULL|BETWEEN)'
+        for column, operator in re.findall(pattern, where, re.IGNORECASE):
+            (equality if operator.upper() in ("=", "IN") else ranges).append(column)
+        # Only a leading run of this table's ORDER BY terms can come from its index.
+        for term in order.split(","):
+            columns = _columns(term, alias)
+            if not columns:
+                break
+            ordered += columns
+        selected += _columns(select_list, alias)
+    key: list[str] = []
+    for column in [*equality, *(ordered or ranges)]:
+        if column not in key:
+            key.append(column)
+    if not key:
+        return None
+    if any(index[: len(key)] == key for index in existing):
+        return None
+    covering = [column for column in selected if column not in key]
+    if len(covering) > COVERING_MAX_COLUMNS:
+        covering = []
+    name = f"ix_{table}_{'_'.join(key)}"[:63]
+    if dialect == "postgresql":
+        include = f" INCLUDE ({', '.join(covering)})" if covering else ""
+        return f"CREATE INDEX {name} ON {table} ({', '.join(key)}){include}"
+    return f"CREATE INDEX {name} ON {table} ({', '.join([*key, *covering])})"
+
+
+def _sqlite_plan(conn, statement: str, parameters) -> tuple[list[str], list[Finding]]:
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    depth = {0: 0}
+    plan, findings = [], []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, 0) + 1
+        plan.append("  " * (depth[node_id] - 1) + detail)
+        if detail.startswith("SCAN ") and " USING " not in detail and "VIRTUAL TABLE" not in detail:
+            findings.append(Finding("full-scan", detail.split()[1], detail))
+        elif detail.startswith("USE TEMP B-TREE"):
+            findings.append(Finding("temp-sort", None, detail))
+    return plan, findings
+
+
+def _postgres_plan(conn, statement: str, parameters) -> tuple[list[str], list[Finding]]:
+    transaction = conn.begin_nested() if conn.in_transaction() else conn.begin()
+    try:
+        document = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters).scalar()
+    finally:
+        transaction.rollback()
+    plan, findings = [], []
+
+    def walk(node, depth):
+        label = node["Node Type"]
+        if "Relation Name" in node:
+            label += f" on {node['Relation Name']}"
+        if "Index Name" in node:
+            label += f" using {node['Index Name']}"
+        plan.append(f"{'  ' * depth}{label}  (rows={node.get('Actual Rows')}, {node.get('Actual Total Time')} ms)")
+        if node["Node Type"] == "Seq Scan":
+            findings.append(Finding("full-scan", node["Relation Name"], label))
+        elif node["Node Type"] in ("Sort", "Incremental Sort"):
+            findings.append(Finding("temp-sort", None, f"{label} by {', '.join(node.get('Sort Key', []))}"))
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+
+    document = document[0] if isinstance(document, list) else document
+    walk(document["Plan"], 0)
+    plan.append(f"execution {document.get('Execution Time')} ms")
+    return plan, findings
+
+
+def explain_all(captured: dict[str, tuple[object, list[str]]]) -> list[Explained]:
+    """Explain each captured statement and attach findings and index suggestions."""
+    engine = db.engine
+    dialect = engine.dialect.name
+    inspector = inspect(engine)
+    indexes: dict[str, list[list[str]]] = {}
+    results = []
+    with engine.connect() as conn:
+        for statement, (parameters, paths) in captured.items():
+            if dialect == "postgresql":
+                plan, findings = _postgres_plan(conn, statement, parameters)
+            else:
+                plan, findings = _sqlite_plan(conn, statement, parameters)
+            if re.search(r"\sI?LIKE\s", statement, re.IGNORECASE) or "lower(" in statement.lower():
+                findings.append(Finding(
+                    "like-scan", None,
+                    "LIKE '%...%' cannot use a B-tree index; use FTS5 (SQLite) or a pg_trgm GIN index (Postgres)",
+                ))
+            suggestions = []
+            for table in dict.fromkeys(finding.table for finding in findings if finding.table):
+                if table not in indexes:
+                    indexes[table] = [index["column_names"] for index in inspector.get_indexes(table)]
+                suggestion = suggest_index(statement, table, dialect, indexes[table])
+                if suggestion:
+                    suggestions.append(suggestion)
+            if any(finding.kind == "temp-sort" for finding in findings) and not suggestions:
+                for table in dict.fromkeys(_aliases(statement).values()):
+                    if table not in indexes:
+                        indexes[table] = [index["column_names"] for index in inspector.get_indexes(table)]
+                    suggestion = suggest_index(statement, table, dialect, indexes[table])
+                    if suggestion:
+                        suggestions.append(suggestion)
+                        break
+            results.append(Explained(statement, paths, plan, findings, suggestions))
+    return results
@@ -13,6 +13,8 @@ def register_filters(app):
         today = today or date.today()
         if task.status == "done":
             return {"class": "text-bg-success", "label": "Done"}
+        if task.status == "skipped":
+            return {"class": "text-bg-dark", "label": "Skipped"}
         if task.due_date and task.due_date < today:
             return {"class": "text-bg-danger", "label": "Overdue"}
         if task.due_date and (task.due_date - today).days <= 7:
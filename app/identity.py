@@ -0,0 +1,102 @@
+"""Per-request user loading that touches only the ``user`` row.
+
+Flask-Login calls the user loader on every authenticated request, so it has to
+stay cheap no matter how much data the household owns.  An optional per-worker
+cache (``IDENTITY_CACHE_TTL`` seconds, disabled when 0) skips even that single
+primary-key lookup for recently seen users.
+
+Invalidation is local: entries are dropped as soon as *this* worker flushes a
+change to the user row (password, role, email, deletion), but other workers and
+processes keep serving their copy until it expires.  A demoted or deleted user
+can therefore act with the old identity on another worker for up to the TTL,
+which is why it is capped at ``MAX_IDENTITY_CACHE_TTL`` seconds.  Checking a
+shared version instead would cost a query per hit, the lookup being saved.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+from .extensions import db
+from .models import User
+
+# Columns kept in the cache.  The password hash is deliberately left out; it is
+# loaded lazily on the rare occasions it is needed.
+IDENTITY_FIELDS = ("id", "email", "role", "created_at")
+MAX_IDENTITY_CACHE_TTL = 5.0
+
+
+class IdentityCache:
+    """Small thread-safe TTL cache of user column values keyed on user id."""
+
+    def __init__(self, ttl: float = 0, max_entries: int = 10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, values = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            return values
+
+    def set(self, user_id: int, values: dict) -> None:
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int | None) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_identity(mapper, connection, target):  # noqa: ARG001
+    identity_cache.invalidate(target.id)
+
+
+def init_identity(app):
+    ttl = app.config.get("IDENTITY_CACHE_TTL", 0)
+    if ttl > MAX_IDENTITY_CACHE_TTL:
+        app.logger.warning(
+            "IDENTITY_CACHE_TTL=%s exceeds the %ss staleness limit; using %ss.",
+            ttl, MAX_IDENTITY_CACHE_TTL, MAX_IDENTITY_CACHE_TTL,
+        )
+        ttl = MAX_IDENTITY_CACHE_TTL
+    identity_cache.ttl = ttl
+    identity_cache.clear()
+
+
+def load_identity(user_id: int) -> User | None:
+    """Return the user for ``user_id`` without loading any relationships."""
+    if identity_cache.ttl > 0:
+        values = identity_cache.get(user_id)
+        if values is not None:
+            user = User(**values)
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None and identity_cache.ttl > 0:
+        identity_cache.set(user_id, {field: getattr(user, field) for field in IDENTITY_FIELDS})
+    return user
@@ -0,0 +1,309 @@
+"""Bulk import of assets and tasks from CSV or JSON.
+
+Accepts the columns produced by ``tasks.export_tasks`` (Title, Asset, Due,
+Status, Completed) plus optional task fields (Description, Cost, Vendor,
+Recurrence, Priority, Estimated Minutes) and asset fields (Asset Type, Make,
+Model, Serial, Purchase Date, Warranty Expiration, Asset Notes).  Rows without
+a title only create their asset.  Existing assets are matched by name
+(case-insensitive) and left untouched.
+
+Rows are validated in a single streaming pass; valid rows are inserted with
+executemany in chunks, each chunk in its own transaction, and invalid rows are
+reported without aborting the rest of the file.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+from sqlalchemy import insert, select
+
+from .extensions import db
+from .models import Asset, Task
+from .recurrence import adopt_series, compile_rule
+from .stats import StatsDelta, TaskFacts, bump_data_version
+from .utils.dates import parse_iso_date
+
+CHUNK_SIZE = 1000
+JSON_READ_SIZE = 64 * 1024
+MAX_JSON_ROW_CHARS = 1024 * 1024
+_DELIMITER = re.compile(r"[\s,\]]")
+MAX_REPORTED_ERRORS = 100
+TASK_STATUSES = set(Task.__table__.c.status.type.enums)
+
+_ALIASES = {
+    "asset_name": "asset",
+    "due": "due_date",
+    "completed": "completed_at",
+    "recurrence": "recurrence_rule",
+    "type": "asset_type",
+    "notes": "asset_notes",
+}
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    assets_created: int = 0
+    tasks_created: int = 0
+    error_count: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+    def add_error(self, row_number: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+
+def read_rows(stream, fmt: str = "csv") -> Iterator[dict]:
+    """Yield dict rows from a text stream in CSV, JSON array or JSON Lines format."""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    head = stream.read(1)
+    while head and head.isspace():
+        head = stream.read(1)
+    if head == "[":
+        yield from _array_items(stream, JSON_READ_SIZE)
+        return
+    first = True
+    for line in stream:
+        if first:
+            line, first = head + line, False
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line
+
+
+def _array_items(stream, chunk_size: int) -> Iterator:
+    """Decode the elements of a JSON array one at a time; the opening bracket is already consumed.
+
+    Only the current element and one read-ahead chunk are held in memory, so a
+    large array imports in bounded space just like JSON Lines.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    expect = "first"   # first | value | separator
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        if len(buffer) - pos > MAX_JSON_ROW_CHARS:
+            raise ValueError(f"JSON row is larger than {MAX_JSON_ROW_CHARS} characters.")
+        chunk = stream.read(chunk_size)
+        buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+        return not eof
+
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        if pos == len(buffer):
+            if not fill():
+                raise ValueError("Unexpected end of JSON array.")
+            continue
+        char = buffer[pos]
+        if char == "]" and expect != "value":
+            return
+        if expect == "separator":
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' in JSON array, found '{char}'.")
+            pos, expect = pos + 1, "value"
+            continue
+        # A number or literal is only complete once its delimiter has been read.
+        if char not in '{["' and not eof and not _DELIMITER.search(buffer, pos):
+            fill()
+            continue
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if fill():
+                continue
+            raise
+        if end - pos > MAX_JSON_ROW_CHARS:
+            raise ValueError(f"JSON row is larger than {MAX_JSON_ROW_CHARS} characters.")
+        pos, expect = end, "separator"
+        yield item
+
+
+def format_for(filename: str | None) -> str:
+    name = (filename or "").lower()
+    return "json" if name.endswith((".json", ".jsonl", ".ndjson")) else "csv"
+
+
+def open_text(binary_stream):
+    return io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+
+
+@lru_cache(maxsize=256)
+def _column(key: str) -> str:
+    name = key.strip().lower().replace(" ", "_").replace("-", "_")
+    return _ALIASES.get(name, name)
+
+
+def _normalize(raw: dict) -> dict:
+    if isinstance(raw, str):
+        raise ValueError("Invalid JSON row.")
+    if not isinstance(raw, dict):
+        raise ValueError("Row must be an object with named columns.")
+    record = {}
+    for key, value in raw.items():
+        if key is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        record[_column(str(key))] = None if value in ("", None) else value
+    return record
+
+
+def _date(record: dict, name: str):
+    value = record.get(name)
+    if value is None:
+        return None
+    parsed = parse_iso_date(str(value))
+    if parsed is None:
+        raise ValueError(f"Invalid {name.replace('_', ' ')} '{value}'.")
+    return parsed
+
+
+def _int(record: dict, name: str, default: int = 0) -> int:
+    value = record.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name.replace('_', ' ')} '{value}'.") from None
+
+
+def _text(record: dict, name: str, column, label: str | None = None) -> str | None:
+    """Return field ``name`` as a string that fits ``column``, or None when blank."""
+    value = record.get(name)
+    if value is None:
+        return None
+    label = label or name.replace("_", " ").capitalize()
+    if isinstance(value, (dict, list)):
+        raise ValueError(f"{label} must be text.")
+    value = str(value)
+    length = getattr(column.type, "length", None)
+    if length is not None and len(value) > length:
+        raise ValueError(f"{label} is longer than {length} characters.")
+    return value
+
+
+def _validate(record: dict) -> tuple[str, dict, dict | None]:
+    asset_name = _text(record, "asset", Asset.name, "Asset name")
+    if not asset_name:
+        raise ValueError("Asset is required.")
+    asset_values = {
+        "name": asset_name,
+        "type": _text(record, "asset_type", Asset.type),
+        "make": _text(record, "make", Asset.make),
+        "model": _text(record, "model", Asset.model),
+        "serial": _text(record, "serial", Asset.serial),
+        "purchase_date": _date(record, "purchase_date"),
+        "warranty_expiration": _date(record, "warranty_expiration"),
+        "notes": _text(record, "asset_notes", Asset.notes),
+    }
+
+    title = _text(record, "title", Task.title)
+    if not title:
+        return asset_name, asset_values, None
+    status = str(record.get("status") or "pending").lower()
+    if status not in TASK_STATUSES:
+        raise ValueError(f"Unknown status '{status}'.")
+    completed_at = record.get("completed_at")
+    if completed_at is not None:
+        try:
+            completed_at = datetime.fromisoformat(str(completed_at))
+        except ValueError:
+            raise ValueError(f"Invalid completed timestamp '{completed_at}'.") from None
+    rule = _text(record, "recurrence_rule", Task.recurrence_rule, "Recurrence")
+    if rule is not None:
+        try:
+            compile_rule(rule)
+        except ValueError as exc:
+            raise ValueError(f"Invalid recurrence '{rule}': {exc}") from None
+    cost = record.get("cost")
+    if cost is not None:
+        try:
+            cost = Decimal(str(cost)).quantize(Decimal("0.01"))
+        except InvalidOperation:
+            raise ValueError(f"Invalid cost '{cost}'.") from None
+    task_values = {
+        "title": title,
+        "description": _text(record, "description", Task.description),
+        "due_date": _date(record, "due_date"),
+        "recurrence_rule": rule,
+        "status": status,
+        "priority": _int(record, "priority"),
+        "estimated_minutes": _int(record, "estimated_minutes"),
+        "cost": cost,
+        "vendor": _text(record, "vendor", Task.vendor),
+        "updated_at": completed_at,
+    }
+    return asset_name, asset_values, task_values
+
+
+def import_rows(user_id: int, rows: Iterable[dict], chunk_size: int = CHUNK_SIZE) -> ImportReport:
+    """Validate and insert ``rows`` for ``user_id``; commits once per chunk."""
+    report = ImportReport()
+    asset_ids = {
+        name.lower(): asset_id
+        for asset_id, name in db.session.execute(select(Asset.id, Asset.name).where(Asset.user_id == user_id))
+    }
+    new_assets: dict[str, dict] = {}
+    new_tasks: list[tuple[str, dict]] = []
+    imported_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def flush():
+        if new_assets:
+            result = db.session.execute(
+                insert(Asset).returning(Asset.id, sort_by_parameter_order=True),
+                [{"user_id": user_id, **values} for values in new_assets.values()],
+            )
+            for key, asset_id in zip(new_assets, result.scalars()):
+                asset_ids[key] = asset_id
+            report.assets_created += len(new_assets)
+        if new_tasks:
+            delta = StatsDelta()
+            payload = []
+            for key, values in new_tasks:
+                values = {**values, "user_id": user_id, "asset_id": asset_ids[key]}
+                values["updated_at"] = values["updated_at"] or imported_at
+                delta.add(TaskFacts(values["status"], values["updated_at"], values["cost"]))
+                payload.append(values)
+            db.session.execute(insert(Task), payload)
+            delta.apply(user_id)
+            report.tasks_created += len(payload)
+        if new_assets or new_tasks:
+            bump_data_version(user_id)
+            db.session.commit()
+        new_assets.clear()
+        new_tasks.clear()
+
+    for number, raw in enumerate(rows, start=1):
+        report.rows += 1
+        try:
+            asset_name, asset_values, task_values = _validate(_normalize(raw))
+        except ValueError as exc:
+            report.add_error(number, str(exc))
+            continue
+        key = asset_name.lower()
+        if key not in asset_ids and key not in new_assets:
+            new_assets[key] = asset_values
+        if task_values is not None:
+            new_tasks.append((key, task_values))
+        if len(new_tasks) + len(new_assets) >= chunk_size:
+            flush()
+    flush()
+    if report.tasks_created and adopt_series(user_id):
+        db.session.commit()
+    return report
@@ -0,0 +1,204 @@
+"""Per-request SQL instrumentation.
+
+Engine ``before/after_cursor_execute`` hooks count the statements each request
+issues and add up their time.  Template rendering is timed through Flask's
+``before_render_template``/``template_rendered`` signals.  With
+``SERVER_TIMING`` on, every response carries the totals, e.g.
+``Server-Timing: db;dur=3.1;desc="7 queries", render;dur=5.4, app;dur=12.0``,
+which browser dev tools show next to the request.  Streamed responses (the
+CSV export) report only what ran before the first chunk.
+
+Any statement slower than ``SLOW_QUERY_MS`` is logged to ``app.sql`` with its
+duration, the endpoint that issued it and a fingerprint: a hash of the SQL with
+literals and ``IN`` lists collapsed, so repeats group together.
+
+:func:`count_queries` and :func:`assert_max_queries` are for tests (see
+tests/test_query_budgets.py, which holds every page in :data:`QUERY_BUDGETS`
+and :data:`API_QUERY_BUDGETS` to its budget).  :func:`check_query_budgets`
+backs ``flask db query-budget``, which fails when a hot page issues more
+statements than its budget.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+from .extensions import db
+
+SLOW_QUERY_LOG_CHARS = 1000
+
+# Most statements each hot page may issue for a signed-in user.  Raise a
+# budget only on purpose: a jump usually means a lazy load inside a loop.
+QUERY_BUDGETS = {
+    "/": 8,
+    "/assets/": 3,
+    "/tasks/": 3,
+    "/tasks/?status=overdue&sort=title": 3,
+    "/tasks/export.csv": 3,
+}
+# The same for /api/v1 collections, requested with a bearer token: the token
+# lookup plus one statement for the page.
+API_QUERY_BUDGETS = {
+    "/api/v1/assets": 2,
+    "/api/v1/tasks": 2,
+    "/api/v1/tasks?status=open&fields=title,due_date&limit=50": 2,
+    "/api/v1/attachments": 2,
+}
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|%\(\w+\)s|:\w+)\s*,?)+\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+class RequestStats:
+    """Statement count and time spent in the database and templates for one request."""
+
+    __slots__ = ("started", "queries", "db_ms", "render_ms", "_render_started")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self._render_started: list[float] = []
+
+    def server_timing(self) -> str:
+        total = (time.perf_counter() - self.started) * 1000
+        return (
+            f'db;dur={self.db_ms:.1f};desc="{self.queries} queries", '
+            f"render;dur={self.render_ms:.1f}, app;dur={total:.1f}"
+        )
+
+
+def fingerprint(statement: str) -> str:
+    """Short stable id for ``statement`` with literals and IN lists collapsed."""
+    normalized = _SPACE.sub(" ", _IN_LIST.sub("IN (?)", _LITERAL.sub("?", statement))).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+
+
+def request_stats() -> RequestStats | None:
+    """Stats of the current request, or None outside a request."""
+    if not has_request_context():
+        return None
+    return g.get("_sql_stats")
+
+
+def init_instrumentation(app) -> None:
+    slow_ms = app.config["SLOW_QUERY_MS"]
+    slow_log = logging.getLogger(f"{app.logger.name}.sql")
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+        stats = request_stats()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_ms += elapsed
+        if slow_ms and elapsed >= slow_ms:
+            endpoint = (request.endpoint or request.path) if has_request_context() else "-"
+            slow_log.warning(
+                "Slow query %.1f ms [%s] endpoint=%s: %s",
+                elapsed,
+                fingerprint(statement),
+                endpoint,
+                _SPACE.sub(" ", statement)[:SLOW_QUERY_LOG_CHARS],
+            )
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", after_cursor_execute)
+
+    @app.before_request
+    def start_request_stats():
+        g._sql_stats = RequestStats()
+
+    def render_started(sender, template, context, **extra):
+        stats = request_stats()
+        if stats is not None:
+            stats._render_started.append(time.perf_counter())
+
+    def render_finished(sender, template, context, **extra):
+        stats = request_stats()
+        if stats is not None and stats._render_started:
+            stats.render_ms += (time.perf_counter() - stats._render_started.pop()) * 1000
+
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
+
+    if app.config["SERVER_TIMING"]:
+        @app.after_request
+        def add_server_timing(response):
+            stats = request_stats()
+            if stats is not None:
+                response.headers["Server-Timing"] = stats.server_timing()
+            return response
+
+
+class QueryLog(NamedTuple):
+    statements: list[str]
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Record every statement run on ``engine`` (default: the app's) inside the block.
+
+    >>> with count_queries() as log:
+    ...     client.get("/tasks/")
+    >>> log.count
+    """
+    engine = engine or db.engine
+    log = QueryLog([])
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        log.statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield log
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@contextmanager
+def assert_max_queries(limit: int, engine=None):
+    """Fail with the offending statements if the block runs more than ``limit`` of them."""
+    with count_queries(engine) as log:
+        yield log
+    if log.count > limit:
+        listing = "\n".join(f"  {number}. {_SPACE.sub(' ', sql)[:200]}" for number, sql in enumerate(log.statements, 1))
+        raise AssertionError(f"{log.count} queries, expected at most {limit}:\n{listing}")
+
+
+def check_query_budgets(app, user_id: int, budgets: dict[str, int] | None = None) -> list[tuple[str, int, int]]:
+    """``(url, queries, budget)`` for each budgeted page requested as ``user_id``, fragment cache off."""
+    results = []
+    cache_setting = app.config.get("FRAGMENT_CACHE_ENABLED")
+    app.config["FRAGMENT_CACHE_ENABLED"] = False
+    try:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+        for url, budget in (budgets or QUERY_BUDGETS).items():
+            with count_queries() as log:
+                response = client.get(url)
+                response.get_data()
+                response.close()
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} answered {response.status_code}")
+            results.append((url, log.count, budget))
+    finally:
+        app.config["FRAGMENT_CACHE_ENABLED"] = cache_setting
+    return results
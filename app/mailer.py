@@ -0,0 +1,260 @@
+"""Outbox delivery over SMTP.
+
+Messages are queued in the ``outbox`` table (see :func:`queue_messages`) and
+sent later by :func:`deliver_outbox`.  Delivery uses a bounded thread pool in
+which each worker thread reuses one SMTP connection.  Failed sends are retried
+with exponential backoff until ``MAIL_MAX_ATTEMPTS`` is reached.
+
+Each batch is claimed before it is sent (``pending`` -> ``sending`` with
+``claimed_at``, in one ``UPDATE … RETURNING``), so overlapping runs, such as a
+manual ``flask reminders deliver`` during the scheduled job, never send the
+same message twice.  A run that dies leaves its claims behind; they go back to
+``pending`` after ``MAIL_CLAIM_TIMEOUT_SECONDS``.  Each message's
+``Message-ID`` is derived from its idempotency key, so such a resend can be
+de-duplicated downstream.
+
+Without ``SMTP_HOST`` nothing is sent: due messages stay pending and are
+reported as held, so they go out once SMTP is configured.  For development,
+point ``SMTP_HOST``/``SMTP_PORT`` at a local debugging server such as
+``python -m aiosmtpd -n -l localhost:1025``.
+"""
+from __future__ import annotations
+
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from hashlib import sha1
+from typing import Iterable, NamedTuple
+
+from flask import current_app
+from sqlalchemy import func, insert, select, update
+
+from .extensions import db
+from .models import OutboxMessage
+
+DELIVERY_BATCH_SIZE = 100
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 6 * 60 * 60
+# The server rejected the message itself; retrying will not help.
+_PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPNotSupportedError)
+
+
+class Outgoing(NamedTuple):
+    idempotency_key: str
+    recipient: str
+    subject: str
+    body: str
+    user_id: int | None = None
+
+
+class DeliveryReport(NamedTuple):
+    sent: int
+    retrying: int
+    failed: int
+    held: int = 0   # due but left pending because SMTP_HOST is unset
+
+
+def queue_messages(messages: Iterable[Outgoing], now: datetime | None = None) -> int:
+    """Add ``messages`` to the outbox, skipping keys already queued; the caller commits."""
+    batch = list(messages)
+    if not batch:
+        return 0
+    keys = [message.idempotency_key for message in batch]
+    existing = set(
+        db.session.execute(select(OutboxMessage.idempotency_key).where(OutboxMessage.idempotency_key.in_(keys))).scalars()
+    )
+    now = now or datetime.utcnow()
+    rows = [
+        {**message._asdict(), "status": "pending", "attempts": 0, "next_attempt_at": now}
+        for message in batch
+        if message.idempotency_key not in existing
+    ]
+    if rows:
+        db.session.execute(insert(OutboxMessage), rows)
+    return len(rows)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff after the ``attempts``-th failed try: 1, 2, 4 ... minutes, capped at 6 hours."""
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+class _SmtpPool:
+    """One lazily opened SMTP connection per worker thread."""
+
+    def __init__(self, config):
+        self.host = config.get("SMTP_HOST")
+        self.port = config.get("SMTP_PORT", 25)
+        self.username = config.get("SMTP_USERNAME")
+        self.password = config.get("SMTP_PASSWORD")
+        self.starttls = config.get("SMTP_STARTTLS", False)
+        self.timeout = config.get("SMTP_TIMEOUT", 30)
+        self._local = threading.local()
+        self._connections: list[smtplib.SMTP] = []
+        self._lock = threading.Lock()
+
+    def _connection(self) -> smtplib.SMTP:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                conn.starttls()
+            if self.username:
+                conn.login(self.username, self.password or "")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _drop(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def send(self, message: EmailMessage) -> None:
+        try:
+            self._connection().send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Stale pooled connection: reconnect once before reporting failure.
+            self._drop()
+            self._connection().send_message(message)
+        except (smtplib.SMTPException, OSError):
+            self._drop()
+            raise
+
+    def close(self) -> None:
+        for conn in self._connections:
+            try:
+                conn.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+
+def recover_stale_claims(timeout_seconds: float, now: datetime | None = None) -> int:
+    """Return messages claimed more than ``timeout_seconds`` ago to the queue; the caller commits."""
+    now = now or datetime.utcnow()
+    result = db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.status == "sending", OutboxMessage.claimed_at < now - timedelta(seconds=timeout_seconds))
+        .values(status="pending", claimed_at=None, next_attempt_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def _claim_batch(now: datetime) -> tuple[datetime, list]:
+    """Claim up to DELIVERY_BATCH_SIZE due messages for this run and commit the claim."""
+    claim = datetime.utcnow()
+    due = (
+        select(OutboxMessage.id)
+        .where(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now)
+        .order_by(OutboxMessage.id)
+        .limit(DELIVERY_BATCH_SIZE)
+    )
+    rows = db.session.execute(
+        update(OutboxMessage)
+        # status is checked again here: a concurrent run may have claimed a row
+        # between the subquery and the update.
+        .where(OutboxMessage.id.in_(due.scalar_subquery()), OutboxMessage.status == "pending")
+        .values(status="sending", claimed_at=claim)
+        .returning(
+            OutboxMessage.id,
+            OutboxMessage.idempotency_key,
+            OutboxMessage.recipient,
+            OutboxMessage.subject,
+            OutboxMessage.body,
+            OutboxMessage.attempts,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    return claim, sorted(rows, key=lambda row: row.id)
+
+
+def _build(row, sender: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = row.recipient
+    message["Subject"] = row.subject
+    domain = sender.rpartition("@")[2] or "localhost"
+    message["Message-ID"] = f"<{sha1(row.idempotency_key.encode('utf-8')).hexdigest()}@{domain}>"
+    message.set_content(row.body)
+    return message
+
+
+def deliver_outbox() -> DeliveryReport:
+    """Send every due outbox message; commits after each batch."""
+    config = current_app.config
+    logger = current_app.logger
+    max_attempts = config["MAIL_MAX_ATTEMPTS"]
+    now = datetime.utcnow()
+    recovered = recover_stale_claims(config["MAIL_CLAIM_TIMEOUT_SECONDS"], now)
+    db.session.commit()
+    if recovered:
+        logger.warning("Outbox: %s message(s) from an interrupted run queued again.", recovered)
+    if not config.get("SMTP_HOST"):
+        held = db.session.execute(
+            select(func.count(OutboxMessage.id)).where(
+                OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now
+            )
+        ).scalar()
+        if held:
+            logger.warning("SMTP_HOST is unset: %s outbox message(s) held until it is configured.", held)
+        return DeliveryReport(0, 0, 0, held)
+
+    pool = _SmtpPool(config)
+    sent = retrying = failed = 0
+
+    def send(row):
+        try:
+            pool.send(_build(row, config["MAIL_FROM"]))
+            return None
+        except Exception as exc:  # noqa: BLE001 - recorded on the outbox row
+            return exc
+
+    try:
+        with ThreadPoolExecutor(max_workers=config["MAIL_WORKERS"], thread_name_prefix="mailer") as executor:
+            while True:
+                claim, rows = _claim_batch(now)
+                if not rows:
+                    break
+                for row, error in zip(rows, executor.map(send, rows)):
+                    attempts = row.attempts + 1
+                    values = {"attempts": attempts}
+                    if error is None:
+                        values.update(status="sent", sent_at=datetime.utcnow(), last_error=None)
+                        sent += 1
+                    elif isinstance(error, _PERMANENT_ERRORS) or attempts >= max_attempts:
+                        values.update(status="failed", last_error=f"{type(error).__name__}: {error}")
+                        logger.error("Mail to %s failed permanently: %s", row.recipient, error)
+                        failed += 1
+                    else:
+                        values.update(
+                            status="pending",
+                            claimed_at=None,
+                            next_attempt_at=datetime.utcnow() + retry_delay(attempts),
+                            last_error=f"{type(error).__name__}: {error}",
+                        )
+                        logger.warning("Mail to %s failed (attempt %s), will retry: %s", row.recipient, attempts, error)
+                        retrying += 1
+                    result = db.session.execute(
+                        update(OutboxMessage)
+                        .where(
+                            OutboxMessage.id == row.id,
+                            OutboxMessage.status == "sending",
+                            OutboxMessage.claimed_at == claim,
+                        )
+                        .values(**values)
+                    )
+                    if not result.rowcount:
+                        logger.warning("Outbox message %s was reclaimed while this run was sending it.", row.id)
+                db.session.commit()
+    finally:
+        pool.close()
+    return DeliveryReport(sent, retrying, failed)
@@ -0,0 +1,344 @@
+"""Prometheus metrics shared by every worker process (``GET /metrics``).
+
+Each process counts into a small in-memory registry: request latency and status
+per endpoint, upload bytes, scheduler job durations, and its connection-pool
+state.  A daemon thread writes the registry as JSON to
+``METRICS_DIR/<host>-<pid>-<token>.json`` at most every
+``METRICS_FLUSH_SECONDS``, so the cost per request is a few dict updates.  A
+scrape, answered by whichever worker gets it, merges the files of all workers
+and the scheduler.  Counters and histograms of exited processes are folded into
+``archive.json`` so totals never go backwards.  Their gauges are dropped.
+Liveness is checked per host, so containers can share the directory.
+
+``METRICS_TOKEN``, if set, must be sent as ``Authorization: Bearer <token>``.
+"""
+from __future__ import annotations
+
+import atexit
+import fcntl
+import json
+import os
+import secrets
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from flask import Response, abort, current_app, g, request
+
+from .extensions import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0)
+ARCHIVE_FILE = "archive.json"
+
+# name -> (type, help, histogram buckets)
+FAMILIES = {
+    "hmt_http_requests_total": ("counter", "HTTP responses by endpoint, method and status.", None),
+    "hmt_http_request_duration_seconds": ("histogram", "Time to produce a response, by endpoint.", LATENCY_BUCKETS),
+    "hmt_upload_bytes_total": ("counter", "Bytes received in attachment uploads.", None),
+    "hmt_uploads_total": ("counter", "Attachment uploads; deduplicated ones matched a stored blob.", None),
+    "hmt_scheduler_job_duration_seconds": ("histogram", "Scheduler job run time.", JOB_BUCKETS),
+    "hmt_scheduler_job_runs_total": ("counter", "Scheduler job runs by outcome.", None),
+    "hmt_db_pool_size": ("gauge", "Connections the pools keep open, summed over live processes.", None),
+    "hmt_db_pool_checked_out": ("gauge", "Pooled connections in use, summed over live processes.", None),
+    "hmt_db_pool_overflow": ("gauge", "Connections opened beyond the pool size, summed over live processes.", None),
+    "hmt_metrics_processes": ("gauge", "Live processes contributing metrics.", None),
+}
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Registry:
+    """Counters, histograms and gauges of one process."""
+
+    def __init__(self):
+        self.counters: dict[tuple[str, Labels], float] = defaultdict(float)
+        self.histograms: dict[tuple[str, Labels], list[float]] = {}
+        self.gauges: dict[tuple[str, Labels], float] = {}
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        with self.lock:
+            self.counters[name, tuple(sorted(labels.items()))] += amount
+            self.dirty = True
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        buckets = FAMILIES[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            # Per-bucket counts (not cumulative), then +Inf, sum and count.
+            series = self.histograms.get(key)
+            if series is None:
+                series = self.histograms[key] = [0.0] * (len(buckets) + 3)
+            index = 0
+            while index < len(buckets) and value > buckets[index]:
+                index += 1
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+            self.dirty = True
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        with self.lock:
+            self.gauges[name, tuple(sorted(labels.items()))] = value
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            self.dirty = False
+            return {
+                "counters": [[name, labels, value] for (name, labels), value in self.counters.items()],
+                "histograms": [[name, labels, list(series)] for (name, labels), series in self.histograms.items()],
+                "gauges": [[name, labels, value] for (name, labels), value in self.gauges.items()],
+            }
+
+
+class Spool:
+    """The per-process JSON files in ``METRICS_DIR`` and their aggregation."""
+
+    def __init__(self, directory: str, flush_seconds: float, engine=None, logger=None):
+        self.directory = Path(directory)
+        self.flush_seconds = flush_seconds
+        self.engine = engine
+        self.logger = logger
+        self.host = socket.gethostname()
+        self._pid = None
+        self._registry = Registry()
+        self._lock = threading.Lock()
+
+    @property
+    def registry(self) -> Registry:
+        # A forked worker starts with an empty registry and its own file and flusher.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._registry = Registry()
+                    self._token = secrets.token_hex(4)
+                    self._pid = os.getpid()
+                    threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+                    atexit.register(self.flush)
+        return self._registry
+
+    @property
+    def path(self) -> Path:
+        return self.directory / f"{self.host}-{self._pid}-{self._token}.json"
+
+    def _sample_pool(self) -> None:
+        pool = getattr(self.engine, "pool", None)
+        if pool is None or not hasattr(pool, "checkedout"):
+            return
+        registry = self.registry
+        registry.set_gauge("hmt_db_pool_size", pool.size())
+        registry.set_gauge("hmt_db_pool_checked_out", pool.checkedout())
+        registry.set_gauge("hmt_db_pool_overflow", max(0, pool.overflow()))
+
+    def flush(self) -> None:
+        """Write this process's registry to its spool file."""
+        self._sample_pool()
+        snapshot = self.registry.snapshot()
+        _write_json(self.path, {"host": self.host, "pid": self._pid, **snapshot})
+
+    def _flush_loop(self) -> None:
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.flush_seconds)
+            if self._registry.dirty:
+                try:
+                    self.flush()
+                except OSError:
+                    if self.logger is not None:
+                        self.logger.exception("Could not write metrics to %s", self.directory)
+
+    def _alive(self, document: dict, path: Path) -> bool:
+        if document.get("host") != self.host:
+            return True   # another container; its own scrapes take care of it
+        pid = document.get("pid")
+        if pid == os.getpid():
+            return path == self.path
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except (PermissionError, TypeError):
+            return True
+        return True
+
+    def collect(self) -> tuple[dict, int]:
+        """Merged series of every process, and how many live processes contributed."""
+        self.flush()
+        merged = _empty()
+        processes = 0
+        with open(self.directory / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive = _empty()
+            _merge(archive, _read_json(self.directory / ARCHIVE_FILE) or {}, gauges=False)
+            archived = False
+            for path in self.directory.glob("*-*-*.json"):
+                document = _read_json(path)
+                if document is None:
+                    continue
+                if self._alive(document, path):
+                    _merge(merged, document, gauges=True)
+                    processes += 1
+                else:
+                    _merge(archive, document, gauges=False)
+                    path.unlink(missing_ok=True)
+                    archived = True
+            if archived:
+                _write_json(self.directory / ARCHIVE_FILE, _listed(archive))
+        _merge(merged, _listed(archive), gauges=False)
+        return merged, processes
+
+
+def _empty() -> dict:
+    return {"counters": defaultdict(float), "histograms": {}, "gauges": defaultdict(float)}
+
+
+def _listed(merged: dict) -> dict:
+    return {
+        "counters": [[name, labels, value] for (name, labels), value in merged["counters"].items()],
+        "histograms": [[name, labels, series] for (name, labels), series in merged["histograms"].items()],
+    }
+
+
+def _merge(target: dict, document: dict, gauges: bool) -> None:
+    for name, labels, value in document.get("counters", []):
+        target["counters"][name, tuple(map(tuple, labels))] += value
+    for name, labels, series in document.get("histograms", []):
+        key = (name, tuple(map(tuple, labels)))
+        existing = target["histograms"].get(key)
+        if existing is None or len(existing) != len(series):
+            target["histograms"][key] = list(series)
+        else:
+            target["histograms"][key] = [a + b for a, b in zip(existing, series)]
+    if gauges:
+        for name, labels, value in document.get("gauges", []):
+            target["gauges"][name, tuple(map(tuple, labels))] += value
+
+
+def _read_json(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: Path, document: dict) -> None:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "w") as handle:
+        json.dump(document, handle, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Labels, extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(merged: dict, processes: int) -> str:
+    """Prometheus text exposition format (0.0.4) of ``merged``."""
+    merged["gauges"]["hmt_metrics_processes", ()] = processes
+    lines = []
+    for name, (kind, description, buckets) in FAMILIES.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            for (series_name, labels), series in sorted(merged["histograms"].items()):
+                if series_name != name:
+                    continue
+                cumulative = 0.0
+                for bound, count in zip([*buckets, "+Inf"], series[:-2]):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(labels, (('le', le),))} {_number(cumulative)}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(series[-2])}")
+                lines.append(f"{name}_count{_labels(labels)} {_number(series[-1])}")
+        else:
+            source = merged["counters"] if kind == "counter" else merged["gauges"]
+            for (series_name, labels), value in sorted(source.items()):
+                if series_name == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def get_spool() -> Spool | None:
+    return current_app.extensions.get("metrics")
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    """Add to a counter of the current app's metrics (no-op when disabled)."""
+    spool = get_spool()
+    if spool is not None:
+        spool.registry.inc(name, amount, **labels)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Record a histogram observation (no-op when disabled)."""
+    spool = get_spool()
+    if spool is not None:
+        spool.registry.observe(name, value, **labels)
+
+
+def metrics_view():
+    token = current_app.config["METRICS_TOKEN"]
+    if token and not secrets.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        abort(404)
+    merged, processes = get_spool().collect()
+    response = Response(render(merged, processes), mimetype="text/plain")
+    response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def init_metrics(app) -> None:
+    """Record request metrics and serve ``/metrics`` when ``METRICS_ENABLED``."""
+    if not app.config["METRICS_ENABLED"]:
+        return
+    directory = app.config["METRICS_DIR"]
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    # The spool is per-machine runtime state; keep it out of version control
+    # even when METRICS_DIR points inside a checkout.
+    ignore = Path(directory) / ".gitignore"
+    if not ignore.exists():
+        try:
+            ignore.write_text("*\n")
+        except OSError:
+            pass
+    with app.app_context():
+        engine = db.engine
+    spool = Spool(directory, app.config["METRICS_FLUSH_SECONDS"], engine, app.logger)
+    app.extensions["metrics"] = spool
+
+    @app.before_request
+    def start_metrics_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            endpoint = request.endpoint or "unmatched"
+            registry = spool.registry
+            registry.observe("hmt_http_request_duration_seconds", time.perf_counter() - started, endpoint=endpoint)
+            registry.inc(
+                "hmt_http_requests_total",
+                endpoint=endpoint,
+                method=request.method,
+                status=str(response.status_code),
+            )
+        return response
+
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
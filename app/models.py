@@ -1,5 +1,5 @@
 
-from sqlalchemy import func
+from sqlalchemy import func, text
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from .extensions import db
@@ -13,8 +13,10 @@ class User(UserMixin, db.Model):
     role = db.Column(db.String(20), default="member", nullable=False)
     created_at = db.Column(db.DateTime, server_default=func.now())
 
-    assets = db.relationship("Asset", back_populates="owner", lazy="selectin", cascade="all, delete-orphan")
-    tasks = db.relationship("Task", back_populates="owner", lazy="selectin", cascade="all, delete-orphan")
+    # Loaded only on access: the user row is fetched on every request and must
+    # not drag the household's assets/tasks along with it.
+    assets = db.relationship("Asset", back_populates="owner", lazy="select", cascade="all, delete-orphan")
+    tasks = db.relationship("Task", back_populates="owner", lazy="select", cascade="all, delete-orphan")
 
     def set_password(self, password: str):
         self.password_hash = generate_password_hash(password)
@@ -43,9 +45,9 @@ class Asset(db.Model):
     warranty_expiration = db.Column(db.Date, nullable=True)
     notes = db.Column(db.Text)
 
-    tasks = db.relationship("Task", back_populates="asset", lazy="selectin", cascade="all, delete-orphan")
+    tasks = db.relationship("Task", back_populates="asset", lazy="select", cascade="all, delete-orphan")
     attachments = db.relationship("Attachment", back_populates="asset", cascade="all, delete-orphan")
-    owner = db.relationship("User", back_populates="assets", lazy="joined")
+    owner = db.relationship("User", back_populates="assets", lazy="select")
 
     created_at = db.Column(db.DateTime, default=func.now())
     updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now())
@@ -56,6 +58,25 @@ class Task(db.Model):
     __table_args__ = (
         db.Index("ix_task_user_status_due", "user_id", "status", "due_date"),
         db.Index("ix_task_user_asset", "user_id", "asset_id"),
+        # Keyset pagination: one index per task-list sort order, id as tie-breaker.
+        db.Index("ix_task_user_due_id", "user_id", "due_date", "id"),
+        db.Index("ix_task_user_title_id", "user_id", "title", "id"),
+        db.Index("ix_task_user_created_id", "user_id", "created_at", "id"),
+        # SQLite sorts created_at through keyset_column (app/utils/pagination.py).
+        db.Index(
+            "ix_task_user_created_key", "user_id", text("substr(created_at || '.000000', 1, 26)"), "id",
+        ).ddl_if(dialect="sqlite"),
+        # One occurrence per recurring series per day (see app/recurrence.py).
+        db.Index("ix_task_series_due", "series_id", "due_date", unique=True),
+        # Postgres only: partial covering indexes for the hot pending/done predicates.
+        db.Index(
+            "ix_task_pending_user_due", "user_id", "due_date", "id",
+            postgresql_include=["title", "asset_id"], postgresql_where=text("status = 'pending'"),
+        ).ddl_if(dialect="postgresql"),
+        db.Index(
+            "ix_task_done_user_updated", "user_id", "updated_at",
+            postgresql_include=["cost"], postgresql_where=text("status = 'done'"),
+        ).ddl_if(dialect="postgresql"),
     )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
@@ -64,15 +85,17 @@ class Task(db.Model):
     description = db.Column(db.Text)
     due_date = db.Column(db.Date, nullable=True, index=True)
     recurrence_rule = db.Column(db.String(255), nullable=True)   # e.g., FREQ=MONTHLY;INTERVAL=3
+    series_id = db.Column(db.Integer, nullable=True)   # id of the first task in a recurring series
     status = db.Column(db.Enum("pending","done","skipped","deleted", name="task_status"), default="pending", index=True)
     priority = db.Column(db.Integer, default=0)
     estimated_minutes = db.Column(db.Integer, default=0)
     cost = db.Column(db.Numeric(10,2), nullable=True)
     vendor = db.Column(db.String(120), nullable=True)
 
-    asset = db.relationship("Asset", back_populates="tasks", lazy="joined")
-    owner = db.relationship("User", back_populates="tasks", lazy="joined")
-    attachments = db.relationship("Attachment", back_populates="task", cascade="all, delete-orphan", lazy="selectin")
+    # Views that need the asset ask for it with joinedload(Task.asset).
+    asset = db.relationship("Asset", back_populates="tasks", lazy="select")
+    owner = db.relationship("User", back_populates="tasks", lazy="select")
+    attachments = db.relationship("Attachment", back_populates="task", cascade="all, delete-orphan", lazy="select")
 
     created_at = db.Column(db.DateTime, default=func.now())
     updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now())
@@ -84,7 +107,11 @@ class Attachment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
     asset_id = db.Column(db.Integer, db.ForeignKey("asset.id"), nullable=True, index=True)
     task_id = db.Column(db.Integer, db.ForeignKey("task.id"), nullable=True, index=True)
-    key = db.Column(db.String(255), nullable=False, unique=True)
+    # Content-addressed: the hex SHA-256 of the file.  Attachments with the
+    # same content share one blob (see app/utils/storage.py).  Only rows whose
+    # file was already missing when migration e88ddf417fed hashed the uploads
+    # keep their original random name.
+    key = db.Column(db.String(255), nullable=False, index=True)
     original_name = db.Column(db.String(255))
     mime = db.Column(db.String(80))
     size = db.Column(db.Integer)
@@ -92,3 +119,89 @@ class Attachment(db.Model):
 
     asset = db.relationship("Asset", back_populates="attachments")
     task = db.relationship("Task", back_populates="attachments")
+
+
+class BlobRelease(db.Model):
+    """A blob whose last attachment was deleted; removed later by the sweep (app/utils/storage.py)."""
+
+    __tablename__ = "blob_release"
+    key = db.Column(db.String(255), primary_key=True)
+    released_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class ApiToken(db.Model):
+    """Bearer token for the JSON API; only its SHA-256 is stored (see app/api_tokens.py)."""
+
+    __tablename__ = "api_token"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    name = db.Column(db.String(120), nullable=False)
+    token_hash = db.Column(db.String(64), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+
+
+class UserStats(db.Model):
+    """Per-user counters kept current by the task write paths (see app/stats.py)."""
+
+    __tablename__ = "user_stats"
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    pending_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Bumped by every write to the user's tasks/assets/files; keys cached views.
+    data_version = db.Column(db.BigInteger, nullable=False, default=0, server_default="0")
+
+
+class MonthlyRollup(db.Model):
+    """Completed-task count and spend per user per calendar month."""
+
+    __tablename__ = "monthly_rollup"
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)   # first day of the month
+    completed_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    cost_cents = db.Column(db.BigInteger, nullable=False, default=0, server_default="0")
+
+
+class SchedulerJob(db.Model):
+    """Last run of each registered scheduler job (see app/scheduler.py)."""
+
+    __tablename__ = "scheduler_job"
+    name = db.Column(db.String(80), primary_key=True)
+    last_run_at = db.Column(db.DateTime, nullable=False)   # scheduler clock when the last run started
+    last_status = db.Column(db.String(20))   # ok | error; NULL until the first run
+    last_duration_ms = db.Column(db.Integer)
+    last_error = db.Column(db.Text)
+
+
+class SchedulerLease(db.Model):
+    """Row lease that lets exactly one ``flask scheduler run`` process work."""
+
+    __tablename__ = "scheduler_lease"
+    name = db.Column(db.String(80), primary_key=True)
+    owner = db.Column(db.String(200), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class OutboxMessage(db.Model):
+    """Queued outgoing email; delivered and retried by app/mailer.py."""
+
+    __tablename__ = "outbox"
+    __table_args__ = (
+        db.Index("ix_outbox_status_next_attempt", "status", "next_attempt_at"),
+        db.Index(
+            "ix_outbox_pending_id", "id",
+            postgresql_include=["next_attempt_at"], postgresql_where=text("status = 'pending'"),
+        ).ddl_if(dialect="postgresql"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True, index=True)
+    # Same key, same message: reruns never queue (or send) it twice.
+    idempotency_key = db.Column(db.String(120), nullable=False, unique=True)
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="pending")   # pending | sending | sent | failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False)
+    last_error = db.Column(db.Text)
+    claimed_at = db.Column(db.DateTime)   # when a delivery run took it (status "sending")
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    sent_at = db.Column(db.DateTime)
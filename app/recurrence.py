@@ -0,0 +1,284 @@
+"""Recurring tasks driven by ``Task.recurrence_rule``.
+
+Rules use a subset of RFC 5545 RRULE syntax: ``FREQ`` (DAILY, WEEKLY, MONTHLY
+or YEARLY), ``INTERVAL``, ``UNTIL`` and ``COUNT``, e.g. ``FREQ=MONTHLY;INTERVAL=3``.
+Each distinct rule string is compiled once per process.
+
+All occurrences of a recurring task share a ``series_id`` (the id of the first
+task in the series) and a unique ``(series_id, due_date)`` index, so an
+occurrence is never created twice.  Dates are computed from the series' first
+due date, so a task due on the 31st stays on the last day of shorter months
+without drifting.  Completing a task creates the next occurrence
+(:func:`spawn_next`); ``flask expand-recurrences`` materialises every series up
+to a horizon (:func:`expand_recurrences`).
+"""
+from __future__ import annotations
+
+import calendar
+from collections import defaultdict
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Iterator, NamedTuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .models import Task
+from .stats import StatsDelta, TaskFacts, bump_data_version
+
+EXPAND_CHUNK_SIZE = 1000
+
+# FREQ -> (unit, units per INTERVAL); units are days or months.
+_FREQUENCIES = {
+    "DAILY": ("days", 1),
+    "WEEKLY": ("days", 7),
+    "MONTHLY": ("months", 1),
+    "YEARLY": ("months", 12),
+}
+_PARTS = {"FREQ", "INTERVAL", "UNTIL", "COUNT"}
+# Columns copied from one occurrence to the next.
+_TEMPLATE_COLUMNS = (
+    "user_id",
+    "asset_id",
+    "title",
+    "description",
+    "recurrence_rule",
+    "priority",
+    "estimated_minutes",
+    "cost",
+    "vendor",
+    "series_id",
+)
+
+
+def _add_months(anchor: date, months: int) -> date:
+    month_index = anchor.month - 1 + months
+    year, month = anchor.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(anchor.day, calendar.monthrange(year, month)[1]))
+
+
+class Rule(NamedTuple):
+    unit: str
+    step: int
+    until: date | None
+    count: int | None
+
+    def occurrence(self, anchor: date, index: int) -> date:
+        """The ``index``-th occurrence (0 = ``anchor``)."""
+        if self.unit == "days":
+            return anchor + timedelta(days=self.step * index)
+        return _add_months(anchor, self.step * index)
+
+    def _first_index_after(self, anchor: date, after: date) -> int:
+        if after < anchor:
+            return 0
+        if self.unit == "days":
+            return (after - anchor).days // self.step + 1
+        index = ((after.year - anchor.year) * 12 + after.month - anchor.month) // self.step
+        while self.occurrence(anchor, index) <= after:
+            index += 1
+        return index
+
+    def occurrences(self, anchor: date, after: date, until: date) -> Iterator[date]:
+        """Occurrences strictly after ``after`` and on or before ``until``."""
+        if self.until is not None:
+            until = min(until, self.until)
+        index = self._first_index_after(anchor, after)
+        while self.count is None or index < self.count:
+            due = self.occurrence(anchor, index)
+            if due > until:
+                return
+            yield due
+            index += 1
+
+    def next_after(self, anchor: date, after: date) -> date | None:
+        return next(self.occurrences(anchor, after, date.max), None)
+
+
+def _parse_until(value: str) -> date:
+    value = value.rstrip("Z")
+    try:
+        if len(value) >= 8 and value[:8].isdigit():
+            return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        raise ValueError(f"Invalid UNTIL '{value}'.") from None
+
+
+def _positive(name: str, value: str) -> int:
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(f"{name} must be a positive whole number.")
+    return int(value)
+
+
+@lru_cache(maxsize=512)
+def compile_rule(rule: str) -> Rule:
+    """Parse an RRULE string; raises ValueError for unsupported or malformed rules."""
+    text = rule.strip().upper()
+    if text.startswith("RRULE:"):
+        text = text[len("RRULE:"):]
+    parts = {}
+    for part in filter(None, (piece.strip() for piece in text.split(";"))):
+        name, sep, value = part.partition("=")
+        if not sep or not value.strip():
+            raise ValueError(f"Malformed recurrence part '{part}'.")
+        parts[name.strip()] = value.strip()
+    unsupported = set(parts) - _PARTS
+    if unsupported:
+        raise ValueError(f"Unsupported recurrence part(s): {', '.join(sorted(unsupported))}.")
+    if parts.get("FREQ") not in _FREQUENCIES:
+        raise ValueError("FREQ must be DAILY, WEEKLY, MONTHLY or YEARLY.")
+    unit, units = _FREQUENCIES[parts["FREQ"]]
+    interval = _positive("INTERVAL", parts["INTERVAL"]) if "INTERVAL" in parts else 1
+    return Rule(
+        unit=unit,
+        step=units * interval,
+        until=_parse_until(parts["UNTIL"]) if "UNTIL" in parts else None,
+        count=_positive("COUNT", parts["COUNT"]) if "COUNT" in parts else None,
+    )
+
+
+def parse_rule(rule: str | None) -> Rule | None:
+    """Compiled rule, or None for blank or invalid rules."""
+    if not rule or not rule.strip():
+        return None
+    try:
+        return compile_rule(rule)
+    except ValueError:
+        return None
+
+
+def ensure_series(task: Task) -> None:
+    """Start a series at ``task`` if it recurs and has none yet; call after flush."""
+    if task.recurrence_rule and task.series_id is None:
+        task.series_id = task.id
+
+
+def adopt_series(user_id: int | None = None) -> int:
+    """Give recurring tasks without a series (bulk imports, old rows) their own."""
+    stmt = update(Task).where(Task.series_id.is_(None), Task.recurrence_rule.is_not(None))
+    if user_id is not None:
+        stmt = stmt.where(Task.user_id == user_id)
+    result = db.session.execute(stmt.values(series_id=Task.id).execution_options(synchronize_session=False))
+    return result.rowcount or 0
+
+
+def _series_anchor(series_id: int) -> date | None:
+    return db.session.execute(select(func.min(Task.due_date)).where(Task.series_id == series_id)).scalar()
+
+
+def spawn_next(task: Task, today: date) -> Task | None:
+    """Create the occurrence after ``task`` in the same transaction.
+
+    Returns the new pending task, or None when the task does not recur, the
+    rule has run out, or the next occurrence already exists.  The caller
+    records its stats and commits.
+    """
+    rule = parse_rule(task.recurrence_rule)
+    if rule is None:
+        return None
+    ensure_series(task)
+    after = task.due_date or today
+    anchor = _series_anchor(task.series_id) or after
+    due = rule.next_after(anchor, after)
+    if due is None:
+        return None
+    exists = db.session.execute(
+        select(Task.id).where(Task.series_id == task.series_id, Task.due_date == due)
+    ).first()
+    if exists:
+        return None
+
+    spawned = Task(**{column: getattr(task, column) for column in _TEMPLATE_COLUMNS}, due_date=due, status="pending")
+    try:
+        with db.session.begin_nested():
+            db.session.add(spawned)
+    except IntegrityError:
+        # A concurrent completion or expansion created it first.
+        return None
+    return spawned
+
+
+def _insert_occurrences(rows: list[dict]) -> list[dict]:
+    """Insert ``rows``, skipping any that a concurrent run already created."""
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(Task), rows)
+        return rows
+    except IntegrityError:
+        pass
+    inserted = []
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(Task), [row])
+            inserted.append(row)
+        except IntegrityError:
+            continue
+    return inserted
+
+
+def _commit_occurrences(rows: list[dict]) -> int:
+    deltas: defaultdict[int, StatsDelta] = defaultdict(StatsDelta)
+    inserted = _insert_occurrences(rows)
+    for row in inserted:
+        deltas[row["user_id"]].add(TaskFacts("pending", None, None))
+    for user_id, delta in deltas.items():
+        delta.apply(user_id)
+        bump_data_version(user_id)
+    db.session.commit()
+    return len(inserted)
+
+
+def expand_recurrences(until: date, chunk_size: int = EXPAND_CHUNK_SIZE) -> int:
+    """Materialise every series' pending occurrences up to ``until``.
+
+    Series are read in ``series_id`` order, ``chunk_size`` at a time, and each
+    continues from its latest due date using the rule on that latest
+    occurrence, so reruns only add what is missing.  New rows are inserted with
+    executemany and committed with their stats changes every ``chunk_size``
+    rows.  Returns the number of tasks created.
+    """
+    adopt_series()
+    db.session.commit()
+
+    bounds = (
+        select(
+            Task.series_id,
+            func.min(Task.due_date).label("first_due"),
+            func.max(Task.due_date).label("last_due"),
+        )
+        .where(Task.series_id.is_not(None), Task.due_date.is_not(None))
+        .group_by(Task.series_id)
+        .subquery()
+    )
+    template = [getattr(Task, column) for column in _TEMPLATE_COLUMNS]
+    created = 0
+    last_series = 0
+    rows: list[dict] = []
+    while True:
+        batch = db.session.execute(
+            select(*template, bounds.c.first_due, bounds.c.last_due)
+            .join(bounds, (Task.series_id == bounds.c.series_id) & (Task.due_date == bounds.c.last_due))
+            .where(bounds.c.series_id > last_series)
+            .order_by(bounds.c.series_id)
+            .limit(chunk_size)
+        ).all()
+        if not batch:
+            break
+        last_series = batch[-1].series_id
+
+        for row in batch:
+            rule = parse_rule(row.recurrence_rule)
+            if rule is None or row.last_due >= until:
+                continue
+            values = {column: getattr(row, column) for column in _TEMPLATE_COLUMNS}
+            for due in rule.occurrences(row.first_due, row.last_due, until):
+                rows.append({**values, "due_date": due, "status": "pending"})
+                if len(rows) >= chunk_size:
+                    created += _commit_occurrences(rows)
+                    rows = []
+    if rows:
+        created += _commit_occurrences(rows)
+    return created
@@ -0,0 +1,90 @@
+"""Daily reminder digests: one email per user listing their upcoming tasks.
+
+:func:`queue_digests` reads pending tasks in a single streaming pass ordered by
+user, groups them into one digest per user and writes the digests to the
+outbox in batches.  Each digest's idempotency key is the user plus the day, so
+rerunning the job the same day queues nothing new.  :mod:`app.mailer` does the
+sending.
+
+The window covers tasks due in the next ``REMINDER_DAYS_AHEAD`` days.  With
+``REMINDER_INCLUDE_OVERDUE`` it also covers anything due today or earlier.
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+from itertools import groupby
+
+from flask import current_app
+from sqlalchemy import select
+
+from .extensions import db
+from .mailer import Outgoing, queue_messages
+from .models import Asset, Task, User
+
+DIGEST_ITEM_LIMIT = 50
+QUEUE_BATCH_SIZE = 500
+STREAM_BATCH_SIZE = 1000
+
+
+def reminder_window(today: date, days_ahead: int, include_overdue: bool) -> tuple[date | None, date]:
+    """``(first, last)`` due dates to remind about; ``first`` is None for "any time before"."""
+    first = None if include_overdue else today + timedelta(days=1)
+    return first, today + timedelta(days=max(days_ahead, 0))
+
+
+def _digest(user_id: int, email: str, items: list, today: date) -> Outgoing:
+    due_now = sum(1 for item in items if item.due_date <= today)
+    if due_now and due_now < len(items):
+        subject = f"{due_now} maintenance task(s) due now, {len(items) - due_now} coming up"
+    elif due_now:
+        subject = f"{due_now} maintenance task(s) due now"
+    else:
+        subject = f"{len(items)} maintenance task(s) coming up"
+    lines = ["Hello,", "", f"Here are your maintenance tasks as of {today.isoformat()}:", ""]
+    for item in items[:DIGEST_ITEM_LIMIT]:
+        flag = "OVERDUE " if item.due_date < today else "TODAY   " if item.due_date == today else "        "
+        asset = f" ({item.asset_name})" if item.asset_name else ""
+        lines.append(f"  {flag}{item.due_date.isoformat()}  {item.title}{asset}")
+    if len(items) > DIGEST_ITEM_LIMIT:
+        lines.append(f"  ...and {len(items) - DIGEST_ITEM_LIMIT} more.")
+    return Outgoing(
+        idempotency_key=f"reminder-digest:{user_id}:{today.isoformat()}",
+        recipient=email,
+        subject=subject,
+        body="\n".join(lines) + "\n",
+        user_id=user_id,
+    )
+
+
+def queue_digests(today: date, days_ahead: int | None = None, include_overdue: bool | None = None) -> int:
+    """Queue today's digests for every user with tasks in the window; the caller commits.
+
+    Returns the number of digests newly queued.
+    """
+    config = current_app.config
+    if days_ahead is None:
+        days_ahead = config["REMINDER_DAYS_AHEAD"]
+    if include_overdue is None:
+        include_overdue = config["REMINDER_INCLUDE_OVERDUE"]
+    first, last = reminder_window(today, days_ahead, include_overdue)
+
+    stmt = (
+        select(Task.user_id, User.email, Task.title, Task.due_date, Asset.name.label("asset_name"))
+        .join(User, User.id == Task.user_id)
+        .outerjoin(Asset, Asset.id == Task.asset_id)
+        .where(Task.status == "pending", Task.due_date.is_not(None), Task.due_date <= last)
+        .order_by(Task.user_id, Task.due_date, Task.id)
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    if first is not None:
+        stmt = stmt.where(Task.due_date >= first)
+
+    queued = 0
+    batch: list[Outgoing] = []
+    for (user_id, email), rows in groupby(db.session.execute(stmt), key=lambda row: (row.user_id, row.email)):
+        batch.append(_digest(user_id, email, list(rows), today))
+        if len(batch) >= QUEUE_BATCH_SIZE:
+            queued += queue_messages(batch)
+            batch = []
+    queued += queue_messages(batch)
+    return queued
@@ -1,39 +1,314 @@
-from datetime import date, timedelta
+"""Background jobs run by a single ``flask scheduler run`` process.
+
+Jobs register themselves with :func:`job` and a five-field cron expression
+(minute hour day-of-month month day-of-week, in server local time).  The last
+start time of every job is stored in ``scheduler_job``.  On each tick the
+process runs any job whose next scheduled time has passed.  After downtime,
+missed runs are therefore caught up once rather than replayed or lost.
+
+Only the process holding the ``scheduler_lease`` row does any work.  Others
+wait on standby and take over when the lease expires.  Web workers never start
+the scheduler.
+"""
+from __future__ import annotations
+
+import os
+import signal
+import socket
 import threading
-import time
+import time as clock
+import uuid
+from datetime import date, datetime, time, timedelta
+from typing import Callable, NamedTuple
 
 from flask import current_app
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
 
+from . import metrics
 from .extensions import db
-from .models import Task, User
+from .mailer import deliver_outbox
+from .models import SchedulerJob, SchedulerLease
+from .recurrence import expand_recurrences
+from .reminders import queue_digests
+from .utils.storage import sweep_released_blobs
+
+LEASE_NAME = "scheduler"
+RECURRENCE_HORIZON_DAYS = 365
+
+_CRON_FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7))
+_CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+
+def _cron_field(text: str, name: str, low: int, high: int) -> frozenset[int]:
+    values: set[int] = set()
+    for part in text.split(","):
+        base, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            start, end = (int(piece) for piece in base.split("-", 1))
+        else:
+            start = int(base)
+            end = high if step_text else start
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(f"{name} '{part}' is out of range")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class Cron(NamedTuple):
+    minutes: tuple[int, ...]
+    hours: tuple[int, ...]
+    days: frozenset[int]
+    months: frozenset[int]
+    weekdays: frozenset[int]   # 0 = Sunday
+    any_day: bool
+    any_weekday: bool
+
+    @classmethod
+    def parse(cls, expression: str) -> "Cron":
+        text = _CRON_ALIASES.get(expression.strip(), expression.strip())
+        parts = text.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs five fields: '{expression}'.")
+        try:
+            fields = [_cron_field(part, *spec) for part, spec in zip(parts, _CRON_FIELDS)]
+        except ValueError as exc:
+            raise ValueError(f"Invalid cron expression '{expression}': {exc}.") from None
+        minutes, hours, days, months, weekdays = fields
+        return cls(
+            minutes=tuple(sorted(minutes)),
+            hours=tuple(sorted(hours)),
+            days=days,
+            months=months,
+            weekdays=frozenset(day % 7 for day in weekdays),
+            any_day=parts[2] == "*",
+            any_weekday=parts[4] == "*",
+        )
+
+    def _day_matches(self, day: date) -> bool:
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        in_weekdays = day.isoweekday() % 7 in self.weekdays
+        # Standard cron: when both day fields are restricted, either may match.
+        if not self.any_day and not self.any_weekday:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First scheduled minute strictly after ``moment``."""
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(366 * 5):
+            if self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime.combine(day, time(hour, minute))
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError("Cron expression never fires.")
+
+
+class Job(NamedTuple):
+    name: str
+    schedule: str
+    cron: Cron
+    func: Callable[[], object]
+
+
+JOBS: dict[str, Job] = {}
+
+
+def job(name: str, schedule: str):
+    """Register the decorated function as a scheduler job."""
+
+    def decorator(func):
+        JOBS[name] = Job(name, schedule, Cron.parse(schedule), func)
+        return func
+
+    return decorator
+
+
+@job("due-reminders", "0 7 * * *")
+def send_due_reminders():
+    queued = queue_digests(date.today())
+    db.session.commit()
+    current_app.logger.info("Reminders: %s digest(s) queued.", queued)
+    deliver_outbox_job()
+
+
+@job("deliver-outbox", "*/5 * * * *")
+def deliver_outbox_job():
+    report = deliver_outbox()
+    if any(report[:3]):
+        current_app.logger.info(
+            "Outbox: %s sent, %s retrying, %s failed.", report.sent, report.retrying, report.failed
+        )
+
+
+@job("expand-recurrences", "30 2 * * *")
+def expand_recurrences_job():
+    created = expand_recurrences(date.today() + timedelta(days=RECURRENCE_HORIZON_DAYS))
+    current_app.logger.info("Expanded recurring tasks: %s occurrence(s) created.", created)
+
+
+@job("sweep-blobs", "45 * * * *")
+def sweep_blobs_job():
+    deleted, kept = sweep_released_blobs(current_app.config["BLOB_SWEEP_GRACE_SECONDS"])
+    if deleted or kept:
+        current_app.logger.info("Blob sweep: %s deleted, %s still referenced.", deleted, kept)
+
+
+def acquire_lease(owner: str, ttl: int) -> bool:
+    """Take or renew the scheduler lease; True while ``owner`` holds it."""
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=ttl)
+    result = db.session.execute(
+        update(SchedulerLease)
+        .where(
+            SchedulerLease.name == LEASE_NAME,
+            or_(SchedulerLease.owner == owner, SchedulerLease.expires_at < now),
+        )
+        .values(owner=owner, expires_at=expires)
+    )
+    if result.rowcount:
+        db.session.commit()
+        return True
+    try:
+        db.session.execute(insert(SchedulerLease).values(name=LEASE_NAME, owner=owner, expires_at=expires))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
 
+def release_lease(owner: str) -> None:
+    db.session.execute(delete(SchedulerLease).where(SchedulerLease.name == LEASE_NAME, SchedulerLease.owner == owner))
+    db.session.commit()
 
-def start_scheduler(app):
-    if app.config.get("DISABLE_SCHEDULER"):
-        app.logger.info("Scheduler disabled via config.")
-        return
 
-    def worker():
-        while True:
+class _Heartbeat(threading.Thread):
+    """Renews the lease while a long job runs; sets ``lost`` if it cannot."""
+
+    def __init__(self, app, owner: str, ttl: int):
+        super().__init__(daemon=True, name="scheduler-lease")
+        self.app, self.owner, self.ttl = app, owner, ttl
+        self.stopped = threading.Event()
+        self.lost = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.ttl / 3):
             try:
-                with app.app_context():
-                    send_due_reminders()
+                with self.app.app_context():
+                    held = acquire_lease(self.owner, self.ttl)
             except Exception:  # pragma: no cover
-                app.logger.exception("Reminder job failed")
-            time.sleep(24 * 60 * 60)
+                self.app.logger.exception("Scheduler lease renewal failed")
+                held = False
+            if not held:
+                self.lost.set()
+                return
 
-    thread = threading.Thread(target=worker, daemon=True, name="reminder-thread")
-    thread.start()
-    app.logger.info("Background reminder thread started.")
 
+def job_states() -> dict[str, SchedulerJob]:
+    return {row.name: row for row in db.session.execute(select(SchedulerJob)).scalars()}
 
-def send_due_reminders():
-    tomorrow = date.today() + timedelta(days=1)
-    rows = (
-        db.session.query(User.email, Task.title, Task.due_date)
-        .join(Task, Task.user_id == User.id)
-        .filter(Task.status == "pending", Task.due_date == tomorrow)
-        .all()
+
+def _run_job(job_: Job, state: SchedulerJob, started_at: datetime) -> None:
+    scheduled = job_.cron.next_after(state.last_run_at)
+    if job_.cron.next_after(scheduled) <= started_at:
+        current_app.logger.info("Scheduler: %s missed runs since %s; running once to catch up.", job_.name, scheduled)
+    timer = clock.perf_counter()
+    status, error = "ok", None
+    try:
+        job_.func()
+        db.session.commit()
+    except Exception as exc:
+        db.session.rollback()
+        current_app.logger.exception("Scheduler job %s failed", job_.name)
+        status, error = "error", f"{type(exc).__name__}: {exc}"
+    elapsed = clock.perf_counter() - timer
+    metrics.observe("hmt_scheduler_job_duration_seconds", elapsed, job=job_.name)
+    metrics.inc("hmt_scheduler_job_runs_total", job=job_.name, outcome=status)
+    db.session.execute(
+        update(SchedulerJob)
+        .where(SchedulerJob.name == job_.name)
+        .values(
+            last_run_at=started_at,
+            last_status=status,
+            last_duration_ms=int(elapsed * 1000),
+            last_error=error,
+        )
     )
-    for email, title, due in rows:
-        current_app.logger.info("Reminder: %s has '%s' due on %s", email, title, due)
+    db.session.commit()
+
+
+def run_due_jobs(lost: threading.Event | None = None) -> datetime:
+    """Run every job that is due; returns when the next one is.
+
+    A job seen for the first time is recorded as having just run, so a new
+    deployment does not replay history.
+    """
+    now = datetime.now()
+    states = job_states()
+    for job_ in JOBS.values():
+        state = states.get(job_.name)
+        if state is None:
+            db.session.add(SchedulerJob(name=job_.name, last_run_at=now))
+            db.session.commit()
+            continue
+        if job_.cron.next_after(state.last_run_at) > now:
+            continue
+        if lost is not None and lost.is_set():
+            break
+        _run_job(job_, state, now)
+    states = job_states()
+    return min(
+        (job_.cron.next_after(states[job_.name].last_run_at) for job_ in JOBS.values() if job_.name in states),
+        default=now + timedelta(hours=1),
+    )
+
+
+def run_scheduler(app, once: bool = False) -> None:
+    """Serve as the scheduler until SIGTERM/SIGINT (or one pass with ``once``)."""
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    ttl = app.config["SCHEDULER_LEASE_SECONDS"]
+    poll = app.config["SCHEDULER_POLL_SECONDS"]
+    stop = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: stop.set())
+
+    heartbeat = None
+    try:
+        while not stop.is_set():
+            wait = poll
+            with app.app_context():
+                if acquire_lease(owner, ttl):
+                    if heartbeat is None or not heartbeat.is_alive():
+                        app.logger.info("Scheduler %s holds the lease.", owner)
+                        heartbeat = _Heartbeat(app, owner, ttl)
+                        heartbeat.start()
+                    next_due = run_due_jobs(heartbeat.lost)
+                    wait = min(poll, max(1.0, (next_due - datetime.now()).total_seconds()))
+                elif heartbeat is not None:
+                    app.logger.warning("Scheduler %s lost the lease; standing by.", owner)
+                    heartbeat.stopped.set()
+                    heartbeat = None
+            if once:
+                break
+            stop.wait(wait)
+    finally:
+        if heartbeat is not None:
+            heartbeat.stopped.set()
+            with app.app_context():
+                release_lease(owner)
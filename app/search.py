@@ -0,0 +1,99 @@
+"""Full-text search for the task and asset lists.
+
+On SQLite builds with FTS5 the ``task_fts`` and ``asset_fts`` external-content
+tables (created and kept in sync by triggers in migration
+``c41d7a9e2b65``) answer ranked prefix queries: each word in the search box
+becomes a ``"word"*`` term and all terms must match.  Other databases, or a
+SQLite build without FTS5, fall back to the original ``ILIKE '%q%'`` filters.
+"""
+from __future__ import annotations
+
+import re
+import time
+
+from sqlalchemy import Float, Integer, or_, select, text
+
+from .extensions import db
+from .models import Asset, Task
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+FTS_RECHECK_SECONDS = 30.0
+_fts_ready: set[str] = set()
+_fts_missing: dict[str, float] = {}
+
+
+def fts_enabled() -> bool:
+    """True when the FTS tables exist in the current database.
+
+    A positive answer is kept for the life of the process.  A negative one is
+    re-checked every ``FTS_RECHECK_SECONDS``, so workers started before
+    ``flask db upgrade`` switch to FTS without a restart.
+    """
+    engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return False
+    key = str(engine.url)
+    if key in _fts_ready:
+        return True
+    checked_at = _fts_missing.get(key)
+    if checked_at is not None and time.monotonic() - checked_at < FTS_RECHECK_SECONDS:
+        return False
+    found = db.session.execute(
+        text("SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN ('task_fts', 'asset_fts')")
+    ).scalar()
+    if found == 2:
+        _fts_ready.add(key)
+        _fts_missing.pop(key, None)
+        return True
+    _fts_missing[key] = time.monotonic()
+    return False
+
+
+def match_expression(search: str) -> str | None:
+    """Turn free text into an FTS5 prefix query, or None if it has no words."""
+    words = _WORD.findall(search)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _hits(table: str, param: str, expression: str):
+    return (
+        text(f"SELECT rowid AS id, rank AS rank FROM {table} WHERE {table} MATCH :{param}")
+        .bindparams(**{param: expression})
+        .columns(id=Integer, rank=Float)
+        .subquery(f"{table}_hits")
+    )
+
+
+def filter_tasks(query, search: str):
+    """Restrict a Task query/select to rows matching ``search``.
+
+    Matches task title/description/vendor or the name/make/model/serial of the
+    task's asset.  The caller keeps its own ordering.
+    """
+    expression = match_expression(search)
+    if expression and fts_enabled():
+        task_hits = _hits("task_fts", "task_q", expression)
+        asset_hits = _hits("asset_fts", "asset_q", expression)
+        return query.where(
+            or_(
+                Task.id.in_(select(task_hits.c.id)),
+                Task.asset_id.in_(select(asset_hits.c.id)),
+            )
+        )
+    return query.join(Asset, Asset.id == Task.asset_id, isouter=True).where(
+        or_(
+            Task.title.ilike(f"%{search}%"),
+            Asset.name.ilike(f"%{search}%"),
+        )
+    )
+
+
+def search_assets(query, search: str):
+    """Filter an Asset query to ``search`` matches, best matches first."""
+    expression = match_expression(search)
+    if expression and fts_enabled():
+        hits = _hits("asset_fts", "asset_q", expression)
+        return query.join(hits, hits.c.id == Asset.id).order_by(hits.c.rank, Asset.created_at.desc())
+    return query.filter(Asset.name.ilike(f"%{search}%")).order_by(Asset.created_at.desc())
@@ -0,0 +1,372 @@
+"""Synthetic households for demos and benchmarks (``flask seed-data``).
+
+Generates skewed, production-shaped data: a few households own most of the
+assets, a few assets carry most of the history, and each year of history is
+mostly completed work with costs and vendors.  About a third of the assets
+have a recurring series (``series_id``/``recurrence_rule`` as written by
+:mod:`app.recurrence`) that was completed on schedule, with some slack, up to
+one pending next occurrence.  One-off tasks are spread over the history with
+some skipped and some left overdue.
+
+Everything is derived from one ``random.Random(seed)`` and the anchor date, so
+the same arguments produce the same database.  Ids are assigned up front and
+rows are written as plain tuples, in one transaction per chunk: ``executemany``
+on SQLite, COPY on Postgres.  Into empty tables, secondary indexes and the FTS
+triggers are dropped for the load and rebuilt once at the end, which is several
+times faster than maintaining them row by row.  Summary tables are rebuilt once
+at the end too.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import random
+import time
+from bisect import bisect
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import bindparam, func, insert, select, text
+from werkzeug.security import generate_password_hash
+
+from .database import copy_rows_postgres, reset_sequence
+from .extensions import db
+from .models import Asset, Attachment, Task, User
+from .recurrence import compile_rule
+from .stats import rebuild_stats
+from .utils.storage import get_storage
+
+SEED_CHUNK_SIZE = 20000
+SEED_PASSWORD = "password"
+# Pareto shape for per-household and per-asset counts: ~20% of them hold ~60% of the rows.
+SKEW_ALPHA = 1.6
+SKEW_CAP = 20
+RECURRING_SHARE = 0.35
+ATTACHMENT_BLOBS = 12
+
+ASSET_TYPES = {
+    "HVAC": ("Replace air filter", "Annual furnace service", "Clean condenser coils", "Check refrigerant"),
+    "Plumbing": ("Flush water heater", "Check for leaks", "Replace anode rod", "Clean drains"),
+    "Fridge": ("Clean coils", "Replace water filter", "Defrost freezer", "Check door seals"),
+    "Washer": ("Clean drum", "Inspect hoses", "Level machine", "Clean lint trap"),
+    "Roof": ("Clean gutters", "Inspect shingles", "Clear moss", "Check flashing"),
+    "Vehicle": ("Oil change", "Rotate tires", "Replace wipers", "Brake inspection", "Annual inspection"),
+    "Garden": ("Service mower", "Winterize irrigation", "Sharpen blades", "Prune trees"),
+    "Electrical": ("Test smoke alarms", "Test GFCI outlets", "Replace batteries", "Inspect panel"),
+}
+_TYPE_WEIGHTS = (20, 14, 10, 8, 6, 18, 10, 14)
+MAKES = ("Acme", "HomePro", "FixIt", "DailyCo", "Northwind", "Contoso", "Globex", "Initech")
+VENDORS = ("Self", "Acme Services", "City Plumbing", "CoolAir HVAC", "Quick Lube", "Green Thumb", "Sparky Electric", "Top Roofing")
+# Zipf-like: most work is done in-house or by the household's usual contractor.
+_VENDOR_WEIGHTS = (40, 16, 10, 8, 6, 4, 3, 2)
+RULES = ("FREQ=MONTHLY;INTERVAL=1", "FREQ=MONTHLY;INTERVAL=3", "FREQ=MONTHLY;INTERVAL=6", "FREQ=YEARLY", "FREQ=WEEKLY;INTERVAL=2")
+_RULE_WEIGHTS = (20, 35, 25, 15, 5)
+_PRIORITY_WEIGHTS = (60, 25, 10, 5)
+_MINUTES = (15, 30, 30, 60, 120, 240)
+
+ASSET_COLUMNS = (
+    "id", "user_id", "name", "type", "make", "model", "serial", "purchase_date", "warranty_expiration",
+    "notes", "created_at", "updated_at",
+)
+TASK_COLUMNS = (
+    "id", "user_id", "asset_id", "title", "description", "due_date", "recurrence_rule", "series_id", "status",
+    "priority", "estimated_minutes", "cost", "vendor", "created_at", "updated_at",
+)
+ATTACHMENT_COLUMNS = ("id", "user_id", "asset_id", "task_id", "key", "original_name", "mime", "size")
+
+
+@dataclass
+class SeedReport:
+    users: int = 0
+    assets: int = 0
+    tasks: int = 0
+    attachments: int = 0
+    seconds: float = 0.0
+
+
+class _Batches:
+    """Row buffers written parent-first in one transaction per chunk."""
+
+    def __init__(self, chunk_size: int, report: SeedReport, progress=None):
+        self.chunk_size = chunk_size
+        self.report = report
+        self.progress = progress
+        self.tables = [
+            (Asset.__table__, ASSET_COLUMNS, "assets", []),
+            (Task.__table__, TASK_COLUMNS, "tasks", []),
+            (Attachment.__table__, ATTACHMENT_COLUMNS, "attachments", []),
+        ]
+        self.assets, self.tasks, self.attachments = (rows for *_, rows in self.tables)
+
+    def full(self) -> bool:
+        return len(self.tasks) >= self.chunk_size or len(self.assets) >= self.chunk_size
+
+    def flush(self) -> None:
+        with db.engine.begin() as conn:
+            preparer = conn.dialect.identifier_preparer
+            for table, columns, counter, rows in self.tables:
+                if not rows:
+                    continue
+                if conn.dialect.name == "postgresql":
+                    copy_rows_postgres(conn, table, list(columns), [rows])
+                else:
+                    names = ", ".join(preparer.quote(name) for name in columns)
+                    marks = ", ".join("?" * len(columns)) if conn.dialect.paramstyle == "qmark" else ", ".join(["%s"] * len(columns))
+                    conn.exec_driver_sql(f"INSERT INTO {preparer.format_table(table)} ({names}) VALUES ({marks})", rows)
+                setattr(self.report, counter, getattr(self.report, counter) + len(rows))
+                rows.clear()
+        if self.progress is not None:
+            self.progress(self.report)
+
+
+def _weighted(values, weights):
+    """Picker for ``values`` by ``weights`` that takes one uniform random number."""
+    cumulative = list(accumulate(weights))
+    total = cumulative[-1]
+    return lambda roll: values[bisect(cumulative, roll * total)]
+
+
+def _skewed(rng: random.Random, mean: float) -> int:
+    """Pareto-distributed count with the given mean (at least 1, capped)."""
+    if mean <= 1:
+        return max(0, round(mean))
+    shape_mean = SKEW_ALPHA / (SKEW_ALPHA - 1)
+    return max(1, min(round(mean * SKEW_CAP), round(mean * rng.paretovariate(SKEW_ALPHA) / shape_mean)))
+
+
+def _cost(rng: random.Random) -> float | None:
+    if rng.random() < 0.45:
+        return None
+    return round(min(99999.0, rng.lognormvariate(3.6, 1.0)), 2)
+
+
+def _next_id(model) -> int:
+    return (db.session.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _receipt_blobs(rng: random.Random) -> list[tuple[str, int]]:
+    """Store a few small PNG "receipts"; attachments share them like real duplicates."""
+    from PIL import Image
+
+    storage = get_storage()
+    blobs = []
+    for _ in range(ATTACHMENT_BLOBS):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        buffer = io.BytesIO()
+        Image.new("RGB", (rng.choice((320, 640, 1024)), rng.choice((240, 480, 768))), color).save(buffer, "PNG")
+        data = buffer.getvalue()
+        key = hashlib.sha256(data).hexdigest()
+        if not storage.exists(key):
+            storage.put(key, io.BytesIO(data))
+        blobs.append((key, len(data)))
+    return blobs
+
+
+def _drop_secondary_indexes(conn, tables: list[str]) -> tuple[list[str], list[str]]:
+    """Drop the non-constraint indexes and triggers on ``tables``.
+
+    Returns the DDL that recreates them and the SQLite FTS tables whose triggers were dropped.
+    """
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(
+            text(
+                "SELECT type, name, sql FROM sqlite_master "
+                "WHERE type IN ('index', 'trigger') AND sql IS NOT NULL AND tbl_name IN :tables"
+            ).bindparams(bindparam("tables", expanding=True)),
+            {"tables": tables},
+        ).all()
+        for kind, name, _ in rows:
+            conn.exec_driver_sql(f'DROP {kind.upper()} "{name}"')
+        fts = sorted({name.rsplit("_", 1)[0] for kind, name, _ in rows if kind == "trigger" and "_fts_" in name})
+        return [sql for _, _, sql in rows], fts
+    if conn.dialect.name == "postgresql":
+        rows = conn.execute(
+            text(
+                "SELECT indexname, indexdef FROM pg_indexes i WHERE schemaname = current_schema() "
+                "AND tablename IN :tables AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname)"
+            ).bindparams(bindparam("tables", expanding=True)),
+            {"tables": tables},
+        ).all()
+        for name, _ in rows:
+            conn.exec_driver_sql(f"DROP INDEX {conn.dialect.identifier_preparer.quote(name)}")
+        return [definition for _, definition in rows], []
+    return [], []
+
+
+def _restore_indexes(ddl: list[str], fts: list[str], tables: list[str]) -> None:
+    with db.engine.begin() as conn:
+        for statement in ddl:
+            conn.exec_driver_sql(statement)
+        for name in fts:
+            # External-content FTS tables re-read their source rows.
+            conn.exec_driver_sql(f"INSERT INTO {name}({name}) VALUES('rebuild')")
+        if conn.dialect.name == "postgresql":
+            for table in tables:
+                conn.exec_driver_sql(f"ANALYZE {table}")
+
+
+def seed_households(
+    users: int | None = None,
+    assets_per_user: float = 5,
+    tasks_per_asset: float = 4,
+    years: float = 1,
+    attachments: bool = False,
+    seed: int = 0,
+    today: date | None = None,
+    chunk_size: int = SEED_CHUNK_SIZE,
+    progress=None,
+) -> SeedReport:
+    """Generate data for ``users`` new households, or for the first user when None.
+
+    New households are ``seed<n>@example.com`` with password ``SEED_PASSWORD``.
+    Raises ValueError if the target user already has assets or an email is taken.
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    roll = rng.random
+    today = today or date.today()
+    now = datetime.combine(today, datetime.min.time()) + timedelta(hours=12)
+    history_days = max(1, int(years * 365))
+    report = SeedReport()
+
+    if users is None:
+        first = db.session.execute(select(User).order_by(User.id).limit(1)).scalar()
+        if first is None:
+            raise ValueError("No users found. Register via the UI or pass --users.")
+        if db.session.execute(select(Asset.id).where(Asset.user_id == first.id).limit(1)).first():
+            raise ValueError("User already has assets; aborting to avoid duplicates.")
+        user_ids = [first.id]
+    else:
+        next_user = _next_id(User)
+        emails = [f"seed{next_user + n}@example.com" for n in range(users)]
+        if db.session.execute(select(User.id).where(User.email.in_(emails[:1000])).limit(1)).first():
+            raise ValueError("Seed users already exist; seed into a fresh database.")
+        password_hash = generate_password_hash(SEED_PASSWORD)
+        user_ids = list(range(next_user, next_user + users))
+        for start in range(0, users, chunk_size):
+            with db.engine.begin() as conn:
+                conn.execute(
+                    insert(User.__table__),
+                    [
+                        {"id": uid, "email": email, "password_hash": password_hash, "role": "member"}
+                        for uid, email in zip(user_ids[start:start + chunk_size], emails[start:start + chunk_size])
+                    ],
+                )
+        report.users = users
+
+    blobs = _receipt_blobs(rng) if attachments else []
+    asset_id, task_id, attachment_id = _next_id(Asset), _next_id(Task), _next_id(Attachment)
+    batches = _Batches(chunk_size, report, progress)
+    bulk_tables = [Asset.__tablename__, Task.__tablename__, Attachment.__tablename__]
+    deferred: tuple[list[str], list[str]] = ([], [])
+    # End the session's read transaction; on Postgres its table locks would block DROP INDEX.
+    db.session.commit()
+    if task_id == 1:
+        with db.engine.begin() as conn:
+            deferred = _drop_secondary_indexes(conn, bulk_tables)
+
+    # SQLite stores dates as ISO text; handing it text skips per-value conversion.
+    if db.engine.dialect.name == "sqlite":
+        day, stamp = date.isoformat, lambda moment: moment.isoformat(" ", "microseconds")
+    else:
+        day = stamp = lambda value: value
+    pick_type = _weighted(list(ASSET_TYPES), _TYPE_WEIGHTS)
+    pick_vendor = _weighted(VENDORS, _VENDOR_WEIGHTS)
+    pick_rule = _weighted(RULES, _RULE_WEIGHTS)
+    pick_priority = _weighted((0, 1, 2, 3), _PRIORITY_WEIGHTS)
+    today_ordinal, now_text = today.toordinal(), stamp(now)
+    minute = timedelta(minutes=1)
+    # The user mean is applied across households, the asset mean within one.
+    household_assets = [_skewed(rng, assets_per_user) if len(user_ids) > 1 else round(assets_per_user) for _ in user_ids]
+
+    try:
+        for uid, asset_count in zip(user_ids, household_assets):
+            for number in range(1, asset_count + 1):
+                asset_type = pick_type(roll())
+                name = f"{asset_type} #{number}"
+                purchased = date.fromordinal(today_ordinal - 30 - int(roll() * (history_days + 5 * 365)))
+                batches.assets.append((
+                    asset_id, uid, name, asset_type, MAKES[int(roll() * len(MAKES))],
+                    f"{100 + int(roll() * 900)}-{'XSLT'[int(roll() * 4)]}", f"SN{rng.getrandbits(40):010X}",
+                    day(purchased), day(purchased + timedelta(days=365 * (1, 2, 3, 5)[int(roll() * 4)])),
+                    None if roll() < 0.8 else "Seeded sample asset.",
+                    stamp(now - timedelta(days=int(roll() * history_days))), now_text,
+                ))
+                if blobs and roll() < 0.3:
+                    key, size = blobs[int(roll() * len(blobs))]
+                    batches.attachments.append((
+                        attachment_id, uid, asset_id, None, key, f"manual-{attachment_id}.png", "image/png", size,
+                    ))
+                    attachment_id += 1
+
+                titles = ASSET_TYPES[asset_type]
+                budget = _skewed(rng, tasks_per_asset)
+                # (title, due, rule, series_id, status, minutes, cost, vendor)
+                tasks: list[tuple] = []
+                if budget > 1 and roll() < RECURRING_SHARE:
+                    rule_text = pick_rule(roll())
+                    rule = compile_rule(rule_text)
+                    anchor = date.fromordinal(today_ordinal - 1 - int(roll() * history_days))
+                    dues = list(rule.occurrences(anchor, anchor - timedelta(days=1), today))[-(budget - 1):]
+                    dues.append(rule.next_after(anchor, dues[-1] if dues else today))
+                    title, cost, vendor = titles[int(roll() * len(titles))], _cost(rng), pick_vendor(roll())
+                    last = len(dues) - 1
+                    for index, due in enumerate(dues):
+                        if index < last:
+                            tasks.append((title, due, rule_text, task_id, "done", 30, cost, vendor))
+                        else:
+                            tasks.append((title, due, rule_text, task_id, "pending", 30, None, None))
+                    budget -= len(dues)
+
+                for _ in range(budget):
+                    due = date.fromordinal(today_ordinal - history_days + int(roll() * (history_days + 91)))
+                    chance = roll()
+                    if due > today or chance < 0.08:
+                        status, cost, vendor = "pending", None, None
+                    elif chance < 0.13:
+                        status, cost, vendor = "skipped", None, None
+                    else:
+                        status, cost = "done", _cost(rng)
+                        vendor = pick_vendor(roll()) if roll() < 0.6 else None
+                    tasks.append((
+                        titles[int(roll() * len(titles))], due if roll() < 0.95 else None, None, None, status,
+                        _MINUTES[int(roll() * len(_MINUTES))], cost, vendor,
+                    ))
+
+                for title, due, rule_text, series_id, status, minutes, cost, vendor in tasks:
+                    midnight = datetime.fromordinal((due or today).toordinal())
+                    created = min(now, midnight - minute * int(roll() * 60 * 1440 + 1440))
+                    if status == "done":
+                        updated = min(now, max(created, midnight + minute * int(roll() * 13 * 1440 - 3 * 1440)))
+                    else:
+                        updated = created
+                    batches.tasks.append((
+                        task_id, uid, asset_id, title,
+                        None if roll() < 0.7 else f"{title} for {name}.",
+                        day(due) if due else None, rule_text, series_id, status, pick_priority(roll()), minutes,
+                        cost, vendor, stamp(created), stamp(updated),
+                    ))
+                    if blobs and cost and roll() < 0.15:
+                        key, size = blobs[int(roll() * len(blobs))]
+                        batches.attachments.append((
+                            attachment_id, uid, asset_id, task_id, key, f"receipt-{task_id}.png", "image/png", size,
+                        ))
+                        attachment_id += 1
+                    task_id += 1
+                asset_id += 1
+                if batches.full():
+                    batches.flush()
+        batches.flush()
+    finally:
+        if deferred[0] or deferred[1]:
+            _restore_indexes(*deferred, bulk_tables)
+
+    with db.engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            for model in (User, Asset, Task, Attachment):
+                reset_sequence(conn, model.__table__)
+    rebuild_stats(user_ids[0] if len(user_ids) == 1 else None)
+    db.session.commit()
+    report.seconds = time.perf_counter() - started
+    return report
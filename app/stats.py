@@ -0,0 +1,300 @@
+"""Dashboard statistics and the summary tables that back them.
+
+Reads return plain tuples built from column rows, never ORM objects.  Pending
+counts, monthly completions and monthly spend live in ``user_stats`` and
+``monthly_rollup``; every write path that creates, edits, completes or deletes
+tasks records a :class:`StatsDelta` in the same transaction, and
+``flask rebuild-stats`` recomputes both tables from scratch.  ``user_stats``
+also carries the per-user data version used by :mod:`app.caching`.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, NamedTuple
+
+from sqlalchemy import and_, case, delete, extract, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .extensions import db
+from .models import Asset, MonthlyRollup, Task, User, UserStats
+from .utils.dates import month_start, next_month
+
+CHART_MONTHS = 12
+
+
+class TaskTotals(NamedTuple):
+    pending: int
+    overdue: int
+    oldest_overdue: date | None
+    month_cost: float
+    prev_month_cost: float
+    completed_by_month: tuple[int, ...]
+
+
+class AssetTotals(NamedTuple):
+    asset_count: int
+    warrantied: int
+
+
+class UpcomingTask(NamedTuple):
+    id: int
+    title: str
+    due_date: date | None
+    asset_name: str | None
+
+
+class RecentTask(NamedTuple):
+    id: int
+    title: str
+    status: str
+    updated_at: datetime | None
+    created_at: datetime | None
+
+
+def chart_months(today: date) -> list[date]:
+    """First day of each month in the dashboard chart, oldest first."""
+    cursor = month_start(today.replace(day=1), CHART_MONTHS - 1)
+    months = []
+    for _ in range(CHART_MONTHS):
+        months.append(cursor)
+        cursor = next_month(cursor)
+    return months
+
+
+def task_totals(user_id: int, today: date) -> TaskTotals:
+    """Read the dashboard counters from the summary tables.
+
+    Pending count, monthly spend and monthly completions come from one
+    ``user_stats`` row and at most twelve ``monthly_rollup`` rows.  Overdue
+    figures depend on ``today`` so they are aggregated live, but only over
+    pending tasks via ``ix_task_user_status_due``, not the whole history.
+    """
+    first_of_month = today.replace(day=1)
+    first_of_prev_month = month_start(first_of_month, 1)
+    months = chart_months(today)
+
+    pending = db.session.execute(
+        select(UserStats.pending_count).where(UserStats.user_id == user_id)
+    ).scalar()
+    overdue_count, oldest_overdue = db.session.execute(
+        select(func.count(Task.id), func.min(Task.due_date)).where(
+            Task.user_id == user_id,
+            Task.status == "pending",
+            Task.due_date != None,  # noqa: E711
+            Task.due_date < today,
+        )
+    ).one()
+    rollups = {
+        month: (completed, cents)
+        for month, completed, cents in db.session.execute(
+            select(MonthlyRollup.month, MonthlyRollup.completed_count, MonthlyRollup.cost_cents).where(
+                MonthlyRollup.user_id == user_id,
+                MonthlyRollup.month >= months[0],
+                MonthlyRollup.month <= months[-1],
+            )
+        )
+    }
+    return TaskTotals(
+        pending=pending or 0,
+        overdue=overdue_count,
+        oldest_overdue=oldest_overdue,
+        month_cost=rollups.get(first_of_month, (0, 0))[1] / 100,
+        prev_month_cost=rollups.get(first_of_prev_month, (0, 0))[1] / 100,
+        completed_by_month=tuple(rollups.get(month, (0, 0))[0] for month in months),
+    )
+
+
+def asset_totals(user_id: int, today: date) -> AssetTotals:
+    warrantied = and_(Asset.warranty_expiration != None, Asset.warranty_expiration >= today)  # noqa: E711
+    row = db.session.execute(
+        select(func.count(Asset.id), func.count(case((warrantied, 1)))).where(Asset.user_id == user_id)
+    ).one()
+    return AssetTotals(*row)
+
+
+def upcoming_tasks(user_id: int, until: date, limit: int = 8) -> list[UpcomingTask]:
+    stmt = (
+        select(Task.id, Task.title, Task.due_date, Asset.name)
+        .outerjoin(Asset, Asset.id == Task.asset_id)
+        .where(
+            Task.user_id == user_id,
+            Task.status == "pending",
+            Task.due_date != None,  # noqa: E711
+            Task.due_date <= until,
+        )
+        .order_by(Task.due_date.asc())
+        .limit(limit)
+    )
+    return [UpcomingTask(*row) for row in db.session.execute(stmt)]
+
+
+def recent_tasks(user_id: int, limit: int = 5) -> list[RecentTask]:
+    stmt = (
+        select(Task.id, Task.title, Task.status, Task.updated_at, Task.created_at)
+        .where(Task.user_id == user_id)
+        .order_by(Task.updated_at.desc())
+        .limit(limit)
+    )
+    return [RecentTask(*row) for row in db.session.execute(stmt)]
+
+
+class TaskFacts(NamedTuple):
+    """The task columns that feed the summary tables."""
+
+    status: str | None
+    updated_at: datetime | None
+    cost: Decimal | str | None
+
+
+def task_facts(task: Task) -> TaskFacts:
+    return TaskFacts(task.status, task.updated_at, task.cost)
+
+
+def _to_cents(value) -> int:
+    if value in (None, ""):
+        return 0
+    try:
+        return int((Decimal(str(value)) * 100).to_integral_value())
+    except (InvalidOperation, ValueError):
+        return 0
+
+
+class StatsDelta:
+    """Accumulates summary-table changes and applies them as increments."""
+
+    def __init__(self):
+        self.pending = 0
+        self.months: defaultdict[date, list[int]] = defaultdict(lambda: [0, 0])
+
+    def add(self, facts: TaskFacts | None, sign: int = 1) -> None:
+        if facts is None:
+            return
+        if facts.status == "pending":
+            self.pending += sign
+        elif facts.status == "done" and facts.updated_at:
+            bucket = self.months[date(facts.updated_at.year, facts.updated_at.month, 1)]
+            bucket[0] += sign
+            bucket[1] += sign * _to_cents(facts.cost)
+
+    def remove(self, facts: TaskFacts | None) -> None:
+        self.add(facts, sign=-1)
+
+    def apply(self, user_id: int) -> None:
+        if self.pending:
+            _increment(UserStats.__table__, {"user_id": user_id}, {"pending_count": self.pending})
+        for month, (completed, cents) in self.months.items():
+            if completed or cents:
+                _increment(
+                    MonthlyRollup.__table__,
+                    {"user_id": user_id, "month": month},
+                    {"completed_count": completed, "cost_cents": cents},
+                )
+
+
+def record_task_change(user_id: int, before: TaskFacts | None, after: TaskFacts | None) -> None:
+    """Apply the difference between two snapshots of one task.
+
+    Pass ``before=None`` for a new task and ``after=None`` for a deleted one.
+    Call after ``db.session.flush()`` so server-side timestamps are current.
+    """
+    delta = StatsDelta()
+    delta.remove(before)
+    delta.add(after)
+    delta.apply(user_id)
+
+
+def record_tasks_removed(user_id: int, facts: Iterable[TaskFacts]) -> None:
+    delta = StatsDelta()
+    for item in facts:
+        delta.remove(TaskFacts(*item))
+    delta.apply(user_id)
+
+
+def bump_data_version(user_id: int) -> None:
+    """Invalidate the user's cached views; call inside the write's transaction."""
+    _increment(UserStats.__table__, {"user_id": user_id}, {"data_version": 1})
+
+
+def data_version(user_id: int) -> int:
+    version = db.session.execute(select(UserStats.data_version).where(UserStats.user_id == user_id)).scalar()
+    return version or 0
+
+
+def _increment(table, key: dict, increments: dict) -> None:
+    """Add ``increments`` to the row identified by ``key``, creating it if missing."""
+    dialect = db.session.get_bind().dialect.name
+    dialect_insert = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}.get(dialect)
+    if dialect_insert is not None:
+        stmt = dialect_insert(table).values(**key, **increments)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key),
+            set_={column: table.c[column] + stmt.excluded[column] for column in increments},
+        )
+        db.session.execute(stmt)
+        return
+
+    match = [table.c[column] == value for column, value in key.items()]
+    result = db.session.execute(
+        update(table).where(*match).values({column: table.c[column] + value for column, value in increments.items()})
+    )
+    if not result.rowcount:
+        db.session.execute(insert(table).values(**key, **increments))
+
+
+def rebuild_stats(user_id: int | None = None) -> int:
+    """Recompute ``user_stats`` and ``monthly_rollup`` from the task table.
+
+    Rebuilds every user when ``user_id`` is None.  Returns the number of users
+    processed.  The caller commits.
+    """
+    user_ids = select(User.id)
+    if user_id is not None:
+        user_ids = user_ids.where(User.id == user_id)
+    user_ids = list(db.session.execute(user_ids).scalars())
+
+    scope = [Task.user_id == user_id] if user_id is not None else []
+    pending = dict(
+        db.session.execute(
+            select(Task.user_id, func.count(Task.id))
+            .where(Task.status == "pending", *scope)
+            .group_by(Task.user_id)
+        ).all()
+    )
+    year = extract("year", Task.updated_at)
+    month = extract("month", Task.updated_at)
+    monthly = db.session.execute(
+        select(Task.user_id, year, month, func.count(Task.id), func.sum(Task.cost))
+        .where(Task.status == "done", Task.updated_at != None, *scope)  # noqa: E711
+        .group_by(Task.user_id, year, month)
+    ).all()
+
+    stats_scope = [UserStats.user_id == user_id] if user_id is not None else []
+    rollup_scope = [MonthlyRollup.user_id == user_id] if user_id is not None else []
+    # Data versions must keep increasing across a rebuild or stale ETags would match again.
+    versions = dict(db.session.execute(select(UserStats.user_id, UserStats.data_version).where(*stats_scope)).all())
+    db.session.execute(delete(UserStats).where(*stats_scope))
+    db.session.execute(delete(MonthlyRollup).where(*rollup_scope))
+    if user_ids:
+        db.session.execute(
+            insert(UserStats),
+            [
+                {"user_id": uid, "pending_count": pending.get(uid, 0), "data_version": versions.get(uid, 0) + 1}
+                for uid in user_ids
+            ],
+        )
+    if monthly:
+        db.session.execute(
+            insert(MonthlyRollup),
+            [
+                {
+                    "user_id": uid,
+                    "month": date(int(row_year), int(row_month), 1),
+                    "completed_count": completed,
+                    "cost_cents": _to_cents(total),
+                }
+                for uid, row_year, row_month, completed, total in monthly
+            ],
+        )
+    return len(user_ids)
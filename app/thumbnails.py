@@ -0,0 +1,102 @@
+"""WebP thumbnails for image attachments.
+
+Renditions are rendered in a process pool, not in the web worker.  Each one is
+orientation-corrected from EXIF, stripped of metadata and stored in the
+attachment storage backend as ``thumbs/<size>/<key>.webp``.  Because attachment
+keys are content hashes, every attachment with the same image shares its
+thumbnails.  They are created lazily the first time ``/files/<id>/thumb/<size>``
+is asked for, or ahead of time by ``flask thumbnails backfill``.
+
+Fetching the source and storing the result is I/O (and remote with the S3
+backend), so that part runs on a small thread pool which hands only the
+CPU-bound resize to the process pool.
+"""
+from __future__ import annotations
+
+import atexit
+import os
+import tempfile
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from flask import current_app
+from PIL import Image, ImageOps
+
+from .utils.storage import THUMB_DIR, get_storage
+
+SIZES = {"small": 160, "medium": 640}
+IMAGE_MIMES = {"image/png", "image/jpeg", "image/webp", "image/gif"}
+WEBP_QUALITY = 80
+
+_pool: ProcessPoolExecutor | None = None
+_io_pool: ThreadPoolExecutor | None = None
+_pending: dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def thumbnail_key(key: str, size: str) -> str:
+    return f"{THUMB_DIR}/{size}/{key}.webp"
+
+
+def derived_keys(key: str) -> list[str]:
+    """Storage keys of every rendition of ``key``, rendered or not."""
+    return [thumbnail_key(key, size) for size in SIZES]
+
+
+def render_thumbnail(source: str, target: str, max_px: int) -> str:
+    """Write a WebP rendition of ``source`` no larger than ``max_px`` square.
+
+    Runs in a pool process, so it takes and returns plain strings.
+    """
+    with Image.open(source) as image:
+        # Let the JPEG decoder downscale while decoding; far cheaper for phone photos.
+        image.draft("RGB", (max_px * 2, max_px * 2))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        image.thumbnail((max_px, max_px), Image.Resampling.LANCZOS)
+        Path(target).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        # No exif= argument: the rendition carries no camera/location metadata.
+        image.save(tmp, "WEBP", quality=WEBP_QUALITY, method=4)
+    os.replace(tmp, target)
+    return target
+
+
+def build_thumbnail(storage, key: str, size: str, pool: Executor) -> str:
+    """Render ``key`` at ``size`` on ``pool`` and store it; returns the thumbnail key."""
+    with tempfile.TemporaryDirectory(dir=storage.staging_dir()) as workdir:
+        source = storage.local_path(key)
+        if source is None:
+            source = Path(workdir) / "source"
+            storage.download_file(key, source)
+        target = Path(workdir) / "thumb.webp"
+        pool.submit(render_thumbnail, str(source), str(target), SIZES[size]).result()
+        storage.put_file(thumbnail_key(key, size), target)
+    return thumbnail_key(key, size)
+
+
+def _executors() -> tuple[ThreadPoolExecutor, ProcessPoolExecutor]:
+    global _pool, _io_pool
+    with _lock:
+        if _pool is None:
+            workers = current_app.config["THUMBNAIL_WORKERS"]
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _io_pool = ThreadPoolExecutor(max_workers=workers * 2, thread_name_prefix="thumbnails")
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+            atexit.register(_io_pool.shutdown, wait=False, cancel_futures=True)
+    return _io_pool, _pool
+
+
+def request_thumbnail(key: str, size: str) -> Future:
+    """Future for the rendition, sharing one job between concurrent requests."""
+    target = thumbnail_key(key, size)
+    storage = get_storage()
+    io_pool, pool = _executors()
+    with _lock:
+        future = _pending.get(target)
+        if future is None:
+            future = io_pool.submit(build_thumbnail, storage, key, size, pool)
+            _pending[target] = future
+            future.add_done_callback(lambda _: _pending.pop(target, None))
+    return future
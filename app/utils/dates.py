@@ -17,3 +17,22 @@ def parse_iso_date(value: str | None) -> date | None:
             return datetime.fromisoformat(value).date()
         except ValueError:
             return None
+
+
+def month_start(base: date, months_back: int) -> date:
+    """First day of the month ``months_back`` months before ``base``."""
+    year = base.year
+    month = base.month
+    for _ in range(months_back):
+        month -= 1
+        if month == 0:
+            month = 12
+            year -= 1
+    return date(year, month, 1)
+
+
+def next_month(value: date) -> date:
+    """First day of the month after ``value``."""
+    if value.month == 12:
+        return date(value.year + 1, 1, 1)
+    return date(value.year, value.month + 1, 1)
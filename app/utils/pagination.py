@@ -0,0 +1,83 @@
+"""Keyset (cursor) pagination over a sort column plus an id tie-breaker.
+
+Rows are ordered by ``column`` (NULLs last, in either direction) and then by
+``id`` in the same direction.  A cursor records the sort value and id of the
+last row on a page; the next page starts strictly after it, so each page costs
+the same however deep the user scrolls.
+
+SQLite stores timestamps as text in two shapes: ``CURRENT_TIMESTAMP``
+defaults have no fractional part, values written by SQLAlchemy always carry
+six digits.  ``2026-01-01 10:00:00`` and ``2026-01-01 10:00:00.000000`` are the
+same instant but neither compare nor sort as equal, so on SQLite datetime
+columns are ordered and compared through :func:`keyset_column`, which pads
+both shapes to the six-digit form (``ix_task_user_created_key`` indexes it).
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from sqlalchemy import DateTime, String, and_, asc, desc, func, literal_column, or_, type_coerce
+
+
+def encode_cursor(value, row_id: int) -> str:
+    if isinstance(value, datetime):
+        payload = ["t", value.isoformat(), row_id]
+    elif isinstance(value, date):
+        payload = ["d", value.isoformat(), row_id]
+    else:
+        payload = ["s", value, row_id]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str | None) -> tuple[object, int] | None:
+    """Return ``(value, id)`` from a cursor token, or None if it is blank/invalid."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        kind, value, row_id = json.loads(raw)
+        if not isinstance(row_id, int):
+            return None
+        if value is not None:
+            if kind == "t":
+                value = datetime.fromisoformat(value)
+            elif kind == "d":
+                value = date.fromisoformat(value)
+            elif not isinstance(value, str):
+                return None
+        return value, row_id
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+def keyset_column(column, dialect: str = ""):
+    """The expression to order and compare ``column`` by on ``dialect``."""
+    if dialect == "sqlite" and isinstance(column.type, DateTime):
+        # Literal arguments, not bound parameters, so the expression index matches.
+        padded = type_coerce(column, String).concat(literal_column("'.000000'"))
+        return func.substr(padded, literal_column("1"), literal_column("26"))
+    return column
+
+
+def keyset_order(column, id_column, descending: bool = False, dialect: str = "") -> list:
+    direction = desc if descending else asc
+    return [direction(keyset_column(column, dialect)).nullslast(), direction(id_column)]
+
+
+def keyset_after(column, id_column, cursor: tuple[object, int], descending: bool = False, dialect: str = ""):
+    """Filter selecting the rows that follow ``cursor`` in :func:`keyset_order`."""
+    value, row_id = cursor
+    after_id = id_column < row_id if descending else id_column > row_id
+    if value is None:
+        # Already inside the trailing block of NULLs.
+        return and_(column.is_(None), after_id)
+
+    key = keyset_column(column, dialect)
+    if key is not column:
+        value = value.isoformat(sep=" ", timespec="microseconds") if isinstance(value, datetime) else str(value)
+    beyond = key < value if descending else key > value
+    return or_(beyond, and_(key == value, after_id), column.is_(None))
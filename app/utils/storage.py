@@ -1,10 +1,301 @@
-import secrets
+"""Content-addressed attachment storage with pluggable backends.
+
+Uploads are streamed through SHA-256 in fixed-size chunks into a temporary
+file and then stored under their hex digest.  Identical files share one blob,
+whoever uploads them, and every ``Attachment`` row with that key counts as a
+reference.
+
+Blobs are garbage-collected by mark and sweep.  Deleting attachments marks
+their keys in ``blob_release`` (:func:`release_files`, in the same
+transaction).  :func:`sweep_released_blobs`, run by the scheduler, later
+removes a marked blob and its thumbnails if no attachment refers to it and it
+has not been written for ``BLOB_SWEEP_GRACE_SECONDS``.  Every upload rewrites
+its blob, even when the content is already stored, so an upload racing with
+the delete of the last reference refreshes the blob and the sweep leaves it
+alone.
+
+Blobs live in a backend chosen by ``STORAGE_BACKEND``:
+
+* ``local`` (default): ``UPLOAD_FOLDER`` with keys sharded by hash prefix
+  (``ab/cd/abcd...``) so no directory grows past a few thousand entries.
+  Files from the older flat layout are still found.
+* ``s3``: any S3-compatible service (AWS, MinIO, ...), using a pooled client
+  and multipart transfers.  Needs the optional ``boto3`` dependency.
+
+``flask storage migrate`` copies blobs between backends.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
-from flask import current_app
-from werkzeug.utils import secure_filename
+from urllib.parse import quote
+
+from flask import current_app, request, send_file
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.utils import secure_filename, send_file as werkzeug_send_file
+from werkzeug.wsgi import wrap_file
+
+from .. import metrics
+from ..extensions import db
+from ..models import Attachment, BlobRelease
 
 ALLOWED_DEFAULT = {"png", "jpg", "jpeg", "pdf"}
+CHUNK_SIZE = 64 * 1024
+THUMB_DIR = "thumbs"   # derived renditions: thumbs/<size>/<key>.webp (app/thumbnails.py)
+STAGING_DIR = ".staging"
+
+
+def _check_key(key: str) -> None:
+    if not key or key.startswith("/") or ".." in key.split("/") or "\\" in key:
+        raise ValueError(f"Invalid storage key {key!r}.")
+
+
+class LocalStorage:
+    """Blobs on the local filesystem under ``root``, sharded by key prefix."""
+
+    name = "local"
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _sharded(self, key: str) -> Path:
+        parent, _, name = key.rpartition("/")
+        base = self.root / parent if parent else self.root
+        return base / name[:2] / name[2:4] / name
+
+    def path(self, key: str) -> Path:
+        """Where ``key`` lives: the sharded path, or a legacy flat path if only that exists."""
+        _check_key(key)
+        sharded = self._sharded(key)
+        if not sharded.is_file() and (self.root / key).is_file():
+            return self.root / key
+        return sharded
+
+    def local_path(self, key: str) -> Path | None:
+        path = self.path(key)
+        return path if path.is_file() else None
+
+    def staging_dir(self) -> Path:
+        """Temp directory on the same filesystem, so :meth:`put_file` is a rename."""
+        directory = self.root / STAGING_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).is_file()
+
+    def size(self, key: str) -> int:
+        return self.path(key).stat().st_size
+
+    def modified_at(self, key: str) -> datetime | None:
+        """When ``key`` was last written (naive UTC), or None if it is missing."""
+        try:
+            mtime = self.path(key).stat().st_mtime
+        except FileNotFoundError:
+            return None
+        return datetime.fromtimestamp(mtime, timezone.utc).replace(tzinfo=None)
+
+    def put_file(self, key: str, filename) -> None:
+        """Store the file at ``filename`` under ``key``; the file is moved, not copied."""
+        _check_key(key)
+        target = self._sharded(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(filename), target)
+
+    def put(self, key: str, stream) -> None:
+        fd, tmp_name = tempfile.mkstemp(dir=self.staging_dir())
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                shutil.copyfileobj(stream, tmp, CHUNK_SIZE)
+            self.put_file(key, tmp_name)
+        finally:
+            Path(tmp_name).unlink(missing_ok=True)
+
+    def open(self, key: str):
+        return open(self.path(key), "rb")
+
+    def download_file(self, key: str, filename) -> None:
+        shutil.copyfile(self.path(key), filename)
+
+    def delete(self, key: str) -> None:
+        _check_key(key)
+        for path in (self._sharded(key), self.root / key):
+            path.unlink(missing_ok=True)
+
+    def _walk(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+            parts = Path(dirpath).relative_to(self.root).parts
+            for name in filenames:
+                if name.startswith("."):
+                    continue
+                sharded = len(parts) >= 2 and parts[-2:] == (name[:2], name[2:4])
+                yield "/".join((*(parts[:-2] if sharded else parts), name)), sharded
+
+    def keys(self):
+        """Every stored key, from both the sharded and the legacy flat layout."""
+        return (key for key, _ in self._walk())
+
+    def legacy_keys(self):
+        """Keys still stored in the flat layout of earlier releases."""
+        return (key for key, sharded in self._walk() if not sharded)
+
+
+class S3Storage:
+    """Blobs in an S3-compatible bucket (AWS S3, MinIO, ...)."""
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: str | None = None,
+        region: str | None = None,
+        access_key: str | None = None,
+        secret_key: str | None = None,
+        max_pool_connections: int = 16,
+        multipart_threshold: int = 8 * 1024 * 1024,
+    ):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+            from botocore.exceptions import ClientError
+        except ImportError:  # pragma: no cover - optional dependency
+            raise RuntimeError("STORAGE_BACKEND=s3 needs boto3: pip install boto3") from None
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs S3_BUCKET.")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self._client_error = ClientError
+        # One client per process: its connection pool is shared by all threads.
+        self.client = boto3.session.Session().client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            config=Config(
+                max_pool_connections=max_pool_connections,
+                retries={"max_attempts": 5, "mode": "standard"},
+                s3={"addressing_style": "path"} if endpoint_url else None,
+            ),
+        )
+        self.transfer = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_threshold,
+            max_concurrency=4,
+        )
+
+    def _key(self, key: str) -> str:
+        _check_key(key)
+        return f"{self.prefix}{key}"
+
+    def _missing(self, exc) -> bool:
+        return exc.response.get("Error", {}).get("Code") in {"404", "NoSuchKey", "NotFound"}
+
+    def local_path(self, key: str) -> None:
+        return None
+
+    def staging_dir(self) -> None:
+        return None
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except self._client_error as exc:
+            if self._missing(exc):
+                return False
+            raise
+
+    def size(self, key: str) -> int:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))["ContentLength"]
+        except self._client_error as exc:
+            if self._missing(exc):
+                raise FileNotFoundError(key) from None
+            raise
+
+    def modified_at(self, key: str) -> datetime | None:
+        try:
+            stamp = self.client.head_object(Bucket=self.bucket, Key=self._key(key))["LastModified"]
+        except self._client_error as exc:
+            if self._missing(exc):
+                return None
+            raise
+        return stamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def put_file(self, key: str, filename) -> None:
+        self.client.upload_file(str(filename), self.bucket, self._key(key), Config=self.transfer)
+
+    def put(self, key: str, stream) -> None:
+        self.client.upload_fileobj(stream, self.bucket, self._key(key), Config=self.transfer)
+
+    def open(self, key: str, byte_range: tuple[int, int] | None = None):
+        """Readable body of ``key``, or of ``[start, stop)`` when ``byte_range`` is given."""
+        extra = {"Range": f"bytes={byte_range[0]}-{byte_range[1] - 1}"} if byte_range else {}
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key), **extra)["Body"]
+        except self._client_error as exc:
+            if self._missing(exc):
+                raise FileNotFoundError(key) from None
+            raise
+
+    def download_file(self, key: str, filename) -> None:
+        self.client.download_file(self.bucket, self._key(key), str(filename), Config=self.transfer)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def keys(self):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                yield item["Key"][len(self.prefix):]
+
+
+def build_storage(config, backend: str | None = None):
+    backend = (backend or config.get("STORAGE_BACKEND") or "local").lower()
+    if backend == "local":
+        return LocalStorage(config["UPLOAD_FOLDER"])
+    if backend == "s3":
+        return S3Storage(
+            bucket=config.get("S3_BUCKET"),
+            prefix=config.get("S3_PREFIX") or "",
+            endpoint_url=config.get("S3_ENDPOINT_URL"),
+            region=config.get("S3_REGION"),
+            access_key=config.get("S3_ACCESS_KEY_ID"),
+            secret_key=config.get("S3_SECRET_ACCESS_KEY"),
+            max_pool_connections=config.get("S3_MAX_POOL_CONNECTIONS", 16),
+            multipart_threshold=config.get("S3_MULTIPART_THRESHOLD", 8 * 1024 * 1024),
+        )
+    raise RuntimeError(f"Unknown STORAGE_BACKEND {backend!r}; use 'local' or 's3'.")
+
+
+def init_storage(app) -> None:
+    app.extensions["storage"] = build_storage(app.config)
+
+
+def get_storage():
+    return current_app.extensions["storage"]
+
+
+def hash_stream(stream, sink=None) -> tuple[str, int]:
+    """SHA-256 hex digest and byte count of ``stream``, copying it to ``sink`` if given."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+        if sink is not None:
+            sink.write(chunk)
+    return digest.hexdigest(), size
 
 
 def save_upload(file_storage):
@@ -19,10 +310,163 @@ def save_upload(file_storage):
     if allowed and ext not in allowed:
         raise ValueError("Unsupported file type.")
 
-    key = f"{secrets.token_hex(8)}_{filename}"
-    upload_dir = Path(current_app.config["UPLOAD_FOLDER"])
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    path = upload_dir / key
-    file_storage.save(path)
-    size = path.stat().st_size
-    return {"key": key, "size": size, "mime": file_storage.mimetype or "application/octet-stream", "original": filename}
+    storage = get_storage()
+    fd, tmp_name = tempfile.mkstemp(dir=storage.staging_dir(), prefix="upload-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            key, size = hash_stream(file_storage.stream, tmp)
+        stored = not storage.exists(key)
+        # Written even when the blob exists: the put is an atomic replace with
+        # the same bytes, and it renews the blob's age so a sweep running
+        # before this attachment commits keeps it (see sweep_released_blobs).
+        storage.put_file(key, tmp_name)
+    finally:
+        Path(tmp_name).unlink(missing_ok=True)
+    metrics.inc("hmt_upload_bytes_total", size)
+    metrics.inc("hmt_uploads_total", result="stored" if stored else "deduplicated")
+    return {
+        "key": key,
+        "size": size,
+        "mime": file_storage.mimetype or "application/octet-stream",
+        "original": filename,
+    }
+
+
+def _offload(path: Path, root: Path, mimetype: str, download_name: str | None):
+    """Empty response telling the front proxy to send ``path`` itself (SENDFILE_MODE)."""
+    config = current_app.config
+    response = werkzeug_send_file(
+        str(path),
+        request.environ,
+        mimetype=mimetype,
+        download_name=download_name,
+        use_x_sendfile=True,
+        conditional=False,
+        response_class=current_app.response_class,
+    )
+    if config["SENDFILE_MODE"] == "x-accel-redirect":
+        del response.headers["X-Sendfile"]
+        prefix = config["SENDFILE_ACCEL_PREFIX"].rstrip("/")
+        response.headers["X-Accel-Redirect"] = f"{prefix}/{quote(path.relative_to(root).as_posix())}"
+    # The proxy supplies the body, its length and any Range slicing.
+    del response.headers["Content-Length"]
+    return response
+
+
+def _send_remote(storage, key: str, mimetype: str, download_name: str | None):
+    """Stream ``key`` from a backend without local files, passing a single-part Range on."""
+    try:
+        size = storage.size(key)
+    except FileNotFoundError:
+        return None
+    response = current_app.response_class(mimetype=mimetype, direct_passthrough=True)
+    byte_range = None
+    if_range = request.if_range
+    if request.range and if_range.date is None and if_range.etag in (None, key):
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None:
+            response.status_code = 416
+            response.headers["Content-Range"] = f"bytes */{size}"
+            return response
+    body = storage.open(key, byte_range)
+    if byte_range is not None:
+        start, stop = byte_range
+        response.status_code = 206
+        response.headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+        size = stop - start
+    response.response = wrap_file(request.environ, body, CHUNK_SIZE)
+    response.content_length = size
+    response.accept_ranges = "bytes"
+    if download_name:
+        response.headers.set("Content-Disposition", "inline", filename=download_name)
+    return response
+
+
+def send_blob(key: str, mimetype: str, download_name: str | None = None):
+    """Response serving ``key`` from the storage backend, or None if it is missing.
+
+    A key names its content, so it doubles as a strong ETag and the response
+    may be cached as immutable.  Local files are sent with Range and
+    conditional support, or handed to the front proxy when SENDFILE_MODE is
+    set; remote blobs are streamed through with Range passed on to the backend.
+    """
+    storage = get_storage()
+    if request.if_none_match.contains(key):
+        response = current_app.response_class(status=304)
+    else:
+        path = storage.local_path(key)
+        if path is None:
+            response = _send_remote(storage, key, mimetype, download_name)
+        elif current_app.config["SENDFILE_MODE"]:
+            response = _offload(path, storage.root, mimetype, download_name)
+        else:
+            response = send_file(path, mimetype=mimetype, download_name=download_name, conditional=True, etag=key)
+        if response is None:
+            return None
+    response.set_etag(key)
+    response.expires = None
+    response.cache_control.no_cache = None
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config["BLOB_MAX_AGE"]
+    response.cache_control.immutable = True
+    return response
+
+
+def release_files(keys) -> None:
+    """Mark the blobs for ``keys`` for :func:`sweep_released_blobs`.
+
+    Call in the transaction that deletes their attachments, so a rolled-back
+    delete marks nothing.  Nothing is deleted here; keys that are still
+    referenced are simply dropped by the sweep.
+    """
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    rows = [{"key": key, "released_at": datetime.utcnow()} for key in keys]
+    dialect = db.session.get_bind().dialect.name
+    dialect_insert = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}.get(dialect)
+    if dialect_insert is not None:
+        stmt = dialect_insert(BlobRelease)
+        # A fresh release restarts the grace period.
+        db.session.execute(
+            stmt.on_conflict_do_update(index_elements=["key"], set_={"released_at": stmt.excluded.released_at}), rows
+        )
+        return
+    db.session.execute(delete(BlobRelease).where(BlobRelease.key.in_(keys)))
+    db.session.execute(insert(BlobRelease), rows)
+
+
+def sweep_released_blobs(grace_seconds: float, limit: int = 1000) -> tuple[int, int]:
+    """Delete marked blobs that stayed unreferenced for ``grace_seconds``; returns ``(deleted, kept)``.
+
+    Each key is re-checked right before its blob is deleted.  A blob written
+    within the grace period is left for a later sweep, because an upload of
+    the same content may not have committed its attachment yet.
+    """
+    from ..thumbnails import derived_keys  # noqa: WPS433 - thumbnails imports this module
+
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    keys = db.session.execute(
+        select(BlobRelease.key).where(BlobRelease.released_at < cutoff).order_by(BlobRelease.released_at).limit(limit)
+    ).scalars().all()
+    storage = get_storage()
+    deleted = kept = 0
+    for key in keys:
+        if db.session.execute(select(Attachment.id).where(Attachment.key == key).limit(1)).first() is not None:
+            kept += 1
+        else:
+            modified = storage.modified_at(key)
+            if modified is not None and modified >= cutoff:
+                continue
+            try:
+                for blob in (key, *derived_keys(key)):
+                    storage.delete(blob)
+            except Exception:  # noqa: BLE001 - keep the mark; the next sweep retries
+                current_app.logger.warning("Could not delete blob %s", key, exc_info=True)
+                continue
+            deleted += 1
+        # Only the mark this sweep looked at; a newer release keeps its own.
+        db.session.execute(delete(BlobRelease).where(BlobRelease.key == key, BlobRelease.released_at < cutoff))
+        db.session.commit()
+    return deleted, kept
@@ -1,6 +1,7 @@
-
 from __future__ import with_statement
 
+import warnings
+from fnmatch import fnmatch
 from logging.config import fileConfig
 from flask import current_app
 from alembic import context
@@ -11,16 +12,52 @@ if config.config_file_name is not None:
 
 target_metadata = current_app.extensions['migrate'].db.metadata
 
+# FTS5 virtual tables and their shadow tables (*_data, *_idx, *_config,
+# *_docsize, *_content) are created by raw SQL in a migration and are not in
+# the metadata; autogenerate must not try to drop them.
+UNMANAGED_TABLES = ('*_fts', '*_fts_*')
+
+# SQLite cannot reflect expression indexes (ix_task_user_created_key), so
+# autogenerate leaves them out of the comparison; they are created by their
+# migration.  Silence the two warnings that say so on every run.
+warnings.filterwarnings('ignore', message='Skipped unsupported reflection of expression-based index')
+warnings.filterwarnings('ignore', message='autogenerate skipping metadata-specified expression-based index')
+
+
+def _other_dialect_only(index, dialect):
+    """True for an ``Index(...).ddl_if(dialect=...)`` that is never created on ``dialect``."""
+    ddl_if = getattr(index, '_ddl_if', None)
+    if ddl_if is None or not ddl_if.dialect:
+        return False
+    wanted = (ddl_if.dialect,) if isinstance(ddl_if.dialect, str) else tuple(ddl_if.dialect)
+    return dialect not in wanted
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == 'table' and name and any(fnmatch(name, pattern) for pattern in UNMANAGED_TABLES):
+        return False
+    # Postgres-only partial indexes must not be created on (or compared against) SQLite.
+    if type_ == 'index' and not reflected and _other_dialect_only(object, context.get_context().dialect.name):
+        return False
+    return True
+
+
 def run_migrations_offline():
     url = current_app.config.get("SQLALCHEMY_DATABASE_URI")
-    context.configure(url=url, target_metadata=target_metadata, literal_binds=True, compare_type=True)
+    context.configure(
+        url=url, target_metadata=target_metadata, literal_binds=True, compare_type=True,
+        include_object=include_object,
+    )
     with context.begin_transaction():
         context.run_migrations()
 
 def run_migrations_online():
     connectable = current_app.extensions['migrate'].db.engine
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata, compare_type=True)
+        context.configure(
+            connection=connection, target_metadata=target_metadata, compare_type=True,
+            include_object=include_object,
+        )
         with context.begin_transaction():
             context.run_migrations()
 
@@ -0,0 +1,28 @@
+"""add task keyset indexes
+
+Revision ID: 148fbd9709e7
+Revises: a092b453e17a
+Create Date: 2026-10-18 11:26:54.018332
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '148fbd9709e7'
+down_revision = 'a092b453e17a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_task_user_due_id', 'task', ['user_id', 'due_date', 'id'], unique=False)
+    op.create_index('ix_task_user_title_id', 'task', ['user_id', 'title', 'id'], unique=False)
+    op.create_index('ix_task_user_created_id', 'task', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_task_user_created_id', table_name='task')
+    op.drop_index('ix_task_user_title_id', table_name='task')
+    op.drop_index('ix_task_user_due_id', table_name='task')
@@ -60,6 +60,8 @@ def downgrade():
     op.drop_index(op.f('ix_task_status'), table_name='task')
     op.drop_index(op.f('ix_task_due_date'), table_name='task')
     op.drop_table('task')
+    # Postgres keeps the enum as a separate type; dropping the table leaves it behind.
+    sa.Enum(name='task_status').drop(op.get_bind(), checkfirst=True)
     op.drop_index(op.f('ix_asset_type'), table_name='asset')
     op.drop_index(op.f('ix_asset_serial'), table_name='asset')
     op.drop_index(op.f('ix_asset_name'), table_name='asset')
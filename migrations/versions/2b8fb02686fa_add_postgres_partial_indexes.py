@@ -0,0 +1,42 @@
+"""add postgres partial indexes
+
+Revision ID: 2b8fb02686fa
+Revises: e88ddf417fed
+Create Date: 2026-10-18 19:05:12.418730
+
+Postgres only: partial, covering indexes for the hot predicates.  Pending
+tasks per user by due date (dashboard overdue/upcoming, open/overdue lists,
+reminder digests), done tasks per user by completion time (stats rebuild)
+and the pending part of the outbox.  Most rows are done or sent, so each index
+stays small, and INCLUDE lets the common queries run as index-only scans.
+SQLite keeps using the full composite indexes.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b8fb02686fa'
+down_revision = 'e88ddf417fed'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_task_pending_user_due', 'task', ['user_id', 'due_date', 'id'], ['title', 'asset_id'], "status = 'pending'"),
+    ('ix_task_done_user_updated', 'task', ['user_id', 'updated_at'], ['cost'], "status = 'done'"),
+    ('ix_outbox_pending_id', 'outbox', ['id'], ['next_attempt_at'], "status = 'pending'"),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, table, columns, include, where in INDEXES:
+        op.create_index(name, table, columns, postgresql_include=include, postgresql_where=sa.text(where))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, table, *_ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
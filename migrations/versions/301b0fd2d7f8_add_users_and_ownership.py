@@ -39,6 +39,9 @@ def upgrade():
             }
         ],
     )
+    if op.get_bind().dialect.name == 'postgresql':
+        # The explicit id above does not advance the serial sequence.
+        op.execute(sa.text("SELECT setval(pg_get_serial_sequence('\"user\"', 'id'), (SELECT max(id) FROM \"user\"))"))
 
     with op.batch_alter_table('asset', schema=None) as batch_op:
         batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
@@ -0,0 +1,31 @@
+"""add blob release marks
+
+Revision ID: 3f6a9c2d8e15
+Revises: 6c1f0d3b9a47
+Create Date: 2026-10-19 09:14:42.306118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a9c2d8e15'
+down_revision = '6c1f0d3b9a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'blob_release',
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('released_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_blob_release_released_at'), 'blob_release', ['released_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_blob_release_released_at'), table_name='blob_release')
+    op.drop_table('blob_release')
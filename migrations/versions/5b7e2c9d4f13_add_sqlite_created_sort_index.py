@@ -0,0 +1,36 @@
+"""add sqlite created sort index
+
+Revision ID: 5b7e2c9d4f13
+Revises: 8d2e4b7c1a90
+Create Date: 2026-10-18 21:14:03.552190
+
+SQLite only: ``created_at`` holds both ``CURRENT_TIMESTAMP`` text without a
+fractional part and SQLAlchemy's six-digit form, so the task list sorts it
+through ``substr(created_at || '.000000', 1, 26)``.  This expression index
+keeps that sort and its keyset cursor on an index, as
+``ix_task_user_created_id`` does for the raw column on Postgres.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2c9d4f13'
+down_revision = '8d2e4b7c1a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.create_index(
+        'ix_task_user_created_key', 'task',
+        ['user_id', sa.text("substr(created_at || '.000000', 1, 26)"), 'id'], unique=False,
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.drop_index('ix_task_user_created_key', table_name='task')
@@ -0,0 +1,30 @@
+"""add task series
+
+Revision ID: 5edc18843696
+Revises: c41d7a9e2b65
+Create Date: 2026-10-18 14:02:51.318204
+
+Existing tasks with a recurrence rule each start their own series.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5edc18843696'
+down_revision = 'c41d7a9e2b65'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ALTERs rather than a batch: recreating the table on SQLite would
+    # drop the FTS triggers added in c41d7a9e2b65.
+    op.add_column('task', sa.Column('series_id', sa.Integer(), nullable=True))
+    op.execute("UPDATE task SET series_id = id WHERE recurrence_rule IS NOT NULL")
+    op.create_index('ix_task_series_due', 'task', ['series_id', 'due_date'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_task_series_due', table_name='task')
+    op.drop_column('task', 'series_id')
@@ -0,0 +1,36 @@
+"""add api tokens
+
+Revision ID: 6c1f0d3b9a47
+Revises: 2b8fb02686fa
+Create Date: 2026-10-18 10:32:05.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c1f0d3b9a47'
+down_revision = '2b8fb02686fa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'api_token',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.Column('token_hash', sa.String(length=64), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('token_hash')
+    )
+    op.create_index(op.f('ix_api_token_user_id'), 'api_token', ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_api_token_user_id'), table_name='api_token')
+    op.drop_table('api_token')
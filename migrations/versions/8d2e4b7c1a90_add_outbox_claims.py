@@ -0,0 +1,28 @@
+"""add outbox claims
+
+Revision ID: 8d2e4b7c1a90
+Revises: 3f6a9c2d8e15
+Create Date: 2026-10-19 11:02:17.540391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e4b7c1a90'
+down_revision = '3f6a9c2d8e15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('outbox', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    # Messages claimed by a run still in progress go back to the queue.
+    op.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending'")
+    with op.batch_alter_table('outbox', schema=None) as batch_op:
+        batch_op.drop_column('claimed_at')
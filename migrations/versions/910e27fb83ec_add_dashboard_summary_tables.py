@@ -0,0 +1,83 @@
+"""add dashboard summary tables
+
+Revision ID: 910e27fb83ec
+Revises: f82a3a3b764f
+Create Date: 2026-10-18 09:12:41.503118
+
+"""
+from datetime import date
+from decimal import Decimal
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '910e27fb83ec'
+down_revision = 'f82a3a3b764f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    user_stats = op.create_table(
+        'user_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('pending_count', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    monthly_rollup = op.create_table(
+        'monthly_rollup',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('completed_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('cost_cents', sa.BigInteger(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'month')
+    )
+
+    # Backfill from the existing task history.
+    conn = op.get_bind()
+    user = sa.table('user', sa.column('id', sa.Integer))
+    task = sa.table(
+        'task',
+        sa.column('user_id', sa.Integer),
+        # Typed as the enum so Postgres compares task_status to task_status.
+        sa.column('status', sa.Enum('pending', 'done', 'skipped', 'deleted', name='task_status')),
+        sa.column('updated_at', sa.DateTime),
+        sa.column('cost', sa.Numeric(10, 2)),
+    )
+    pending = dict(conn.execute(
+        sa.select(task.c.user_id, sa.func.count())
+        .where(task.c.status == 'pending')
+        .group_by(task.c.user_id)
+    ).all())
+    user_ids = conn.execute(sa.select(user.c.id)).scalars().all()
+    if user_ids:
+        op.bulk_insert(user_stats, [
+            {'user_id': uid, 'pending_count': pending.get(uid, 0)} for uid in user_ids
+        ])
+
+    year = sa.extract('year', task.c.updated_at)
+    month = sa.extract('month', task.c.updated_at)
+    monthly = conn.execute(
+        sa.select(task.c.user_id, year, month, sa.func.count(), sa.func.sum(task.c.cost))
+        .where(task.c.status == 'done', task.c.updated_at.isnot(None))
+        .group_by(task.c.user_id, year, month)
+    ).all()
+    if monthly:
+        op.bulk_insert(monthly_rollup, [
+            {
+                'user_id': uid,
+                'month': date(int(row_year), int(row_month), 1),
+                'completed_count': completed,
+                'cost_cents': int((Decimal(str(total or 0)) * 100).to_integral_value()),
+            }
+            for uid, row_year, row_month, completed, total in monthly
+        ])
+
+
+def downgrade():
+    op.drop_table('monthly_rollup')
+    op.drop_table('user_stats')
@@ -0,0 +1,40 @@
+"""add scheduler tables
+
+Revision ID: 97a508860e1e
+Revises: 5edc18843696
+Create Date: 2026-10-18 15:21:07.604417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '97a508860e1e'
+down_revision = '5edc18843696'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'scheduler_job',
+        sa.Column('name', sa.String(length=80), nullable=False),
+        sa.Column('last_run_at', sa.DateTime(), nullable=False),
+        sa.Column('last_status', sa.String(length=20), nullable=True),
+        sa.Column('last_duration_ms', sa.Integer(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table(
+        'scheduler_lease',
+        sa.Column('name', sa.String(length=80), nullable=False),
+        sa.Column('owner', sa.String(length=200), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('scheduler_lease')
+    op.drop_table('scheduler_job')
@@ -0,0 +1,30 @@
+"""drop attachment sha256
+
+Revision ID: 9c4d1e7a2f58
+Revises: 5b7e2c9d4f13
+Create Date: 2026-10-18 22:40:17.903614
+
+``attachment.key`` is the SHA-256 of the content, so the ``sha256`` column
+added by ``e88ddf417fed`` only repeated it.  Downgrade restores the column
+from the keys that are digests.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4d1e7a2f58'
+down_revision = '5b7e2c9d4f13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('attachment', schema=None) as batch_op:
+        batch_op.drop_column('sha256')
+
+
+def downgrade():
+    with op.batch_alter_table('attachment', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sha256', sa.String(length=64), nullable=True))
+    op.execute("UPDATE attachment SET sha256 = key WHERE length(key) = 64")
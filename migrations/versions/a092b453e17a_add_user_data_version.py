@@ -0,0 +1,26 @@
+"""add user data version
+
+Revision ID: a092b453e17a
+Revises: 910e27fb83ec
+Create Date: 2026-10-18 10:03:17.220841
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a092b453e17a'
+down_revision = '910e27fb83ec'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_stats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.BigInteger(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user_stats', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
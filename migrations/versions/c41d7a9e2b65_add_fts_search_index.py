@@ -0,0 +1,69 @@
+"""add fts search index
+
+Revision ID: c41d7a9e2b65
+Revises: 148fbd9709e7
+Create Date: 2026-10-18 12:40:09.771502
+
+SQLite only: creates FTS5 external-content tables over task and asset, the
+triggers that keep them in sync, and backfills them.  Skipped on other
+databases and on SQLite builds without FTS5; app/search.py then falls back to
+LIKE filters.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7a9e2b65'
+down_revision = '148fbd9709e7'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'task_fts': ('task', ['title', 'description', 'vendor']),
+    'asset_fts': ('asset', ['name', 'make', 'model', 'serial']),
+}
+
+
+def _fts5_supported(conn):
+    if conn.dialect.name != 'sqlite':
+        return False
+    return bool(conn.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+
+def upgrade():
+    conn = op.get_bind()
+    if not _fts5_supported(conn):
+        return
+
+    for fts, (source, columns) in INDEXES.items():
+        cols = ', '.join(columns)
+        new_vals = ', '.join(f'new.{c}' for c in columns)
+        old_vals = ', '.join(f'old.{c}' for c in columns)
+        op.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{source}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {source} BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {source} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON {source} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals}); END"
+        )
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name != 'sqlite':
+        return
+    for fts in INDEXES:
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+        op.execute(f"DROP TABLE IF EXISTS {fts}")
@@ -0,0 +1,88 @@
+"""content addressed attachments
+
+Revision ID: e88ddf417fed
+Revises: fe53b8168617
+Create Date: 2026-10-18 17:12:30.448613
+
+Attachment keys become the SHA-256 of the file, so identical uploads share one
+blob and ``key`` is no longer unique.  Existing files are hashed and linked (or
+copied) under their digest.  The old files are left in place, so a failed or
+rolled-back upgrade loses nothing; remove them afterwards with
+``flask storage prune-legacy``.  Files missing from UPLOAD_FOLDER keep their
+old key and no hash.
+
+Downgrade keeps the hashed file names but fails if attachments share a blob.
+"""
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e88ddf417fed'
+down_revision = 'fe53b8168617'
+branch_labels = None
+depends_on = None
+
+NAMING = {'uq': 'uq_%(table_name)s_%(column_0_name)s'}
+CHUNK_SIZE = 64 * 1024
+
+
+def _unique_key_name(conn):
+    # SQLite's constraint is unnamed (batch mode names it via NAMING); Postgres
+    # generated attachment_key_key.
+    return 'uq_attachment_key' if conn.dialect.name == 'sqlite' else 'attachment_key_key'
+
+
+def _upload_dir():
+    try:
+        from flask import current_app
+        return Path(current_app.config['UPLOAD_FOLDER'])
+    except (RuntimeError, KeyError):
+        return None
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def upgrade():
+    conn = op.get_bind()
+    with op.batch_alter_table('attachment', schema=None, naming_convention=NAMING) as batch_op:
+        batch_op.add_column(sa.Column('sha256', sa.String(length=64), nullable=True))
+        batch_op.drop_constraint(_unique_key_name(conn), type_='unique')
+        batch_op.create_index('ix_attachment_key', ['key'], unique=False)
+
+    directory = _upload_dir()
+    if directory is None or not directory.is_dir():
+        return
+    attachment = sa.table('attachment', sa.column('id', sa.Integer), sa.column('key', sa.String), sa.column('sha256', sa.String))
+    for attachment_id, key in conn.execute(sa.select(attachment.c.id, attachment.c.key)).all():
+        path = directory / key
+        if not path.is_file():
+            continue
+        digest = _sha256(path)
+        target = directory / digest
+        if target != path:
+            if not target.exists():
+                try:
+                    os.link(path, target)
+                except OSError:
+                    shutil.copyfile(path, target)
+        conn.execute(attachment.update().where(attachment.c.id == attachment_id).values(key=digest, sha256=digest))
+
+
+def downgrade():
+    conn = op.get_bind()
+    with op.batch_alter_table('attachment', schema=None, naming_convention=NAMING) as batch_op:
+        batch_op.drop_index('ix_attachment_key')
+        batch_op.create_unique_constraint(_unique_key_name(conn), ['key'])
+        batch_op.drop_column('sha256')
@@ -0,0 +1,270 @@
+"""Time the hot endpoints against a seeded dataset and track regressions.
+
+Boots ``create_app`` on a database generated by :mod:`app.seeding` (cached
+per dataset size under ``instance/bench/`` unless ``--database`` is given),
+signs in as the household with the most tasks and requests each endpoint
+through the Flask test client.  For every case it reports latency
+percentiles, SQL statements per request and peak Python memory (traced in a
+separate request so tracing does not skew the timings).
+
+    python scripts/benchmark.py --users 200 --tasks-per-asset 50 --output bench.json
+    python scripts/benchmark.py --users 200 --tasks-per-asset 50 --compare bench.json
+
+``--compare`` exits 1 if any case's p95 grew by more than ``--threshold``
+(and by at least ``--min-delta-ms``) or it issues more statements than in the
+baseline.  The fragment cache is off unless ``--cache`` is given, so views do
+their full work on every request.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+TASK_STATUSES = ("all", "open", "overdue", "done")
+TASK_SORTS = ("due", "title", "created")
+HTMX = {"HX-Request": "true"}
+_CURSOR = re.compile(r"cursor=([A-Za-z0-9_\-=%]+)")
+
+
+def cases(search: str, attachment_id: int | None) -> list[tuple[str, str, dict]]:
+    """``(name, url, headers)`` for every benchmarked request."""
+    found = [("main.index", "/", {})]
+    for status in TASK_STATUSES:
+        for sort in TASK_SORTS:
+            found.append((f"tasks.list_tasks {status} by {sort}", f"/tasks/?status={status}&sort={sort}", {}))
+    for window in ("7d", "30d"):
+        found.append((f"tasks.list_tasks open within {window}", f"/tasks/?status=open&window={window}", {}))
+    found.append(("tasks.list_tasks search", f"/tasks/?q={search}", {}))
+    found.append(("tasks.list_tasks htmx _table.html", "/tasks/?status=all&sort=due", HTMX))
+    found.append(("tasks.export_tasks all", "/tasks/export.csv?status=all", {}))
+    found.append(("tasks.export_tasks done", "/tasks/export.csv?status=done", {}))
+    found.append(("assets.list_assets", "/assets/", {}))
+    found.append(("assets.list_assets search", f"/assets/?q={search}", {}))
+    if attachment_id is not None:
+        found.append(("files.get_attachment", f"/files/{attachment_id}", {}))
+    return found
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_database(args, prefix: str = "bench") -> str:
+    """``--database``, or a SQLite file cached per dataset size under ``instance/<prefix>/``."""
+    if args.database:
+        return args.database
+    name = f"{prefix}-u{args.users}-a{args.assets_per_user:g}-t{args.tasks_per_asset:g}-y{args.years:g}-s{args.seed}.db"
+    path = ROOT / "instance" / prefix / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return f"sqlite:///{path}"
+
+
+def build_app(args, url: str):
+    os.environ["SQLALCHEMY_DATABASE_URI"] = url
+    os.environ["FRAGMENT_CACHE_ENABLED"] = "1" if args.cache else "0"
+    os.environ["SLOW_QUERY_MS"] = "0"
+    os.environ.setdefault("METRICS_DIR", tempfile.mkdtemp(prefix="bench-metrics-"))
+    if not args.database:
+        os.environ.setdefault("UPLOAD_FOLDER", str(ROOT / "instance" / "bench" / "uploads"))
+    from app import create_app
+
+    return create_app()
+
+
+def ensure_seeded(app, args) -> None:
+    from flask_migrate import upgrade
+    from sqlalchemy import func, select
+
+    from app.extensions import db
+    from app.models import Task
+    from app.seeding import seed_households
+
+    with app.app_context():
+        upgrade(directory=str(ROOT / "migrations"))
+        if db.session.execute(select(func.count()).select_from(Task)).scalar():
+            return
+        print("Seeding benchmark dataset...", file=sys.stderr)
+        report = seed_households(
+            users=args.users,
+            assets_per_user=args.assets_per_user,
+            tasks_per_asset=args.tasks_per_asset,
+            years=args.years,
+            attachments=True,
+            seed=args.seed,
+            today=date(2026, 1, 1) if args.fixed_date else None,
+        )
+        print(f"Seeded {report.tasks:,} task(s) in {report.seconds:.1f}s.", file=sys.stderr)
+
+
+def pick_subject(app) -> tuple[int, int | None, int]:
+    """The user with most tasks, one of their attachments and their task count."""
+    from sqlalchemy import func, select
+
+    from app.extensions import db
+    from app.models import Attachment, Task
+
+    with app.app_context():
+        user_id, tasks = db.session.execute(
+            select(Task.user_id, func.count()).group_by(Task.user_id).order_by(func.count().desc()).limit(1)
+        ).one()
+        attachment_id = db.session.execute(
+            select(Attachment.id).where(Attachment.user_id == user_id).order_by(Attachment.id).limit(1)
+        ).scalar()
+    return user_id, attachment_id, tasks
+
+
+def run_case(app, client, url: str, headers: dict, iterations: int, warmup: int) -> dict:
+    from app.instrumentation import count_queries
+
+    def fetch():
+        response = client.get(url, headers=headers)
+        body = response.get_data()   # drain streamed responses (CSV export, files)
+        response.close()
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} answered {response.status_code}")
+        return body
+
+    for _ in range(warmup):
+        fetch()
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fetch()
+        timings.append((time.perf_counter() - started) * 1000)
+    with app.app_context(), count_queries() as log:
+        fetch()
+    tracemalloc.start()
+    body = fetch()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "iterations": iterations,
+        "min_ms": round(min(timings), 3),
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "queries": log.count,
+        "peak_kib": round(peak / 1024, 1),
+        "bytes": len(body),
+        "_body": body,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list[str]:
+    """Regression messages for cases that got slower or chattier than ``baseline``."""
+    problems = []
+    for name, current in results["cases"].items():
+        before = baseline.get("cases", {}).get(name)
+        if before is None:
+            continue
+        delta = current["p95_ms"] - before["p95_ms"]
+        if delta > min_delta_ms and current["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            problems.append(f"{name}: p95 {before['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms")
+        if current["queries"] > before["queries"]:
+            problems.append(f"{name}: {before['queries']} -> {current['queries']} queries")
+    return problems
+
+
+def _report(name: str, result: dict) -> None:
+    print(
+        f"{name:<42} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f}"
+        f" {result['queries']:>8} {result['peak_kib']:>9.1f}"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the hot endpoints.")
+    parser.add_argument("--database", help="Use this (seeded if empty) database instead of a cached SQLite file.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--assets-per-user", type=float, default=10)
+    parser.add_argument("--tasks-per-asset", type=float, default=40)
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--fixed-date", action="store_true", help="Anchor the generated history at 2026-01-01.")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--search", default="filter", help="Search text for the search cases.")
+    parser.add_argument("--only", action="append", default=[], help="Only cases whose name contains this (repeatable).")
+    parser.add_argument("--cache", action="store_true", help="Leave the fragment cache on.")
+    parser.add_argument("--output", help="Write results as JSON to this file.")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier --output run.")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Allowed p95 growth before failing.")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore p95 changes smaller than this.")
+    args = parser.parse_args()
+
+    url = prepare_database(args)
+    app = build_app(args, url)
+    ensure_seeded(app, args)
+    user_id, attachment_id, task_count = pick_subject(app)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+
+    selected = [case for case in cases(args.search, attachment_id) if not args.only or any(text in case[0] for text in args.only)]
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "database": re.sub(r"//[^@/]*@", "//", url),
+        "dataset": {
+            "users": args.users, "assets_per_user": args.assets_per_user, "tasks_per_asset": args.tasks_per_asset,
+            "years": args.years, "seed": args.seed, "subject_tasks": task_count,
+        },
+        "cache": args.cache,
+        "cases": {},
+    }
+    print(f"{'case':<42} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8} {'peak KiB':>9}")
+    for name, path, headers in selected:
+        result = run_case(app, client, path, headers, max(1, args.iterations), args.warmup)
+        body = result.pop("_body")
+        results["cases"][name] = result
+        _report(name, result)
+        if headers is HTMX and (match := _CURSOR.search(body.decode("utf-8", "replace"))):
+            name = "tasks.list_tasks htmx next page _rows.html"
+            if not args.only or any(text in name for text in args.only):
+                result = run_case(app, client, f"{path}&cursor={match.group(1)}", HTMX, max(1, args.iterations), args.warmup)
+                result.pop("_body")
+                results["cases"][name] = result
+                _report(name, result)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Wrote {args.output}")
+    if args.compare:
+        problems = compare(results, json.loads(Path(args.compare).read_text()), args.threshold, args.min_delta_ms)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            return 1
+        print(f"No regressions against {args.compare}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,468 @@
+"""Drive the app with simulated browsing sessions and ramp up concurrency.
+
+Each virtual user is a thread with its own cookie jar.  It signs in as one of
+the seeded households (``seed<n>@example.com``, see :mod:`app.seeding`), then
+until the stage ends it repeatedly picks an action by weight:
+
+    dashboard  GET /
+    browse     HTMX sort/filter of /tasks/, sometimes followed by the next page
+    complete   POST /tasks/<id>/complete for an open task it has seen
+    upload     multipart POST of a fresh receipt to /tasks/<id>/attachments
+    download   GET /files/<id> for an attachment it has seen
+    login      sign out and in again (password hashing on the server)
+
+Redirects are not followed, so every request is timed on its own.  Each stage
+runs ``--concurrency`` users for ``--stage-seconds`` and reports throughput,
+latency percentiles and error rate; ``--output`` saves the curve (and a
+per-request breakdown) as JSON so worker counts and classes can be compared.
+
+By default a gunicorn is started on a free port against a dataset generated
+like the one of ``scripts/benchmark.py`` (cached separately under
+``instance/loadtest/``, since completions and uploads change it), with the
+given worker options:
+
+    python scripts/loadtest.py --workers 2 --concurrency 1,2,4,8,16 --output sync.json
+    python scripts/loadtest.py --workers 2 --worker-class gthread --threads 4 --output gthread.json
+
+``--url`` targets a server that is already running instead; it must serve a
+database seeded with ``--users`` households starting at
+``seed<--first-user>@example.com`` (user 1 is the migration's default
+household, so seeding a fresh database starts at ``seed2``).  The load generator
+shares the CPU with the server, so compare runs made on the same machine.
+"""
+from __future__ import annotations
+
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmark import ROOT, _git_revision, build_app, ensure_seeded, percentile, prepare_database
+
+ACTIONS = ("dashboard", "browse", "complete", "upload", "download", "login")
+DEFAULT_MIX = "dashboard=25,browse=45,complete=10,upload=5,download=10,login=5"
+TASK_STATUSES = ("all", "open", "overdue", "done")
+TASK_SORTS = ("due", "title", "created")
+WINDOWS = ("", "7d", "30d")
+LOAD_DIR = ROOT / "instance" / "loadtest"
+
+_CSRF = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+_OPEN_TASK = re.compile(r"/tasks/(\d+)/complete")
+_EDIT_TASK = re.compile(r"/tasks/(\d+)/edit")
+_ATTACHMENT = re.compile(r"/files/(\d+)\"")
+_CURSOR = re.compile(r"cursor=([A-Za-z0-9_\-=%]+)")
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    """``"dashboard=30,browse=50"`` -> weights; unknown actions are an error."""
+    mix = {}
+    for part in filter(None, (piece.strip() for piece in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"unknown action {name!r} (choose from {', '.join(ACTIONS)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("the mix needs at least one action with a positive weight")
+    return mix
+
+
+def parse_stages(text: str) -> list[int]:
+    try:
+        stages = [int(piece) for piece in text.split(",") if piece.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected comma-separated user counts, e.g. 1,2,4,8") from None
+    if not stages or min(stages) < 1:
+        raise argparse.ArgumentTypeError("user counts must be positive")
+    return stages
+
+
+class _PlainHttpCookies(http.cookiejar.DefaultCookiePolicy):
+    """Send ``Secure`` cookies over http too: gunicorn is hit directly, without the TLS proxy."""
+
+    def return_ok_secure(self, cookie, request):
+        return True
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Recorder:
+    """Thread-safe ``(label, ms, ok)`` samples for the running stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: list[tuple[str, float, bool]] = []
+        self.errors: dict[str, int] = {}
+        self.active = False
+
+    def add(self, label: str, ms: float, ok: bool, error: str | None = None) -> None:
+        if not self.active:
+            return
+        with self._lock:
+            self.samples.append((label, ms, ok))
+            if error:
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+    def drain(self) -> tuple[list[tuple[str, float, bool]], dict[str, int]]:
+        with self._lock:
+            samples, errors = self.samples, self.errors
+            self.samples, self.errors = [], {}
+        return samples, errors
+
+
+class VirtualUser:
+    """One browser session: cookies, the CSRF token and what it has seen so far."""
+
+    def __init__(self, base: str, email: str, password: str, recorder: Recorder, timeout: float, rng: random.Random):
+        self.base = base.rstrip("/")
+        self.email = email
+        self.password = password
+        self.recorder = recorder
+        self.timeout = timeout
+        self.rng = rng
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar(_PlainHttpCookies())), _NoRedirect()
+        )
+        self.csrf = ""
+        self.open_tasks: list[int] = []
+        self.tasks: list[int] = []
+        self.attachments: list[int] = []
+
+    def request(self, label: str, path: str, data: bytes | None = None, headers: dict | None = None):
+        """``(status, body, location)``; records the timing, errors included."""
+        req = urllib.request.Request(self.base + path, data=data, headers=headers or {})
+        started = time.perf_counter()
+        status, body, location, error = 0, b"", "", None
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            status, body, location = exc.code, exc.read(), exc.headers.get("Location", "")
+        except (OSError, urllib.error.URLError) as exc:
+            error = type(getattr(exc, "reason", exc)).__name__
+        elapsed = (time.perf_counter() - started) * 1000
+        if error is None and status >= 400:
+            error = f"HTTP {status}"
+        if error is None and label not in ("login", "logout") and "/auth/login" in location:
+            error = "signed out"
+        self.recorder.add(label, elapsed, error is None, error and f"{label}: {error}")
+        if body and (match := _CSRF.search(body.decode("utf-8", "replace"))):
+            self.csrf = match.group(1)
+        return status, body, location
+
+    def _form(self, fields: dict) -> bytes:
+        return urllib.parse.urlencode({"csrf_token": self.csrf, **fields}).encode()
+
+    def _learn_tasks(self, body: bytes) -> None:
+        text = body.decode("utf-8", "replace")
+        self.open_tasks = [int(task_id) for task_id in _OPEN_TASK.findall(text)] or self.open_tasks
+        self.tasks = [int(task_id) for task_id in _EDIT_TASK.findall(text)] or self.tasks
+
+    def login(self) -> bool:
+        if self.csrf:
+            self.request("logout", "/auth/logout", self._form({}))
+        self.request("login page", "/auth/login")
+        status, _, location = self.request(
+            "login", "/auth/login", self._form({"email": self.email, "password": self.password})
+        )
+        return status == 302 and "/auth/login" not in location
+
+    def dashboard(self) -> None:
+        self.request("dashboard", "/")
+
+    def browse(self) -> None:
+        query = {"status": self.rng.choice(TASK_STATUSES), "sort": self.rng.choice(TASK_SORTS)}
+        if window := self.rng.choice(WINDOWS):
+            query["window"] = window
+        path = f"/tasks/?{urllib.parse.urlencode(query)}"
+        _, body, _ = self.request("tasks htmx", path, headers={"HX-Request": "true"})
+        self._learn_tasks(body)
+        if self.rng.random() < 0.3 and (match := _CURSOR.search(body.decode("utf-8", "replace"))):
+            self.request("tasks next page", f"{path}&cursor={match.group(1)}", headers={"HX-Request": "true"})
+
+    def complete(self) -> None:
+        if not self.open_tasks:
+            _, body, _ = self.request("tasks", "/tasks/?status=open")
+            self._learn_tasks(body)
+        if self.open_tasks:
+            task_id = self.open_tasks.pop(self.rng.randrange(len(self.open_tasks)))
+            self.request("complete", f"/tasks/{task_id}/complete", self._form({}))
+
+    def _visit_task(self) -> None:
+        if not self.tasks:
+            _, body, _ = self.request("tasks", "/tasks/")
+            self._learn_tasks(body)
+        if self.tasks:
+            _, body, _ = self.request("task edit", f"/tasks/{self.rng.choice(self.tasks)}/edit")
+            found = [int(attachment_id) for attachment_id in _ATTACHMENT.findall(body.decode("utf-8", "replace"))]
+            self.attachments = sorted(set(self.attachments + found))[-50:]
+
+    def upload(self, size: int) -> None:
+        if not self.tasks:
+            self._visit_task()
+        if not self.tasks:
+            return
+        boundary = uuid.uuid4().hex
+        content = b"%PDF-1.4\n%" + os.urandom(max(0, size - 10))
+        body = b"".join([
+            f'--{boundary}\r\nContent-Disposition: form-data; name="csrf_token"\r\n\r\n{self.csrf}\r\n'.encode(),
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="receipt.pdf"\r\n'.encode(),
+            b"Content-Type: application/pdf\r\n\r\n", content, f"\r\n--{boundary}--\r\n".encode(),
+        ])
+        self.request(
+            "upload",
+            f"/tasks/{self.rng.choice(self.tasks)}/attachments",
+            body,
+            {"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        )
+
+    def download(self) -> None:
+        for _ in range(3):
+            if self.attachments:
+                break
+            self._visit_task()
+        if self.attachments:
+            self.request("download", f"/files/{self.rng.choice(self.attachments)}")
+
+
+def run_stage(users: list[VirtualUser], mix: dict[str, float], seconds: float, think_ms: float, upload_bytes: int) -> None:
+    actions, weights = zip(*mix.items())
+    deadline = time.monotonic() + seconds
+
+    def drive(user: VirtualUser) -> None:
+        while time.monotonic() < deadline:
+            action = user.rng.choices(actions, weights)[0]
+            if action == "upload":
+                user.upload(upload_bytes)
+            else:
+                getattr(user, action)()
+            if think_ms:
+                time.sleep(min(user.rng.expovariate(1000 / think_ms), max(0.0, deadline - time.monotonic())))
+
+    threads = [threading.Thread(target=drive, args=(user,), daemon=True) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def summarize(samples: list[tuple[str, float, bool]], seconds: float) -> dict:
+    timings = [ms for _, ms, _ in samples]
+    failures = sum(1 for _, _, ok in samples if not ok)
+    if not timings:
+        return {"requests": 0, "rps": 0.0, "error_rate": 0.0}
+    return {
+        "requests": len(timings),
+        "rps": round(len(timings) / seconds, 2),
+        "error_rate": round(failures / len(timings), 4),
+        "p50_ms": round(percentile(timings, 0.50), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+        "p99_ms": round(percentile(timings, 0.99), 2),
+        "max_ms": round(max(timings), 2),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(base: str, server: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"gunicorn exited with status {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base}/auth/login", timeout=2):
+                return
+        except (OSError, urllib.error.URLError):
+            time.sleep(0.25)
+    raise SystemExit(f"gunicorn did not answer on {base} within {timeout:.0f}s")
+
+
+def seed_accounts(app, limit: int) -> list[str]:
+    from sqlalchemy import select
+
+    from app.extensions import db
+    from app.models import User
+
+    with app.app_context():
+        emails = db.session.execute(
+            select(User.email).where(User.email.like("seed%@example.com")).order_by(User.id).limit(limit)
+        ).scalars().all()
+        db.engine.dispose()
+    return list(emails)
+
+
+def start_server(args) -> tuple[str, list[str], list[subprocess.Popen]]:
+    """Seed (if needed) and launch gunicorn, plus the scheduler with ``--scheduler``.
+
+    Returns the base URL, the seeded accounts to sign in with and the processes.
+    """
+    env = os.environ.copy()
+    # The load test completes tasks and uploads files, so it keeps its own
+    # dataset and blobs under instance/loadtest/ (ignored by git).
+    url = prepare_database(args, prefix="loadtest")
+    if not args.database:
+        os.environ.setdefault("UPLOAD_FOLDER", str(LOAD_DIR / "uploads"))
+    app = build_app(args, url)
+    ensure_seeded(app, args)
+    accounts = seed_accounts(app, args.users)
+    if not accounts:
+        raise SystemExit(f"{url} has no seed<n>@example.com households; seed it with `flask seed-data --users`.")
+    for key in ("SQLALCHEMY_DATABASE_URI", "UPLOAD_FOLDER", "METRICS_DIR"):
+        if key in os.environ:
+            env[key] = os.environ[key]
+    env.setdefault("SECRET_KEY", uuid.uuid4().hex)
+
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    command = [
+        sys.executable, "-m", "gunicorn", "wsgi:app",
+        f"--bind=127.0.0.1:{port}",
+        f"--workers={args.workers}",
+        f"--worker-class={args.worker_class}",
+        f"--threads={args.threads}",
+        "--timeout=120",
+        "--log-level=warning",
+    ]
+    processes = [subprocess.Popen(command, cwd=ROOT, env=env)]
+    if args.scheduler:
+        processes.append(
+            subprocess.Popen([sys.executable, "-m", "flask", "--app", "wsgi.py", "scheduler", "run"], cwd=ROOT, env=env)
+        )
+    try:
+        _wait_until_up(base, processes[0])
+    except BaseException:
+        stop_processes(processes)
+        raise
+    return base, accounts, processes
+
+
+def stop_processes(processes: list[subprocess.Popen]) -> None:
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test the app with simulated browsing sessions.")
+    parser.add_argument("--url", help="Test this running server instead of starting gunicorn.")
+    parser.add_argument("--concurrency", type=parse_stages, default=[1, 2, 4, 8], help="Virtual users per stage (default: 1,2,4,8).")
+    parser.add_argument("--stage-seconds", type=float, default=20)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Action weights (default: {DEFAULT_MIX}).")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between actions (0: back to back).")
+    parser.add_argument("--upload-kib", type=int, default=200, help="Size of each uploaded file.")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds.")
+    parser.add_argument("--password", default="password", help="Password of the seeded households.")
+    parser.add_argument("--first-user", type=int, default=2, help="With --url: number of the first seed<n>@example.com account.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--random-seed", type=int, default=0)
+    server = parser.add_argument_group("gunicorn (ignored with --url)")
+    server.add_argument("--workers", type=int, default=2)
+    server.add_argument("--worker-class", default="sync")
+    server.add_argument("--threads", type=int, default=1)
+    server.add_argument("--scheduler", action="store_true", help="Also run `flask scheduler run` next to gunicorn.")
+    dataset = parser.add_argument_group("dataset (see scripts/benchmark.py)")
+    dataset.add_argument("--database", help="Use this (seeded if empty) database instead of the cached SQLite file.")
+    dataset.add_argument("--users", type=int, default=50, help="Seeded households; virtual users sign in round-robin.")
+    dataset.add_argument("--assets-per-user", type=float, default=10)
+    dataset.add_argument("--tasks-per-asset", type=float, default=40)
+    dataset.add_argument("--years", type=float, default=5)
+    dataset.add_argument("--seed", type=int, default=1)
+    dataset.add_argument("--fixed-date", action="store_true")
+    parser.set_defaults(cache=True)
+    args = parser.parse_args()
+
+    processes: list[subprocess.Popen] = []
+    if args.url:
+        base = args.url
+        accounts = [f"seed{n}@example.com" for n in range(args.first_user, args.first_user + args.users)]
+    else:
+        base, accounts, processes = start_server(args)
+    recorder = Recorder()
+    rng = random.Random(args.random_seed)
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "server": {"url": args.url} if args.url else {
+            "workers": args.workers, "worker_class": args.worker_class, "threads": args.threads,
+            "scheduler": args.scheduler, "accounts": len(accounts),
+        },
+        "mix": args.mix,
+        "think_ms": args.think_ms,
+        "stage_seconds": args.stage_seconds,
+        "stages": [],
+    }
+    users: list[VirtualUser] = []
+    try:
+        print(f"{'users':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}")
+        for concurrency in args.concurrency:
+            while len(users) < concurrency:
+                user = VirtualUser(
+                    base, accounts[len(users) % len(accounts)], args.password, recorder, args.timeout,
+                    random.Random(rng.random()),
+                )
+                if not user.login():
+                    raise SystemExit(f"Could not sign in as {user.email}; is the server's database seeded?")
+                users.append(user)
+            recorder.active = True
+            started = time.perf_counter()
+            run_stage(users[:concurrency], args.mix, args.stage_seconds, args.think_ms, args.upload_kib * 1024)
+            elapsed = time.perf_counter() - started
+            recorder.active = False
+            samples, errors = recorder.drain()
+            stage = {"users": concurrency, **summarize(samples, elapsed), "errors": errors, "requests_by_label": {}}
+            for label in sorted({label for label, _, _ in samples}):
+                stage["requests_by_label"][label] = summarize([s for s in samples if s[0] == label], elapsed)
+            results["stages"].append(stage)
+            print(
+                f"{concurrency:>5} {stage['rps']:>8.1f} {stage.get('p50_ms', 0):>8.1f} {stage.get('p95_ms', 0):>8.1f}"
+                f" {stage.get('p99_ms', 0):>8.1f} {stage['error_rate']:>7.1%}"
+            )
+            for error, count in sorted(errors.items(), key=lambda item: -item[1])[:5]:
+                print(f"      {count:>6} x {error}")
+    finally:
+        stop_processes(processes)
+
+    if results["stages"]:
+        peak = max(results["stages"], key=lambda stage: stage["rps"])
+        print(f"\nPer request at {peak['users']} user(s), the highest throughput:")
+        print(f"{'request':<18} {'count':>7} {'p50':>8} {'p95':>8} {'errors':>7}")
+        for label, stats in peak["requests_by_label"].items():
+            print(
+                f"{label:<18} {stats['requests']:>7} {stats.get('p50_ms', 0):>8.1f} {stats.get('p95_ms', 0):>8.1f}"
+                f" {stats['error_rate']:>7.1%}"
+            )
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,60 +1,43 @@
-import random
-from datetime import date, datetime, timedelta
-from decimal import Decimal
+import argparse
+from datetime import date
 
 from app import create_app
-from app.extensions import db
-from app.models import Asset, Task, User
-
-
-ASSET_TYPES = ["HVAC", "Plumbing", "Fridge", "Washer", "Roof", "Vehicle"]
+from app.seeding import SEED_CHUNK_SIZE, SEED_PASSWORD, seed_households
 
 
 def seed():
+    parser = argparse.ArgumentParser(description="Generate demo or benchmark data (see `flask seed-data`).")
+    parser.add_argument("--users", type=int, help="Create this many new households (default: seed the first user).")
+    parser.add_argument("--assets-per-user", type=float, default=5)
+    parser.add_argument("--tasks-per-asset", type=float, default=4)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--attachments", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--today", type=date.fromisoformat)
+    parser.add_argument("--chunk-size", type=int, default=SEED_CHUNK_SIZE)
+    args = parser.parse_args()
+
     app = create_app()
     with app.app_context():
-        user = User.query.first()
-        if not user:
-            raise SystemExit("Create a user first (register via UI) before seeding sample data.")
-
-        if Asset.query.filter_by(user_id=user.id).count() > 0:
-            raise SystemExit("User already has assets. Aborting to avoid duplicates.")
-
-        today = date.today()
-        cost_options = [Decimal("0"), Decimal("25"), Decimal("49.99"), Decimal("120")]
-        for idx in range(5):
-            asset = Asset(
-                user_id=user.id,
-                name=f"{ASSET_TYPES[idx % len(ASSET_TYPES)]} #{idx + 1}",
-                type=ASSET_TYPES[idx % len(ASSET_TYPES)],
-                make=random.choice(["Acme", "HomePro", "FixIt", "DailyCo"]),
-                model=f"{random.randint(100,999)}-X",
-                purchase_date=today - timedelta(days=random.randint(200, 1500)),
-                warranty_expiration=today + timedelta(days=random.randint(100, 600)),
-                notes="Seeded sample asset.",
+        try:
+            report = seed_households(
+                users=args.users,
+                assets_per_user=args.assets_per_user,
+                tasks_per_asset=args.tasks_per_asset,
+                years=args.years,
+                attachments=args.attachments,
+                seed=args.seed,
+                today=args.today,
+                chunk_size=max(1, args.chunk_size),
             )
-            db.session.add(asset)
-            db.session.flush()
-
-            for _ in range(4):
-                due = today + timedelta(days=random.randint(-30, 60))
-                status = random.choice(["pending", "pending", "done"])
-                task = Task(
-                    user_id=user.id,
-                    asset_id=asset.id,
-                    title=f"Service {asset.name}",
-                    description="Auto-generated sample task.",
-                    due_date=due,
-                    status=status,
-                    cost=random.choice(cost_options),
-                )
-                if status == "done":
-                    completed_at = datetime.utcnow() - timedelta(days=random.randint(1, 90))
-                    task.updated_at = completed_at
-                db.session.add(task)
-
-        db.session.commit()
-        print("Seeded sample assets and tasks.")
+        except ValueError as exc:
+            raise SystemExit(str(exc)) from None
+        print(
+            f"Seeded {report.users} user(s), {report.assets} asset(s), {report.tasks} task(s) "
+            f"and {report.attachments} attachment(s) in {report.seconds:.1f}s."
+        )
+        if report.users:
+            print(f"Seed users sign in with password '{SEED_PASSWORD}'.")
 
 
 if __name__ == "__main__":
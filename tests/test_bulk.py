@@ -0,0 +1,36 @@
+"""Set-based bulk actions on the task list."""
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from app.bulk import apply_bulk_action
+from app.extensions import db
+from app.models import Task
+
+
+@pytest.fixture
+def tasks_by_status(asset):
+    tasks = {
+        status: Task(user_id=asset.user_id, asset_id=asset.id, title=f"{status} task", status=status)
+        for status in ("pending", "skipped", "done", "deleted")
+    }
+    db.session.add_all(tasks.values())
+    db.session.commit()
+    return {status: task.id for status, task in tasks.items()}
+
+
+@pytest.mark.parametrize("action, changed", [
+    ("complete", {"pending": "done", "skipped": "done"}),
+    ("skip", {"pending": "skipped"}),
+])
+def test_complete_and_skip_leave_other_statuses_alone(user, tasks_by_status, action, changed):
+    result = apply_bulk_action(user.id, list(tasks_by_status.values()), action, date.today())
+    db.session.commit()
+    assert result.changed == len(changed)
+    statuses = dict(db.session.execute(select(Task.id, Task.status)).all())
+    assert {status: statuses[task_id] for status, task_id in tasks_by_status.items()} == {
+        status: changed.get(status, status) for status in tasks_by_status
+    }
@@ -0,0 +1,24 @@
+"""Per-request user loading and the per-worker identity cache."""
+from __future__ import annotations
+
+from app.extensions import db
+from app.identity import MAX_IDENTITY_CACHE_TTL, identity_cache, init_identity, load_identity
+
+
+def test_ttl_is_capped(app):
+    app.config["IDENTITY_CACHE_TTL"] = 600
+    init_identity(app)
+    assert identity_cache.ttl == MAX_IDENTITY_CACHE_TTL
+
+
+def test_local_update_invalidates_entry(app, user):
+    app.config["IDENTITY_CACHE_TTL"] = 2
+    init_identity(app)
+    assert load_identity(user.id).role == "member"
+    assert identity_cache.get(user.id) is not None
+
+    user.role = "admin"
+    db.session.commit()
+    assert identity_cache.get(user.id) is None
+    db.session.expunge_all()
+    assert load_identity(user.id).role == "admin"
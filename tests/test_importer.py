@@ -0,0 +1,74 @@
+"""Streaming CSV/JSON import."""
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from app import importer
+from app.extensions import db
+from app.importer import import_rows, read_rows
+from app.models import Asset, Task
+
+
+def json_rows(count):
+    return [{"Title": f"Task {n}", "Asset": f"Asset {n % 7}", "Due": "2026-01-15", "Cost": "12.50"} for n in range(count)]
+
+
+@pytest.mark.parametrize("read_size", [1, 5, 4096])
+def test_json_array_elements_span_reads(monkeypatch, read_size):
+    monkeypatch.setattr(importer, "JSON_READ_SIZE", read_size)
+    rows = json_rows(40) + [7, 1.5e3, True, None, "text"]
+    assert list(read_rows(io.StringIO(json.dumps(rows, indent=2)), "json")) == rows
+
+
+def test_json_array_does_not_read_ahead(monkeypatch):
+    monkeypatch.setattr(importer, "JSON_READ_SIZE", 256)
+    payload = json.dumps(json_rows(2000))
+    stream = io.StringIO(payload)
+    reader = read_rows(stream, "json")
+    next(reader)
+    assert stream.tell() < 1024 < len(payload)
+
+
+@pytest.mark.parametrize("payload", ["[1,]", "[1 2]", "[{\"Title\": \"x\"},", "[,1]", "[{\"Title\": "])
+def test_malformed_json_array_raises(payload):
+    with pytest.raises(ValueError):
+        list(read_rows(io.StringIO(payload), "json"))
+
+
+def test_oversized_json_row_raises(monkeypatch):
+    monkeypatch.setattr(importer, "MAX_JSON_ROW_CHARS", 100)
+    payload = json.dumps([{"Title": "x" * 500, "Asset": "Roof"}])
+    with pytest.raises(ValueError, match="larger than"):
+        list(read_rows(io.StringIO(payload), "json"))
+
+
+def test_json_array_import(user):
+    report = import_rows(user.id, read_rows(io.StringIO(json.dumps(json_rows(25))), "json"), chunk_size=10)
+    assert (report.rows, report.tasks_created, report.assets_created, report.error_count) == (25, 25, 7, 0)
+    assert db.session.scalar(select(func.count()).select_from(Task)) == 25
+    assert db.session.scalar(select(func.count()).select_from(Asset)) == 7
+
+
+@pytest.mark.parametrize("field, value, message", [
+    ("Asset Type", "t" * 51, "Asset type is longer than 50 characters."),
+    ("Serial", "s" * 121, "Serial is longer than 120 characters."),
+    ("Make", "m" * 121, "Make is longer than 120 characters."),
+    ("Vendor", "v" * 121, "Vendor is longer than 120 characters."),
+    ("Asset Notes", {"nested": True}, "Asset notes must be text."),
+    ("Asset", "a" * 201, "Asset name is longer than 200 characters."),
+])
+def test_oversized_fields_are_row_errors(user, field, value, message):
+    rows = [
+        {"Title": "Good", "Asset": "Roof"},
+        {"Title": "Bad", "Asset": "Gutter", field: value},
+        {"Title": "Also good", "Asset": "Roof", "Serial": 12345},
+    ]
+    report = import_rows(user.id, rows)
+    assert report.errors == [(2, message)]
+    assert report.tasks_created == 2
+    assert db.session.scalar(select(Asset.serial).where(Asset.name == "Roof")) is None
+    assert db.session.scalar(select(func.count()).select_from(Task)) == 2
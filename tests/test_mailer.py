@@ -0,0 +1,176 @@
+"""Outbox delivery against an in-process SMTP stand-in."""
+from __future__ import annotations
+
+import email
+import socketserver
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app.extensions import db
+from app.mailer import Outgoing, deliver_outbox, queue_messages
+from app.models import OutboxMessage
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    """Just enough of RFC 5321 for smtplib: EHLO, MAIL, RCPT, DATA, RSET, QUIT."""
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        fake = self.server.fake
+        self.reply("220 fake.test ESMTP")
+        while line := self.rfile.readline():
+            command = line.decode("utf-8", "replace").strip()
+            verb = command[:4].upper()
+            if verb == "EHLO":
+                self.reply("250-fake.test")
+                self.reply("250 8BITMIME")
+            elif verb in ("HELO", "MAIL", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip().strip("<>")
+                self.reply(fake.refused.get(address, "250 OK"))
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while (chunk := self.rfile.readline()) not in (b".\r\n", b""):
+                    lines.append(chunk[1:] if chunk.startswith(b"..") else chunk)
+                answer = fake.data_replies.pop(0) if fake.data_replies else "250 Queued"
+                if answer.startswith("250"):
+                    fake.messages.append(email.message_from_bytes(b"".join(lines)))
+                self.reply(answer)
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class FakeSmtpServer:
+    def __init__(self):
+        self.messages: list[email.message.Message] = []
+        self.refused: dict[str, str] = {}      # recipient -> RCPT reply
+        self.data_replies: list[str] = []      # replies to the next DATA commands
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SmtpHandler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def smtp(app):
+    server = FakeSmtpServer()
+    app.config.update(SMTP_HOST="127.0.0.1", SMTP_PORT=server.port, MAIL_WORKERS=2, SMTP_TIMEOUT=5)
+    yield server
+    server.close()
+
+
+def queue(*recipients):
+    queue_messages(
+        Outgoing(f"digest:{recipient}", recipient, f"Due soon for {recipient}", "Replace the furnace filter.")
+        for recipient in recipients
+    )
+    db.session.commit()
+
+
+def row(recipient) -> OutboxMessage:
+    db.session.expire_all()
+    return db.session.execute(select(OutboxMessage).where(OutboxMessage.recipient == recipient)).scalar_one()
+
+
+def make_due(recipient):
+    db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.recipient == recipient)
+        .values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1))
+    )
+    db.session.commit()
+
+
+def test_delivers_due_messages(smtp):
+    queue("a@example.com", "b@example.com", "c@example.com")
+
+    assert deliver_outbox() == (3, 0, 0, 0)
+    assert sorted(message["To"] for message in smtp.messages) == ["a@example.com", "b@example.com", "c@example.com"]
+    assert all(message["Message-ID"] for message in smtp.messages)
+    sent = row("a@example.com")
+    assert (sent.status, sent.attempts, sent.last_error) == ("sent", 1, None)
+    assert sent.sent_at is not None
+    # Nothing is left to send on the next run.
+    assert deliver_outbox() == (0, 0, 0, 0)
+    assert len(smtp.messages) == 3
+
+
+def test_transient_failure_is_retried_with_backoff(smtp):
+    smtp.data_replies.append("451 4.3.0 Try again later")
+    queue("a@example.com")
+
+    assert deliver_outbox() == (0, 1, 0, 0)
+    waiting = row("a@example.com")
+    assert (waiting.status, waiting.attempts) == ("pending", 1)
+    assert "451" in waiting.last_error
+    assert waiting.next_attempt_at > datetime.utcnow()
+    assert deliver_outbox() == (0, 0, 0, 0)   # not due yet
+
+    make_due("a@example.com")
+    assert deliver_outbox() == (1, 0, 0, 0)
+    delivered = row("a@example.com")
+    assert (delivered.status, delivered.attempts, delivered.last_error) == ("sent", 2, None)
+    assert len(smtp.messages) == 1
+
+
+def test_transient_failures_give_up_after_max_attempts(app, smtp):
+    app.config["MAIL_MAX_ATTEMPTS"] = 2
+    smtp.data_replies.extend(["451 Try again later", "451 Try again later"])
+    queue("a@example.com")
+
+    assert deliver_outbox() == (0, 1, 0, 0)
+    make_due("a@example.com")
+    assert deliver_outbox() == (0, 0, 1, 0)
+    assert row("a@example.com").status == "failed"
+
+
+def test_permanent_failure_is_not_retried(smtp):
+    smtp.refused["nobody@example.com"] = "550 5.1.1 No such user"
+    queue("nobody@example.com", "a@example.com")
+
+    assert deliver_outbox() == (1, 0, 1, 0)
+    failed = row("nobody@example.com")
+    assert (failed.status, failed.attempts) == ("failed", 1)
+    assert "550" in failed.last_error
+    assert row("a@example.com").status == "sent"
+
+
+def test_messages_are_held_without_smtp_host(app):
+    app.config["SMTP_HOST"] = None
+    queue("a@example.com")
+
+    assert deliver_outbox() == (0, 0, 0, 1)
+    held = row("a@example.com")
+    assert (held.status, held.attempts, held.sent_at) == ("pending", 0, None)
+
+
+def test_claimed_messages_are_left_to_their_run(app, smtp):
+    queue("a@example.com")
+    # Another delivery run has claimed the message and is sending it.
+    db.session.execute(update(OutboxMessage).values(status="sending", claimed_at=datetime.utcnow()))
+    db.session.commit()
+
+    assert deliver_outbox() == (0, 0, 0, 0)
+    assert smtp.messages == []
+
+    # That run died: once the claim is stale the message is sent again.
+    stale = datetime.utcnow() - timedelta(seconds=app.config["MAIL_CLAIM_TIMEOUT_SECONDS"] + 1)
+    db.session.execute(update(OutboxMessage).values(claimed_at=stale))
+    db.session.commit()
+    assert deliver_outbox() == (1, 0, 0, 0)
+    assert row("a@example.com").status == "sent"
@@ -0,0 +1,14 @@
+"""The migrations and the models describe the same schema."""
+from __future__ import annotations
+
+from pathlib import Path
+
+from flask_migrate import check
+
+MIGRATIONS = Path(__file__).resolve().parent.parent / "migrations"
+
+
+def test_autogenerate_finds_no_changes(app):
+    # Exits with status 1 if `flask db migrate` would generate operations, e.g.
+    # dropping the FTS5 tables or adding the Postgres-only partial indexes.
+    check(directory=str(MIGRATIONS))
@@ -0,0 +1,95 @@
+"""Keyset pagination over sort columns with ties, mixed timestamp text and NULLs."""
+from __future__ import annotations
+
+import html
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from app.api_tokens import issue_token
+from app.extensions import db
+from app.models import Asset, Task
+
+EDIT_LINK = re.compile(r'/tasks/(\d+)/edit"')
+NEXT_PAGE = re.compile(r'hx-get="([^"]*cursor=[^"]*)"')
+
+
+@pytest.fixture
+def tied_tasks(asset):
+    """120 tasks sharing a handful of whole-second ``created_at`` values.
+
+    On SQLite the ORM-written ones are stored as ``…:00.000000`` and the
+    defaulted ones as ``CURRENT_TIMESTAMP`` text without a fraction.
+    """
+    stamps = [datetime(2026, 1, 1, 9, 0, 0), datetime(2026, 1, 1, 9, 0, 1)]
+    tasks = []
+    for n in range(120):
+        task = Task(user_id=asset.user_id, asset_id=asset.id, title=f"Task {n}")
+        if n == 1:
+            task.created_at = None
+        elif n == 2:
+            task.created_at = datetime(2026, 1, 1, 9, 0, 0, 500)
+        elif n % 3:
+            task.created_at = stamps[n % 2]
+        # else: the server clock, whole seconds
+        tasks.append(task)
+    db.session.add_all(tasks)
+    db.session.commit()
+    return tasks
+
+
+def expected_order(descending, model=Task):
+    rows = db.session.execute(select(model.id, model.created_at)).all()
+    present = sorted((row for row in rows if row.created_at is not None), key=lambda row: (row.created_at, row.id))
+    if descending:
+        present.reverse()
+    return [row.id for row in present] + sorted((row.id for row in rows if row.created_at is None), reverse=descending)
+
+
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+def test_task_list_walk_has_no_gaps_or_repeats(client, tied_tasks, direction):
+    url = f"/tasks/?sort=created&dir={direction}"
+    seen, pages = [], 0
+    while url:
+        page = client.get(url, headers={"HX-Request": "true"}).get_data(as_text=True)
+        seen += [int(task_id) for task_id in EDIT_LINK.findall(page)]
+        match = NEXT_PAGE.search(page)
+        url = html.unescape(match.group(1)) if match else None
+        pages += 1
+    assert pages == 3
+    assert seen == expected_order(direction == "desc")
+
+
+@pytest.fixture
+def tied_assets(asset):
+    """119 more assets next to ``asset``, on the same whole-second timestamps as ``tied_tasks``."""
+    assets = [Asset(user_id=asset.user_id, name=f"Asset {n}") for n in range(119)]
+    for n, row in enumerate(assets):
+        if n % 3:
+            row.created_at = datetime(2026, 1, 1, 9, 0, n % 2)
+    db.session.add_all(assets)
+    db.session.commit()
+    return assets
+
+
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+@pytest.mark.parametrize("resource, model, rows", [("tasks", Task, "tied_tasks"), ("assets", Asset, "tied_assets")])
+def test_api_walk_has_no_gaps_or_repeats(app, user, request, resource, model, rows, direction):
+    request.getfixturevalue(rows)
+    _, token = issue_token(user.id, "paging test")
+    db.session.commit()
+    client = app.test_client()
+    url = f"/api/v1/{resource}?sort=created&dir={direction}&limit=50&fields=id"
+    seen, pages = [], 0
+    while url:
+        response = client.get(url, headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        body = response.get_json()
+        seen += [row["id"] for row in body["data"]]
+        url = response.headers.get("Link", "").partition(">")[0].lstrip("<") or None
+        assert bool(url) == bool(body["next_cursor"])
+        pages += 1
+    assert pages == 3
+    assert seen == expected_order(direction == "desc", model)
@@ -0,0 +1,66 @@
+"""Hot pages stay within their statement budgets as the data grows."""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.api_tokens import issue_token
+from app.extensions import db
+from app.instrumentation import API_QUERY_BUDGETS, QUERY_BUDGETS, assert_max_queries
+from app.models import Asset, Attachment, Task
+from app.stats import rebuild_stats
+
+
+@pytest.fixture
+def household(app, user):
+    """Enough assets, tasks and attachments that a per-row query would show up."""
+    app.config["FRAGMENT_CACHE_ENABLED"] = False
+    today = date.today()
+    for number in range(4):
+        asset = Asset(user_id=user.id, name=f"Asset {number}", type="appliance", serial=f"SN-{number}")
+        db.session.add(asset)
+        db.session.flush()
+        for offset in range(12):
+            status = ("pending", "done", "skipped")[offset % 3]
+            task = Task(
+                user_id=user.id, asset_id=asset.id, title=f"Service {number}-{offset}", status=status,
+                due_date=today + timedelta(days=offset - 6), cost=Decimal("12.50") if status == "done" else None,
+                updated_at=datetime.now() - timedelta(days=offset * 20),
+            )
+            db.session.add(task)
+            db.session.flush()
+            if offset % 4 == 0:
+                db.session.add(Attachment(
+                    user_id=user.id, asset_id=asset.id, task_id=task.id, key=f"{number:02d}{offset:062d}",
+                    original_name="receipt.pdf", mime="application/pdf", size=10,
+                ))
+    rebuild_stats(user.id)
+    db.session.commit()
+    return user
+
+
+def _fetch(client, url, **kwargs):
+    response = client.get(url, **kwargs)
+    response.get_data()
+    response.close()
+    return response
+
+
+@pytest.mark.parametrize("url, budget", QUERY_BUDGETS.items())
+def test_page_within_budget(client, household, url, budget):
+    with assert_max_queries(budget):
+        response = _fetch(client, url)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("url, budget", API_QUERY_BUDGETS.items())
+def test_api_collection_within_budget(app, household, url, budget):
+    _, token = issue_token(household.id, "budget test")
+    db.session.commit()
+    client = app.test_client()
+    with assert_max_queries(budget):
+        response = _fetch(client, url, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.get_json()["data"]
@@ -0,0 +1,35 @@
+"""Full-text search detection and matching."""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import text
+
+from app import search
+from app.extensions import db
+from app.models import Task
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(search, "_fts_ready", set())
+    monkeypatch.setattr(search, "_fts_missing", {})
+
+
+def test_missing_fts_is_rechecked(app, fresh_cache, monkeypatch):
+    if db.engine.dialect.name != "sqlite":
+        pytest.skip("FTS5 is SQLite-only")
+    db.session.execute(text("ALTER TABLE task_fts RENAME TO task_fts_old"))
+    assert not search.fts_enabled()
+
+    db.session.execute(text("ALTER TABLE task_fts_old RENAME TO task_fts"))
+    assert not search.fts_enabled()   # still within the recheck window
+    monkeypatch.setattr(search, "FTS_RECHECK_SECONDS", 0)
+    assert search.fts_enabled()
+    assert search._fts_ready and not search._fts_missing
+
+
+def test_search_matches_title(asset, fresh_cache):
+    db.session.add(Task(user_id=asset.user_id, asset_id=asset.id, title="Replace furnace filter"))
+    db.session.commit()
+    found = search.filter_tasks(Task.query, "furnace").all()
+    assert [task.title for task in found] == ["Replace furnace filter"]
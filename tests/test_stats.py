@@ -0,0 +1,154 @@
+"""Dashboard totals against the per-counter queries they replaced."""
+from __future__ import annotations
+
+from collections import Counter
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select
+
+from app.extensions import db
+from app.models import Task
+from app.stats import TaskTotals, chart_months, rebuild_stats, record_task_change, task_facts, task_totals
+from app.utils.dates import month_start
+
+TODAY = date(2026, 3, 15)
+
+
+def legacy_task_totals(user_id: int, today: date) -> TaskTotals:
+    """The dashboard's original one-query-per-counter implementation."""
+    first_of_month = today.replace(day=1)
+    first_of_prev_month = month_start(first_of_month, 1)
+    months = chart_months(today)
+    mine = Task.user_id == user_id
+
+    pending = db.session.execute(select(func.count()).where(mine, Task.status == "pending")).scalar()
+    overdue = [
+        mine, Task.status == "pending", Task.due_date != None, Task.due_date < today,  # noqa: E711
+    ]
+    overdue_count = db.session.execute(select(func.count()).select_from(Task).where(*overdue)).scalar()
+    oldest = db.session.execute(select(Task.due_date).where(*overdue).order_by(Task.due_date).limit(1)).scalar()
+
+    def sum_cost(start: date, end: date | None = None) -> float:
+        stmt = select(Task.cost).where(
+            mine,
+            Task.status == "done",
+            Task.updated_at != None,  # noqa: E711
+            Task.updated_at >= datetime.combine(start, datetime.min.time()),
+        )
+        if end:
+            stmt = stmt.where(Task.updated_at < datetime.combine(end, datetime.min.time()))
+        return round(sum(float(cost) for cost in db.session.execute(stmt).scalars() if cost), 2)
+
+    completed = Counter(
+        (stamp.year, stamp.month)
+        for stamp in db.session.execute(
+            select(Task.updated_at).where(
+                mine,
+                Task.status == "done",
+                Task.updated_at != None,  # noqa: E711
+                Task.updated_at >= datetime.combine(months[0], datetime.min.time()),
+            )
+        ).scalars()
+    )
+    return TaskTotals(
+        pending=pending,
+        overdue=overdue_count,
+        oldest_overdue=oldest,
+        month_cost=sum_cost(first_of_month),
+        prev_month_cost=sum_cost(first_of_prev_month, first_of_month),
+        completed_by_month=tuple(completed.get((month.year, month.month), 0) for month in months),
+    )
+
+
+def add_task(asset, title, status="pending", due_date=None, updated_at=None, cost=None) -> Task:
+    """Insert a task and record it in the summary tables, as the write paths do."""
+    task = Task(
+        user_id=asset.user_id, asset_id=asset.id, title=title, status=status, due_date=due_date,
+        cost=cost, updated_at=updated_at or datetime(2026, 3, 1, 12, 0),
+    )
+    db.session.add(task)
+    db.session.flush()
+    record_task_change(asset.user_id, None, task_facts(task))
+    return task
+
+
+def assert_matches_legacy(user_id: int) -> TaskTotals:
+    expected = legacy_task_totals(user_id, TODAY)
+    assert task_totals(user_id, TODAY) == expected
+    rebuild_stats(user_id)
+    assert task_totals(user_id, TODAY) == expected
+    return expected
+
+
+def test_no_tasks(user):
+    totals = assert_matches_legacy(user.id)
+    assert totals == TaskTotals(0, 0, None, 0.0, 0.0, (0,) * 12)
+
+
+def test_mixed_history(asset):
+    add_task(asset, "future", due_date=TODAY + timedelta(days=3))
+    add_task(asset, "undated")
+    add_task(asset, "due today", due_date=TODAY)
+    add_task(asset, "overdue", due_date=TODAY - timedelta(days=1))
+    add_task(asset, "long overdue", due_date=date(2025, 11, 2))
+    add_task(asset, "skipped", status="skipped", due_date=date(2025, 1, 1), updated_at=datetime(2026, 3, 2))
+    add_task(asset, "this month", status="done", updated_at=datetime(2026, 3, 10, 8, 30), cost=Decimal("120.50"))
+    add_task(asset, "this month too", status="done", updated_at=datetime(2026, 3, 14, 23, 0), cost=Decimal("0.99"))
+    add_task(asset, "last month", status="done", updated_at=datetime(2026, 2, 3), cost=Decimal("75.00"))
+    add_task(asset, "last year", status="done", updated_at=datetime(2025, 6, 30, 18, 0), cost=Decimal("10.00"))
+    db.session.commit()
+
+    totals = assert_matches_legacy(asset.user_id)
+    assert totals.pending == 5
+    assert (totals.overdue, totals.oldest_overdue) == (2, date(2025, 11, 2))
+    assert (totals.month_cost, totals.prev_month_cost) == (121.49, 75.0)
+    assert sum(totals.completed_by_month) == 4
+
+
+def test_null_cost_counts_as_completed_without_spend(asset):
+    add_task(asset, "free fix", status="done", updated_at=datetime(2026, 3, 5), cost=None)
+    add_task(asset, "paid fix", status="done", updated_at=datetime(2026, 3, 6), cost=Decimal("40.00"))
+    add_task(asset, "free last month", status="done", updated_at=datetime(2026, 2, 6), cost=None)
+    db.session.commit()
+
+    totals = assert_matches_legacy(asset.user_id)
+    assert (totals.month_cost, totals.prev_month_cost) == (40.0, 0.0)
+    assert totals.completed_by_month[-2:] == (1, 2)
+
+
+@pytest.mark.parametrize(
+    "stamp",
+    [
+        datetime(2026, 3, 1, 0, 0, 0),                    # first instant of this month
+        datetime(2026, 2, 28, 23, 59, 59, 999999),        # last instant of last month
+        datetime(2026, 2, 1, 0, 0, 0),                    # first instant of last month
+        datetime(2026, 1, 31, 23, 59, 59, 999999),        # just before last month
+        datetime(2025, 4, 1, 0, 0, 0),                    # first instant of the chart
+        datetime(2025, 3, 31, 23, 59, 59, 999999),        # just before the chart
+    ],
+)
+def test_month_boundaries(asset, stamp):
+    add_task(asset, "boundary", status="done", updated_at=stamp, cost=Decimal("12.34"))
+    db.session.commit()
+
+    assert_matches_legacy(asset.user_id)
+
+
+def test_other_households_are_ignored(app, asset):
+    from app.models import Asset, User
+
+    other = User(email="neighbour@example.com", password_hash="x")
+    db.session.add(other)
+    db.session.flush()
+    their_asset = Asset(user_id=other.id, name="Boiler")
+    db.session.add(their_asset)
+    db.session.flush()
+    add_task(their_asset, "theirs", due_date=TODAY - timedelta(days=9))
+    add_task(their_asset, "theirs done", status="done", updated_at=datetime(2026, 3, 2), cost=Decimal("99.00"))
+    add_task(asset, "mine", due_date=TODAY - timedelta(days=1))
+    db.session.commit()
+
+    totals = assert_matches_legacy(asset.user_id)
+    assert (totals.pending, totals.overdue, totals.month_cost) == (1, 1, 0.0)
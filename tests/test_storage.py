@@ -0,0 +1,108 @@
+"""Content-addressed uploads and the mark-and-sweep blob collector."""
+from __future__ import annotations
+
+import io
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import Attachment, BlobRelease, Task
+from app.utils.storage import get_storage, sweep_released_blobs
+
+RECEIPT = b"%PDF-1.4 receipt for the furnace service"
+
+
+@pytest.fixture
+def task(asset):
+    task = Task(user_id=asset.user_id, asset_id=asset.id, title="Replace filter")
+    db.session.add(task)
+    db.session.commit()
+    return task
+
+
+def upload(client, task, content=RECEIPT, name="receipt.pdf"):
+    response = client.post(
+        f"/tasks/{task.id}/attachments",
+        data={"file": (io.BytesIO(content), name)},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 302
+    return db.session.execute(select(Attachment).order_by(Attachment.id.desc()).limit(1)).scalar_one()
+
+
+def delete_attachment(client, attachment_id):
+    assert client.post(f"/tasks/attachments/{attachment_id}/delete").status_code == 302
+
+
+def age_blob(key, seconds=7200):
+    """Pretend the blob was written ``seconds`` ago."""
+    path = get_storage().path(key)
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def age_marks(seconds=7200):
+    db.session.execute(
+        BlobRelease.__table__.update().values(released_at=datetime.utcnow() - timedelta(seconds=seconds))
+    )
+    db.session.commit()
+
+
+def test_identical_uploads_share_one_blob(client, task):
+    first = upload(client, task)
+    second = upload(client, task, name="copy.pdf")
+    assert first.key == second.key
+    assert get_storage().path(first.key).read_bytes() == RECEIPT
+
+
+def test_deleting_only_marks_the_blob(client, task):
+    attachment = upload(client, task)
+    delete_attachment(client, attachment.id)
+    assert get_storage().exists(attachment.key)
+    assert db.session.get(BlobRelease, attachment.key) is not None
+
+
+def test_sweep_deletes_unreferenced_blob_after_grace(client, task):
+    key = upload(client, task).key
+    delete_attachment(client, db.session.execute(select(Attachment.id)).scalar_one())
+
+    assert sweep_released_blobs(3600) == (0, 0)   # still within the grace period
+    assert get_storage().exists(key)
+
+    age_marks()
+    age_blob(key)
+    assert sweep_released_blobs(3600) == (1, 0)
+    assert not get_storage().exists(key)
+    assert db.session.get(BlobRelease, key) is None
+
+
+def test_sweep_keeps_blob_that_is_referenced_again(client, task):
+    first = upload(client, task)
+    key = first.key
+    delete_attachment(client, first.id)
+    upload(client, task)
+    age_marks()
+    age_blob(key)
+
+    assert sweep_released_blobs(3600) == (0, 1)
+    assert get_storage().exists(key)
+    assert db.session.get(BlobRelease, key) is None
+
+
+def test_upload_racing_the_last_delete_survives_the_sweep(client, task):
+    """The blob is rewritten before the new attachment commits; the sweep must wait."""
+    first = upload(client, task)
+    key = first.key
+    delete_attachment(client, first.id)
+    age_marks()
+    age_blob(key)
+
+    # An upload of the same bytes has stored its blob but not yet committed its row.
+    get_storage().put(key, io.BytesIO(RECEIPT))
+    assert sweep_released_blobs(3600) == (0, 0)
+    assert get_storage().exists(key)
+    assert db.session.get(BlobRelease, key) is not None